@@ -0,0 +1,67 @@
+"""
+Authentication of API requests by API key
+Owners of API keys are cached, so repeated requests with the same key don't query users table
+Cache entries of user are dropped when his API key or role changes or he is deleted, but only in the process
+that made the change. Other processes(workers) keep accepting old key or role till entry expires,
+so API_KEY_CACHE_TTL is the longest time a regenerated key or deleted user still authenticates
+"""
+from typing import NamedTuple, Optional
+
+from data import db_session
+from data.models import User
+from src.cache import TTLCache
+from src.user_changes import on_user_change
+
+# Count of cached API keys and seconds till cached owner of key is selected again(see module docstring)
+API_KEY_CACHE_SIZE = 1024
+API_KEY_CACHE_TTL = 5
+
+api_key_cache = TTLCache(API_KEY_CACHE_SIZE, API_KEY_CACHE_TTL)
+
+
+class Principal(NamedTuple):
+    """
+    Owner of API key, without ORM state, so it can be shared between requests
+    """
+    id: int
+    username: str
+    role: str
+    is_admin: bool
+
+
+def authenticate(api_key: Optional[str]) -> Optional[Principal]:
+    """
+    :param api_key: API key passed in request
+    :return: Principal of API key owner or None if key is incorrect
+    """
+    if not api_key or api_key == 'None':
+        return None
+    principal = api_key_cache.get(api_key)
+    if principal is not None:
+        return principal
+
+    session = db_session.get_session()
+    row = session.query(User.id, User.username, User.role).filter(User.API_KEY == api_key).first()
+    if row is None:
+        # Incorrect keys are not cached, so they can't evict keys of real users
+        return None
+    principal = Principal(row.id, row.username, row.role, row.role == 'Admin')
+    api_key_cache.set(api_key, principal)
+    return principal
+
+
+def invalidate_user(user_id: int) -> None:
+    """
+    Drops cached API keys of user
+    """
+    api_key_cache.pop_where(lambda api_key, principal: principal.id == user_id)
+
+
+def cache_stats() -> dict:
+    """
+    :return: hits, misses, size and hit_ratio of API key cache
+    """
+    return api_key_cache.stats()
+
+
+on_user_change(('API_KEY', 'role'), invalidate_user)
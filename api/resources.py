@@ -1,8 +1,21 @@
 import hashlib
-from flask import jsonify, current_app as app
+import json
+from typing import Callable, Dict
+from flask import jsonify, current_app as app, request, Response, stream_with_context
 from flask_restful import reqparse, abort, Resource
 from data import db_session
 from data.models import *
+from data.pagination import keyset_page, keyset_chunks, decode_cursor, page_size, BadCursor
+from api.serializers import Projection, projection
+from api.auth import authenticate
+from src.authorization import can_view
+from data.issue_stats import project_stats
+from data.issue_filters import IssueFilters
+from data.issue_bulk import (create_issues, check_changes, select_targets, target_query, update_issues, BulkError,
+                             BULK_CHUNK_SIZE, MAX_BULK_SIZE)
+from data.search import search_issues, DEFAULT_SEARCH_LIMIT
+from data.issue_query import (compile_query, record_run, visible_issues, CompiledQuery, QuerySyntaxError, Timer,
+                              SLOW_SEARCH_MS)
 
 """
 Some notes
@@ -12,8 +25,30 @@ If requested user doesn't have access to requested entity: 403
 If entity doesn't exist: 404
 On POST request with creating new entity if there is conflict with existing new and existing
 entities(e.g same username with existing user): 409
+
+List resources are paginated: they take limit and after(cursor) arguments and return next_cursor,
+pass it as after to get the next page, next_cursor is null on the last page
+With format=ndjson list resources stream the whole list(starting after cursor) as one JSON object per line
+List resources select only returned columns, see api.serializers
 """
 
+# Count of rows read from database at once by NDJSON stream
+NDJSON_CHUNK_SIZE = 500
+
+# Fields of entities returned by list resources
+USER_LIST_FIELDS = ('role', 'username', 'id')
+PROJECT_LIST_FIELDS = ('description', 'short_project_tag', 'project_name', 'root')
+ISSUE_LIST_FIELDS = ('tracking', 'priority', 'state', 'description', 'steps_to_reproduce', 'summary', 'project_name',
+                     'assign_on')
+SAVED_SEARCH_FIELDS = ('id', 'name', 'query', 'run_count', 'max_ms', 'last_ms', 'last_run_date')
+# Fields of entities returned by resources of one entity and by batch resources
+PROJECT_GET_FIELDS = ('description', 'short_project_tag', 'id', 'project_name', 'root')
+ISSUE_GET_FIELDS = ('tracking', 'priority', 'state', 'description', 'steps_to_reproduce', 'summary', 'project_name',
+                    'assign_on')
+
+# Maximal count of ids or tags in one request to batch resource
+MAX_BATCH_SIZE = 500
+
 
 def abort_if_not_found(cls, entity_id):
     """
@@ -22,13 +57,66 @@ def abort_if_not_found(cls, entity_id):
     :param entity_id: id of specific object of the class
     :return: abort if not found
     """
-    session = db_session.create_session()
+    session = db_session.get_session()
     class_object = session.query(cls).get(entity_id)
     if not class_object:
         app.logger.info(f'Instance of {cls} with id = {entity_id} not found')
         abort(404, message=f'Instance of {cls} with id = {entity_id} not found')
 
 
+def json_list(value) -> list:
+    """
+    reqparse type of JSON array argument, items are left as they are, so caller can check every one of them
+    """
+    if not isinstance(value, list):
+        raise ValueError('must be a list')
+    return value
+
+
+def add_pagination_arguments(parser: reqparse.RequestParser) -> None:
+    parser.add_argument('limit', type=int, required=False)
+    parser.add_argument('after', required=False)
+    parser.add_argument('format', required=False, choices=('json', 'ndjson'), default='json')
+
+
+def paginate(rows_projection: Projection, query, args):
+    """
+    :param rows_projection: Projection of fields returned by resource
+    :param query: Query made by rows_projection.query() to paginate
+    :param args: parsed request args with limit and after
+    :return: List of page dicts and cursor of the next page or abort with 400 if cursor is bad
+    """
+    try:
+        rows, next_cursor = keyset_page(query, rows_projection.key_column, args['limit'], args['after'],
+                                        rows_projection.key)
+        return [rows_projection.to_dict(row) for row in rows], next_cursor
+    except BadCursor as error:
+        app.logger.info(f'Bad cursor {args["after"]} passed')
+        abort(400, message=str(error))
+
+
+def ndjson_response(rows_projection: Projection, query, args) -> Response:
+    """
+    Streams whole query as NDJSON, rows are read from database by chunks of NDJSON_CHUNK_SIZE
+    :param rows_projection: Projection of fields returned by resource
+    :param query: Query made by rows_projection.query() to stream
+    :param args: parsed request args with after
+    :return: Streamed response with chunked transfer encoding
+    """
+    try:
+        after_id = decode_cursor(args['after']) if args['after'] else None
+    except BadCursor as error:
+        app.logger.info(f'Bad cursor {args["after"]} passed')
+        abort(400, message=str(error))
+
+    def generate():
+        for chunk in keyset_chunks(query, rows_projection.key_column, NDJSON_CHUNK_SIZE, after_id,
+                                   rows_projection.key):
+            yield ''.join(json.dumps(rows_projection.to_dict(row), default=str) + '\n' for row in chunk)
+
+    return Response(stream_with_context(generate()), mimetype='application/x-ndjson')
+
+
 class UserResource(Resource):
     """
     Implements interaction with User entity by API
@@ -58,7 +146,7 @@ class UserResource(Resource):
 
         # Check if user exists
         abort_if_not_found(User, args['user_id'])
-        session = create_session()
+        session = db_session.get_session()
 
         # Check if API_KEY in args
         if 'API_KEY' not in args.keys():
@@ -66,9 +154,9 @@ class UserResource(Resource):
             abort(400, message=f'You did not pass API_KEY parameter')
 
         # Requested user here means user that own API key
-        requested_user = session.query(User).filter(User.API_KEY == args["API_KEY"]).first()
+        requested_user = authenticate(args["API_KEY"])
         # Check if API key is equal "None" or user with this api key doesn't exist
-        if args["API_KEY"] == 'None' or requested_user is None:
+        if requested_user is None:
             app.logger.info(f'GET to UserResource, bad API KEY been passed')
             abort(401, message=f'You passed bad API key')
 
@@ -93,7 +181,7 @@ class UserResource(Resource):
             abort(400, message='Not enough arguments')
 
         # All data on a place we can go on
-        session = db_session.create_session()
+        session = db_session.get_session()
         # Check if user with given username already exists
         user = session.query(User).filter(User.username == args['username']).first()
         if user is not None:
@@ -111,6 +199,7 @@ class UserResource(Resource):
 class UserResourceList(Resource):
     user_parser = reqparse.RequestParser()
     user_parser.add_argument('API_KEY', required=True)
+    add_pagination_arguments(user_parser)
 
     def get(self):
         """
@@ -124,12 +213,12 @@ class UserResourceList(Resource):
             app.logger.info('GET to UserResourceList, API_KEY have not been passed')
             abort(400, message=f'You did not pass API_KEY parameter')
 
-        session = create_session()
+        session = db_session.get_session()
 
         # Requested user here means user that own API key
-        requested_user = session.query(User).filter(User.API_KEY == args["API_KEY"]).first()
+        requested_user = authenticate(args["API_KEY"])
         # Check if API key is equal "None" or user with this api key doesn't exist
-        if args["API_KEY"] == 'None' or requested_user is None:
+        if requested_user is None:
             app.logger.info('GET to UserResourceList, passed bad API_KEY')
             abort(401, message=f'You passed bad API key')
 
@@ -137,11 +226,14 @@ class UserResourceList(Resource):
             app.logger.info('POST to ProjectResourceList API KEY doesnt belong to ADMIN')
             abort(403, message='Only admin can access this method')
 
-        users = session.query(User).all()
+        users_projection = projection(User, USER_LIST_FIELDS)
+        if args['format'] == 'ndjson':
+            app.logger.info(f'GET to UserResourceList, streaming list of users')
+            return ndjson_response(users_projection, users_projection.query(session), args)
+
+        users, next_cursor = paginate(users_projection, users_projection.query(session), args)
         app.logger.info(f'GET to UserResourceList, response with 200 and List of users')
-        return jsonify({'users': [item.to_dict(
-            only=('role', 'username', 'id')) for item in users]
-        })
+        return jsonify({'users': users, 'next_cursor': next_cursor})
 
 
 class ProjectResource(Resource):
@@ -166,13 +258,12 @@ class ProjectResource(Resource):
         # Check if project with given id exists
         abort_if_not_found(Project, args['project_id'])
 
-        session = create_session()
+        session = db_session.get_session()
         # Requested user here means user that own API key
-        requested_user = session.query(User).filter(User.API_KEY ==
-                                                    args["API_KEY"]).first()
+        requested_user = authenticate(args["API_KEY"])
 
         # If requested user doesn't exist -> throw 401 with message
-        if args['API_KEY'] == 'None' or requested_user is None:
+        if requested_user is None:
             app.logger.info(f'GET to ProjectResource passed bad API_KEY')
             abort(401, message=f'You passed bad API key')
 
@@ -180,15 +271,11 @@ class ProjectResource(Resource):
 
         # Check if user in project_members
         # If not -> throw 403
-        if requested_user not in project.members:
+        if not can_view(requested_user, project.id):
             app.logger.info(f'GET to ProjectResource, user with given API KEY doesnt have access to project')
             abort(403, message="You don't have access to this project")
 
-        return jsonify({'project': project.to_dict(
-            only=('description', 'short_project_tag', 'id', 'project_name', 'root', 'subsystems',
-                  'priorities')
-        )
-        })
+        return jsonify({'project': project.to_dict(only=PROJECT_GET_FIELDS + ('subsystems', 'priorities'))})
 
     def post(self):
         """
@@ -201,7 +288,7 @@ class ProjectResource(Resource):
         401 if BAD api key been passed
         409 If project with that project name or project tag already exist
         """
-        session = db_session.create_session()
+        session = db_session.get_session()
         args = self.project_request_args.parse_args()
         # Check if project name and project description passed
         if 'project_name' not in args.keys() or 'description' not in args.keys():
@@ -217,12 +304,12 @@ class ProjectResource(Resource):
             else:
                 short_tag = args['project_name'][:4]
         # Get user object by given API KEY
-        requested_user = session.query(User).filter(User.API_KEY ==
-                                                    args['API_KEY']).first()
+        principal = authenticate(args['API_KEY'])
         # If user doesn't exist -> throw 401 with message
-        if requested_user is None or args['API_KEY'] == 'None':
+        if principal is None:
             app.logger.info('POST to ProjectResource bad API KEY passed')
             abort(401, message=f'You passed bad API key')
+        requested_user = session.query(User).get(principal.id)
 
         project_object = session.query(Project).filter(Project.project_name == args['project_name']).first()
 
@@ -248,14 +335,9 @@ class ProjectResource(Resource):
         session.merge(project_object)
         session.commit()
 
-        upd = association_table_user_to_project.update().values(project_role='root').where(
-            association_table_user_to_project.c.member_id == requested_user.id).where(
-            association_table_user_to_project.c.project_id == project_object.id)
         project_id = project_object.id
         project_object.add_project_priorities(('Critical', 'Major', 'Minor', 'Normal'))
-        session.execute(upd)
-        session.commit()
-        session.close()
+        requested_user.change_project_role(project_id, 'root')
         return jsonify({'success': 'OK',
                         'id': f'{project_id}'})
 
@@ -263,6 +345,7 @@ class ProjectResource(Resource):
 class ProjectResourceList(Resource):
     project_list_request_args = reqparse.RequestParser()
     project_list_request_args.add_argument('API_KEY', required=True)
+    add_pagination_arguments(project_list_request_args)
 
     def get(self):
         """
@@ -272,12 +355,12 @@ class ProjectResourceList(Resource):
         """
         # Request args
         args = self.project_list_request_args.parse_args()
-        session = create_session()
+        session = db_session.get_session()
 
         # Requested user here means user that own API key
-        requested_user = session.query(User).filter(User.API_KEY == args["API_KEY"]).first()
+        requested_user = authenticate(args["API_KEY"])
         # Check if API key is equal "None" or user with this api key doesn't exist
-        if args["API_KEY"] == 'None' or requested_user is None:
+        if requested_user is None:
             app.logger.info('POST to ProjectResourceList bad API KEY passed')
             abort(401, message=f'You passed bad API key')
         # Check if requested user is admin
@@ -285,11 +368,42 @@ class ProjectResourceList(Resource):
             app.logger.info('POST to ProjectResourceList API KEY doesnt belong to ADMIN')
             abort(403, message='Only admin can access this method')
 
-        projects = session.query(Project).all()
-        return jsonify({'projects': [item.to_dict(
-            only=('description', 'short_project_tag', 'project_name', 'root')
-        ) for item in projects]
-        })
+        projects_projection = projection(Project, PROJECT_LIST_FIELDS)
+        if args['format'] == 'ndjson':
+            return ndjson_response(projects_projection, projects_projection.query(session), args)
+
+        projects, next_cursor = paginate(projects_projection, projects_projection.query(session), args)
+        return jsonify({'projects': projects, 'next_cursor': next_cursor})
+
+
+class ProjectStatsResource(Resource):
+    """
+    Implements GET request to issue statistics of Project(counts of issues by state and priority)
+    """
+    stats_request_args = reqparse.RequestParser()
+    stats_request_args.add_argument('API_KEY', required=True)
+    stats_request_args.add_argument('project_id', required=True)
+
+    def get(self):
+        """
+        :return: JSON with project_id, total, by_state, by_priority and by_state_and_priority
+        401 if API key is incorrect, 404 if project doesn't exist, 403 if user doesn't have access to project
+        """
+        args = self.stats_request_args.parse_args()
+
+        requested_user = authenticate(args['API_KEY'])
+        if requested_user is None:
+            app.logger.info('GET to ProjectStatsResource passed bad API_KEY')
+            abort(401, message=f'You passed bad API key')
+
+        abort_if_not_found(Project, args['project_id'])
+        if not can_view(requested_user, args['project_id']):
+            app.logger.info(f'GET to ProjectStatsResource, {requested_user.username} doesnt have access to project')
+            abort(403, message="You don't have access to this project")
+
+        project_id = int(args['project_id'])
+        stats = project_stats(db_session.get_session(), project_id)
+        return jsonify({'project_id': project_id, **stats})
 
 
 class IssueResource(Resource):
@@ -323,7 +437,7 @@ class IssueResource(Resource):
             app.logger.info(f'GET to IssueResource, tag has not been passed')
             abort(400, message='You did not pass the tag')
 
-        session = create_session()
+        session = db_session.get_session()
         # Check if Issue with given tag exists
         issue_object: Optional[Issue] = session.query(Issue).filter(Issue.tracking == args['tag']).first()
         if issue_object is None:
@@ -331,22 +445,19 @@ class IssueResource(Resource):
             abort(404, message=f'Issue with tag{args["tag"]} doesnt exist')
 
         # Requested user here means user that own API key
-        requested_user: Optional[User] = session.query(User).filter(User.API_KEY ==
-                                                                    args["API_KEY"]).first()
+        requested_user = authenticate(args["API_KEY"])
 
         # If requested user doesn't exist -> throw 401 with message
-        if args['API_KEY'] == 'None' or requested_user is None:
+        if requested_user is None:
             app.logger.info(f'GET to IssueResource passed bad API_KEY')
             abort(401, message=f'You passed bad API key')
 
         # Check if user has access to the Issue
-        if requested_user not in issue_object.project[0].members and not requested_user.is_admin:
+        if not can_view(requested_user, issue_object.project_id):
             app.logger.info(f'GET to IssueResource, user with given API KEY doesnt have access to project')
             abort(403, message="You don't have access to this project")
 
-        return jsonify({'issue': issue_object.to_dict(
-            only=('tracking', 'priority', 'state', 'description', 'steps_to_reproduce', 'summary', 'project_name',
-                  'assign_on'))})
+        return jsonify({'issue': issue_object.to_dict(only=ISSUE_GET_FIELDS)})
 
     def post(self):
         """
@@ -358,11 +469,11 @@ class IssueResource(Resource):
         401 if BAD api key been passed
         """
 
-        session = db_session.create_session()
-        args = self.project_request_args.parse_args()
-        # Check if project name and project description passed
-        if 'project_id' not in args.keys() or 'summary' not in args.keys() or 'steps_to_reproduce' not in args.keys() or 'description' not in args.keys() \
-                or 'state' not in args.keys() or 'priority' not in args.keys():
+        session = db_session.get_session()
+        args = self.issue_parser.parse_args()
+        # Check if all issue properties passed
+        if any(args[key] is None for key in
+               ('project_id', 'summary', 'steps_to_reproduce', 'description', 'state', 'priority')):
             app.logger.info(
                 'POST to IssueResource, 400, NotEnoughArguments ')
 
@@ -371,9 +482,9 @@ class IssueResource(Resource):
                                ' (project_id,summary,steps_to_reproduce,description,state,priority))')
 
         # Get user object
-        requested_user: Optional[User] = session.query(User).filter(User.API_KEY == args['API_KEY']).first()
+        requested_user = authenticate(args['API_KEY'])
         # Check if user exists
-        if requested_user is None or args['API_KEY'] == 'None':
+        if requested_user is None:
             abort(401, message=f'You passed bad API key')
 
         # Check if Project exists and user has access to it
@@ -385,33 +496,184 @@ class IssueResource(Resource):
         project_object = session.query(Project).filter(Project.id == args["project_id"]).first()
 
         # Check if user has access to it
-        if requested_user not in project_object.members and not requested_user.is_admin:
+        if not can_view(requested_user, project_object.id):
             app.logger.info(f'User {requested_user.username} doesnt have access to Project(project_name='
                             f'{project_object.project_name}, id={args["project_id"]}')
             abort(403, message="You don't have access to this project")
 
-        issue_object = Issue
-        all_issues = len(project_object.issues)
-        issue_object.tracking = f'{project_object.short_project_tag}-{all_issues + 1}'
+        # State and priority are stored as codes, so only known names can be saved
+        project_priorities = [row[0] for row in project_object.get_project_priorities()]
+        if args['state'] not in ISSUE_STATES or args['priority'] not in project_priorities:
+            app.logger.info(f'POST to IssueResource, 400, unknown state {args["state"]} or priority {args["priority"]}')
+            abort(400, message=f'state must be one of {", ".join(ISSUE_STATES)} and priority one of '
+                               f'{", ".join(project_priorities)}')
+
+        issue_object = Issue()
+        issue_object.tracking = project_object.next_issue_tracking()
         issue_object.summary = args['summary']
         issue_object.priority = args['priority']
         issue_object.state = args['state']
         issue_object.description = args['description']
         issue_object.steps_to_reproduce = args['steps_to_reproduce']
         issue_object.project_id = args['project_id']
-
-        project_object.issues.append(issue_object)
+        # Append issue to user and project from the issue side, so their issue lists are not loaded
+        issue_object.project.append(project_object)
+        issue_object.assignees.append(session.query(User).get(requested_user.id))
 
         issue_tag = issue_object.tracking
-        session.merge(issue_object)
-        session.commit()
-        session.refresh(issue_object)
-        issue_object.assignees.append(requested_user)
+        session.add(issue_object)
         session.commit()
         return jsonify({'success': 'OK',
                         'tag': f'{issue_tag}'})
 
 
+class IssueSearchResource(Resource):
+    """
+    Implements full-text search of issues in projects that requested user can see
+    """
+    search_parser = reqparse.RequestParser()
+    search_parser.add_argument('API_KEY', required=True)
+    search_parser.add_argument('q', required=True)
+    search_parser.add_argument('project_id', required=False)
+    search_parser.add_argument('limit', type=int, required=False, default=DEFAULT_SEARCH_LIMIT)
+
+    def get(self):
+        """
+        :return: JSON with list of found issues(tracking, summary, project_id, snippet, rank), the most relevant first
+        401 if API key is incorrect, 404 if project doesn't exist, 403 if user doesn't have access to project
+        """
+        args = self.search_parser.parse_args()
+        requested_user = authenticate(args['API_KEY'])
+        if requested_user is None:
+            app.logger.info('GET to IssueSearchResource passed bad API_KEY')
+            abort(401, message=f'You passed bad API key')
+
+        project_ids = None
+        if args['project_id'] is not None:
+            abort_if_not_found(Project, args['project_id'])
+            if not can_view(requested_user, args['project_id']):
+                app.logger.info(f'GET to IssueSearchResource, {requested_user.username} doesnt have access to project')
+                abort(403, message="You don't have access to this project")
+            project_ids = [args['project_id']]
+
+        # Admin searches in all projects, other users in projects where they are members
+        member_id = None if requested_user.is_admin else requested_user.id
+        results = search_issues(db_session.get_session(), args['q'], member_id, project_ids, args['limit'])
+        return jsonify({'issues': [{'tracking': result.tracking, 'summary': result.summary,
+                                    'project_id': result.project_id, 'snippet': str(result.snippet),
+                                    'rank': result.rank} for result in results]})
+
+
+class SavedSearchResource(Resource):
+    """
+    Implements saved searches of issues(see data.issue_query) of requested user
+    """
+    search_parser = reqparse.RequestParser()
+    search_parser.add_argument('API_KEY', required=True)
+    search_parser.add_argument('search_id', type=int, required=False)
+    search_parser.add_argument('query', required=False)
+    search_parser.add_argument('name', required=False)
+    search_parser.add_argument('limit', type=int, required=False)
+    search_parser.add_argument('after', required=False)
+
+    @staticmethod
+    def authenticate(args):
+        requested_user = authenticate(args['API_KEY'])
+        if requested_user is None:
+            app.logger.info('Request to SavedSearchResource passed bad API_KEY')
+            abort(401, message=f'You passed bad API key')
+        return requested_user
+
+    @staticmethod
+    def get_own_search(session, requested_user, search_id: int) -> SavedSearch:
+        saved_search = session.query(SavedSearch).get(search_id)
+        if saved_search is None:
+            abort(404, message=f'Saved search with id = {search_id} not found')
+        if saved_search.owner_id != requested_user.id and not requested_user.is_admin:
+            abort(403, message="You don't have access to this saved search")
+        return saved_search
+
+    @staticmethod
+    def compile(query: str) -> CompiledQuery:
+        try:
+            return compile_query(query)
+        except QuerySyntaxError as error:
+            abort(400, message=str(error))
+
+    def get(self):
+        """
+        Without search_id and query returns saved searches of user with their timing
+        With search_id runs saved search, with query runs query without saving it
+        :return: JSON with page of found issues, next_cursor and elapsed_ms
+        400 if query is invalid, 401 if API key is incorrect, 404 if search doesn't exist, 403 if it isn't yours
+        """
+        args = self.search_parser.parse_args()
+        requested_user = self.authenticate(args)
+        session = db_session.get_session()
+
+        saved_search = None
+        if args['search_id'] is not None:
+            saved_search = self.get_own_search(session, requested_user, args['search_id'])
+            compiled = self.compile(saved_search.query)
+        elif args['query'] is not None:
+            compiled = self.compile(args['query'])
+        else:
+            searches = session.query(SavedSearch).filter(SavedSearch.owner_id == requested_user.id).order_by(
+                SavedSearch.id).all()
+            return jsonify({'searches': [dict(search.to_dict(only=SAVED_SEARCH_FIELDS), average_ms=search.average_ms)
+                                         for search in searches]})
+
+        issues_projection = projection(Issue, ISSUE_LIST_FIELDS)
+        query = visible_issues(compiled.apply(issues_projection.query(session), requested_user.id), requested_user)
+        # Sorted like the saved search page, see data.issue_filters
+        try:
+            with Timer() as timer:
+                rows, next_cursor = IssueFilters(sort=compiled.sort).page(query, after=args['after'],
+                                                                          limit=page_size(args['limit']),
+                                                                          key=issues_projection.key)
+        except BadCursor as error:
+            app.logger.info(f'Bad cursor {args["after"]} passed')
+            abort(400, message=str(error))
+        issues = [issues_projection.to_dict(row) for row in rows]
+        if timer.elapsed_ms > SLOW_SEARCH_MS:
+            app.logger.warning(f'Slow search {compiled.source}: {timer.elapsed_ms:.0f} ms')
+        if saved_search is not None:
+            record_run(session, saved_search.id, timer.elapsed_ms)
+            session.commit()
+        return jsonify({'issues': issues, 'next_cursor': next_cursor, 'elapsed_ms': timer.elapsed_ms})
+
+    def post(self):
+        """
+        Saves query with name
+        :return: JSON with id of saved search, 400 if name or query is not passed or query is invalid
+        """
+        args = self.search_parser.parse_args()
+        requested_user = self.authenticate(args)
+        if not args['name'] or not args['query']:
+            abort(400, message='You did not pass name or query')
+        self.compile(args['query'])
+        session = db_session.get_session()
+        saved_search = SavedSearch(owner_id=requested_user.id, name=args['name'], query=args['query'])
+        session.add(saved_search)
+        session.commit()
+        app.logger.info(f'User {requested_user.username} saved search {args["query"]}')
+        return jsonify({'success': 'OK', 'search_id': saved_search.id})
+
+    def delete(self):
+        """
+        Deletes saved search with search_id
+        :return: JSON with success, 404 if search doesn't exist, 403 if it isn't yours
+        """
+        args = self.search_parser.parse_args()
+        requested_user = self.authenticate(args)
+        if args['search_id'] is None:
+            abort(400, message='You did not pass search_id')
+        session = db_session.get_session()
+        session.delete(self.get_own_search(session, requested_user, args['search_id']))
+        session.commit()
+        return jsonify({'success': 'OK'})
+
+
 class IssueResourceList(Resource):
     """
     Implements get request to all Issues
@@ -419,6 +681,7 @@ class IssueResourceList(Resource):
     issues_list_parser = reqparse.RequestParser()
     issues_list_parser.add_argument('API_KEY', required=True)
     issues_list_parser.add_argument('project_id', required=False)
+    add_pagination_arguments(issues_list_parser)
 
     def get(self):
         """
@@ -430,11 +693,12 @@ class IssueResourceList(Resource):
         """
 
         args = self.issues_list_parser.parse_args()
-        session = db_session.create_session()
+        session = db_session.get_session()
+        issues_projection = projection(Issue, ISSUE_LIST_FIELDS)
         app.logger.info(f'GET IssueResourceList with args{args}')
         # Check if user exists
-        requested_user: Optional[User] = session.query(User).filter(User.API_KEY == args['API_KEY']).first()
-        if requested_user is None or args['API_KEY'] == 'None':
+        requested_user = authenticate(args['API_KEY'])
+        if requested_user is None:
             app.logger.info(f'GET IssueResourceList User with API key {args["API_KEY"]} doesnt exist, return 400')
             abort(400)
         # If project_id has not been passed that's mean API should return all issues
@@ -446,34 +710,311 @@ class IssueResourceList(Resource):
                                 f'{requested_user.username} not an ADMIN, abort with 403')
                 abort(403, message='Only admin can access to list of all Issues')
 
-            issues = session.query(Issue).all()
+            issues_query = issues_projection.query(session)
             app.logger.info(f'GET IssueResourceList User({requested_user.username})'
                             f' is admin, return list with all issues')
 
-            return jsonify({'issues': [item.to_dict(
-                only=('tracking', 'priority', 'state', 'description', 'steps_to_reproduce', 'summary', 'project_name',
-                      'assign_on')
-            ) for item in issues]
-            })
-
         else:
             # Check if project exists
             app.logger.info(f'GET IssueResourceList checking if project exists ')
             abort_if_not_found(Project, args['project_id'])
-            project_object: Project = session.query(Project).filter(Project.id == args["project_id"])
+            project_object: Project = session.query(Project).filter(Project.id == args["project_id"]).first()
             app.logger.info('Project exists, check if requested user has access to it')
 
             # Check if requested user has access to project
-            if not requested_user.is_admin or requested_user not in project_object.members:
-                app.logger.info(f'GET IssueResourceList, {requested_user}'
-                                f' is admin={requested_user.is_admin},'
-                                f' has access to project={requested_user in project_object.members}')
+            if not can_view(requested_user, project_object.id):
+                app.logger.info(f'GET IssueResourceList, {requested_user.username}'
+                                f' is not admin and not member of project')
+                abort(403, message="You don't have access to this project")
             app.logger.info(f'Response to {requested_user.username} with the list of Issues')
-            # GET all project issues
-            issues = project_object.issues
-            # And, return list in response
-            return jsonify({'issues': [item.to_dict(
-                only=('tracking', 'priority', 'state', 'description', 'steps_to_reproduce', 'summary', 'project_name',
-                      'assign_on')
-            ) for item in issues]
-            })
+            # Project issues, by Issue.project_id like counts, statistics and access checks
+            issues_query = issues_projection.query(session).filter(Issue.project_id == project_object.id)
+
+        if args['format'] == 'ndjson':
+            return ndjson_response(issues_projection, issues_query, args)
+
+        # And, return page of list in response
+        issues, next_cursor = paginate(issues_projection, issues_query, args)
+        return jsonify({'issues': issues, 'next_cursor': next_cursor})
+
+
+def parse_batch_keys(values) -> list:
+    """
+    :param values: values of repeated argument, each of them can be comma separated list
+    :return: List of unique keys in order of request or abort with 400 if there are no keys or too many of them
+    """
+    keys = list(dict.fromkeys(key.strip() for value in values or () for key in value.split(',') if key.strip()))
+    if not keys:
+        abort(400, message='You did not pass any id or tag')
+    if len(keys) > MAX_BATCH_SIZE:
+        abort(400, message=f'You passed {len(keys)} ids or tags, maximum is {MAX_BATCH_SIZE}')
+    return keys
+
+
+def parse_batch_ids(keys: list) -> Dict[str, int]:
+    """
+    :return: Dict of keys that are integer ids to the ids
+    """
+    return {key: int(key) for key in keys if key.lstrip('-').isdigit()}
+
+
+def visible_project_ids(requested_user, project_ids) -> set:
+    """
+    Checks access of user to all projects by one query
+    :param requested_user: Principal of API key owner
+    :param project_ids: ids of projects
+    :return: set of ids from project_ids that user can see
+    """
+    project_ids = set(project_ids)
+    if requested_user.is_admin or not project_ids:
+        return project_ids
+    rows = db_session.get_session().execute(
+        select([association_table_user_to_project.c.project_id]).where(
+            association_table_user_to_project.c.member_id == requested_user.id).where(
+            association_table_user_to_project.c.project_id.in_(project_ids))
+    )
+    return {row[0] for row in rows}
+
+
+def batch_items(keys: list, entity: str, found: Dict[str, dict], visible: Callable[[dict], bool]) -> dict:
+    """
+    :param keys: requested ids or tags
+    :param entity: name of entity in item(e.g issue)
+    :param found: key -> dict of entity that exists
+    :param visible: function that tells whether requested user can see found entity
+    :return: key -> item with status(200, 400, 403 or 404) and entity or message
+    """
+    items = {}
+    for key in keys:
+        if key not in found:
+            items[key] = {'status': 404, 'message': f'{entity.capitalize()} {key} doesnt exist'}
+        elif not visible(found[key]):
+            items[key] = {'status': 403, 'message': f"You don't have access to {entity} {key}"}
+        else:
+            items[key] = {'status': 200, entity: found[key]}
+    return items
+
+
+class BatchResource(Resource):
+    """
+    Base of batch resources: API key is checked once for all requested entities
+    """
+    batch_parser = reqparse.RequestParser()
+    batch_parser.add_argument('API_KEY', required=True)
+    # Both ids=1,2,3 and ids=1&ids=2&ids=3 are accepted
+    batch_parser.add_argument('ids', action='append', required=False)
+    batch_parser.add_argument('tags', action='append', required=False)
+
+    def authenticate(self):
+        args = self.batch_parser.parse_args()
+        requested_user = authenticate(args['API_KEY'])
+        if requested_user is None:
+            app.logger.info(f'GET to {type(self).__name__} passed bad API_KEY')
+            abort(401, message=f'You passed bad API key')
+        return args, requested_user
+
+
+class IssueBatchResource(BatchResource):
+    """
+    Implements GET of many issues by tags
+    """
+
+    def get(self):
+        """
+        :return: JSON with item of every requested tag: status and issue like IssueResource returns
+        400 if no tags or too many tags passed, 401 if API key is incorrect
+        """
+        args, requested_user = self.authenticate()
+        tags = parse_batch_keys(args['tags'])
+        issues_projection = projection(Issue, ISSUE_GET_FIELDS + ('project_id',))
+        rows = issues_projection.query(db_session.get_session()).filter(Issue.tracking.in_(tags))
+        found = {issue['tracking']: issue for issue in map(issues_projection.to_dict, rows)}
+        visible = visible_project_ids(requested_user, (issue['project_id'] for issue in found.values()))
+        items = batch_items(tags, 'issue', found, lambda issue: issue['project_id'] in visible)
+        for item in items.values():
+            if 'issue' in item:
+                item['issue'] = {field: item['issue'][field] for field in ISSUE_GET_FIELDS}
+        app.logger.info(f'GET to IssueBatchResource, response with {len(items)} issues')
+        return jsonify({'issues': items})
+
+
+class ProjectBatchResource(BatchResource):
+    """
+    Implements GET of many projects by ids
+    """
+
+    def get(self):
+        """
+        :return: JSON with item of every requested id: status and project like ProjectResource returns
+        400 if no ids or too many ids passed, 401 if API key is incorrect
+        """
+        args, requested_user = self.authenticate()
+        keys = parse_batch_keys(args['ids'])
+        ids = parse_batch_ids(keys)
+        session = db_session.get_session()
+        projects_projection = projection(Project, PROJECT_GET_FIELDS)
+        rows = projects_projection.query(session).filter(Project.id.in_(ids.values()))
+        by_id = {project['id']: project for project in map(projects_projection.to_dict, rows)}
+        visible = visible_project_ids(requested_user, by_id)
+
+        # Priorities and subsystems of visible projects, one query for each of them
+        for project_id in visible:
+            by_id[project_id].update(priorities=[], subsystems=[])
+        for table, column, field in ((association_table_priority_to_project, 'priority', 'priorities'),
+                                     (association_table_subsystems_to_project, 'subsystem', 'subsystems')):
+            if not visible:
+                break
+            rows = session.execute(select([table.c.project_id, table.c[column]]).where(
+                table.c.project_id.in_(visible)).order_by(table.c.project_id, table.c[column]))
+            for project_id, value in rows:
+                by_id[project_id][field].append([value])
+
+        found = {key: by_id[project_id] for key, project_id in ids.items() if project_id in by_id}
+        items = batch_items(keys, 'project', found, lambda project: project['id'] in visible)
+        for key in keys:
+            if key not in ids:
+                items[key] = {'status': 400, 'message': f'Project id must be integer, not {key}'}
+        app.logger.info(f'GET to ProjectBatchResource, response with {len(items)} projects')
+        return jsonify({'projects': items})
+
+
+class UserBatchResource(BatchResource):
+    """
+    Implements GET of many users by ids
+    """
+
+    def get(self):
+        """
+        :return: JSON with item of every requested id: status and user like UserResource returns
+        400 if no ids or too many ids passed, 401 if API key is incorrect
+        """
+        args, requested_user = self.authenticate()
+        keys = parse_batch_keys(args['ids'])
+        ids = parse_batch_ids(keys)
+        users_projection = projection(User, USER_LIST_FIELDS)
+        rows = users_projection.query(db_session.get_session()).filter(User.id.in_(ids.values()))
+        by_id = {user['id']: user for user in map(users_projection.to_dict, rows)}
+        found = {key: by_id[user_id] for key, user_id in ids.items() if user_id in by_id}
+        # Like UserResource, every user can get info about other users
+        items = batch_items(keys, 'user', found, lambda user: True)
+        for key in keys:
+            if key not in ids:
+                items[key] = {'status': 400, 'message': f'User id must be integer, not {key}'}
+        app.logger.info(f'GET to UserBatchResource, response with {len(items)} users')
+        return jsonify({'users': items})
+
+
+class IssueBulkResource(Resource):
+    """
+    Implements creation of many issues and change of many issues in one transaction, see data.issue_bulk
+    Issues and changes are passed in JSON body, API key can be passed in body or in query string
+    """
+    bulk_parser = reqparse.RequestParser()
+    bulk_parser.add_argument('API_KEY', required=True)
+    bulk_parser.add_argument('project_id', type=int, required=False)
+    # Items aren't checked by parser, wrong items get their own status 400 in results
+    bulk_parser.add_argument('issues', type=json_list, location='json', required=False)
+    bulk_parser.add_argument('tags', action='append', required=False)
+    bulk_parser.add_argument('query', required=False)
+    bulk_parser.add_argument('changes', type=dict, location='json', required=False)
+
+    def authenticate(self):
+        args = self.bulk_parser.parse_args()
+        requested_user = authenticate(args['API_KEY'])
+        if requested_user is None:
+            app.logger.info(f'{request.method} to IssueBulkResource passed bad API_KEY')
+            abort(401, message=f'You passed bad API key')
+        return args, requested_user
+
+    @staticmethod
+    def check_size(count: int, entity: str) -> None:
+        if not count:
+            abort(400, message=f'You did not pass any {entity}')
+        if count > MAX_BULK_SIZE:
+            abort(400, message=f'You passed {count} {entity}, maximum is {MAX_BULK_SIZE}')
+
+    def post(self):
+        """
+        Creates issues in project and assigns them on requested user
+        :return: JSON with result of every issue in order of request: status 200 and tag or status 400 and message
+        400 if project_id or issues have not been passed or there are too many issues
+        401 if API key is incorrect, 403 if user doesnt have access to project, 404 if project doesnt exist
+        """
+        args, requested_user = self.authenticate()
+        if args['project_id'] is None:
+            abort(400, message='You did not pass project_id')
+        self.check_size(len(args['issues'] or ()), 'issues')
+
+        session = db_session.get_session()
+        project = session.query(Project).get(args['project_id'])
+        if project is None:
+            abort(404, message=f'Project with id = {args["project_id"]} not found')
+        if not can_view(requested_user, project.id):
+            app.logger.info(f'POST to IssueBulkResource, {requested_user.username} doesnt have access to project')
+            abort(403, message="You don't have access to this project")
+
+        results = create_issues(session, project, args['issues'], requested_user.id)
+        session.commit()
+        created = sum(result['status'] == 200 for result in results)
+        app.logger.info(f'POST to IssueBulkResource, {requested_user.username} created {created} issues '
+                        f'of {len(results)} in project {project.id}')
+        return jsonify({'success': 'OK', 'created': created, 'issues': results})
+
+    def patch(self):
+        """
+        Applies changes of state, priority and assignee(username) to issues selected by tags or by issue query
+        :return: JSON with result of every issue by tag: status 200, 400 if change isn't allowed in project of issue,
+        403 if user doesnt have access to issue or 404 if issue with passed tag doesnt exist
+        400 if changes are wrong, both or none of tags and query have been passed or there are too many issues
+        401 if API key is incorrect, 404 if assignee doesnt exist
+        """
+        args, requested_user = self.authenticate()
+        if (args['tags'] is None) == (args['query'] is None):
+            abort(400, message='You must pass either tags or query')
+        try:
+            changes = check_changes(args['changes'])
+        except BulkError as error:
+            abort(400, message=str(error))
+
+        session = db_session.get_session()
+        assignee = None
+        if 'assignee' in changes:
+            assignee = session.query(User).filter(User.username == changes['assignee']).first()
+            if assignee is None:
+                abort(404, message=f'User {changes["assignee"]} doesnt exist')
+
+        results = {}
+        if args['tags'] is not None:
+            tags = list(dict.fromkeys(tag.strip() for value in args['tags'] for tag in value.split(',')
+                                      if tag.strip()))
+            self.check_size(len(tags), 'tags')
+            # Results are in order of tags
+            results = dict.fromkeys(tags)
+            targets = [target for chunk in range(0, len(tags), BULK_CHUNK_SIZE) for target in select_targets(
+                target_query(session).filter(Issue.tracking.in_(tags[chunk:chunk + BULK_CHUNK_SIZE])))]
+            visible = visible_project_ids(requested_user, (target.project_id for target in targets))
+            found = {target.tracking for target in targets}
+            for tag in tags:
+                if tag not in found:
+                    results[tag] = {'status': 404, 'message': f'Issue {tag} doesnt exist'}
+            for target in targets:
+                if target.project_id not in visible:
+                    results[target.tracking] = {'status': 403, 'message': f"You don't have access to issue "
+                                                                          f"{target.tracking}"}
+            targets = [target for target in targets if target.project_id in visible]
+        else:
+            try:
+                compiled = compile_query(args['query'])
+            except QuerySyntaxError as error:
+                abort(400, message=str(error))
+            targets = select_targets(visible_issues(compiled.apply(target_query(session), requested_user.id),
+                                                    requested_user).limit(MAX_BULK_SIZE + 1))
+            if len(targets) > MAX_BULK_SIZE:
+                abort(400, message=f'Query matches more than {MAX_BULK_SIZE} issues')
+
+        results.update(update_issues(session, targets, changes, assignee))
+        session.commit()
+        changed = sum(result['status'] == 200 for result in results.values())
+        app.logger.info(f'PATCH to IssueBulkResource, {requested_user.username} changed {changed} issues '
+                        f'of {len(results)}')
+        return jsonify({'success': 'OK', 'changed': changed, 'issues': results})
@@ -0,0 +1,89 @@
+"""
+Serialization of API lists without ORM objects
+Every set of fields is compiled once into list of SQL columns, so list query selects only returned columns
+and rows are turned into dicts by zip instead of reflective SerializerMixin.to_dict
+"""
+import functools
+from typing import Any, Callable, Dict, Tuple
+
+from sqlalchemy import orm, select
+
+from data.models import User, Project, Issue, association_table_user_to_issue
+
+
+def _issue_project_name():
+    # Like Issue.project_name(), but by Issue.project_id that lists, counts and access checks use
+    return select([Project.project_name]).where(Project.id == Issue.project_id).as_scalar()
+
+
+def _issue_assign_on():
+    # Same as Issue.assign_on()
+    return select([User.username]).where(
+        User.id == association_table_user_to_issue.c.user_id
+    ).where(
+        association_table_user_to_issue.c.issue_id == Issue.id
+    ).limit(1).as_scalar()
+
+
+def _project_root():
+    # Same as Project.root()
+    return select([User.username]).where(User.id == Project.root_user_id).as_scalar()
+
+
+# Fields that are methods of models, compiled into correlated subqueries
+COMPUTED_FIELDS: Dict[type, Dict[str, Callable]] = {
+    Issue: {'project_name': _issue_project_name, 'assign_on': _issue_assign_on},
+    Project: {'root': _project_root},
+}
+
+
+class Projection:
+    """
+    Set of model fields compiled into SQL columns
+    The first selected column is always model id, it is the key of keyset pagination
+    """
+
+    def __init__(self, model, fields: Tuple[str, ...]):
+        self.model = model
+        self.fields = fields
+        self.key_column = model.id
+        self.columns = [model.id.label('_key')]
+        computed = COMPUTED_FIELDS.get(model, {})
+        for field in fields:
+            if field in computed:
+                self.columns.append(computed[field]().label(field))
+                continue
+            attribute = getattr(model, field, None)
+            if not isinstance(getattr(attribute, 'property', None), orm.ColumnProperty):
+                raise ValueError(f'{model.__name__}.{field} is neither column nor computed field')
+            self.columns.append(attribute.label(field))
+
+    def query(self, session: orm.Session) -> orm.Query:
+        """
+        :return: Query that selects rows of projection, it can be filtered like query of model
+        """
+        return session.query(*self.columns)
+
+    def to_dict(self, row) -> Dict[str, Any]:
+        """
+        :param row: row selected by query()
+        :return: Dict like model.to_dict(only=fields) returns
+        """
+        return dict(zip(self.fields, row[1:]))
+
+    @staticmethod
+    def key(row) -> int:
+        """
+        :return: model id of the row, for keyset pagination
+        """
+        return row[0]
+
+
+@functools.lru_cache(maxsize=None)
+def projection(model, fields: Tuple[str, ...]) -> Projection:
+    """
+    :param model: Model class, e.g Issue
+    :param fields: tuple of column names and computed fields, see COMPUTED_FIELDS
+    :return: Projection compiled on the first call with such arguments
+    """
+    return Projection(model, fields)
@@ -0,0 +1,153 @@
+"""
+Generator of realistic synthetic databases for benchmarks
+Popularity of projects and users follows Zipf law: a few projects have most of members and issues,
+a few users are members of many projects. The same seed gives the same database
+
+Users and projects are inserted by bulk mappings of models, issues by data.issue_bulk.insert_issues,
+so tracking numbers, full-text index and project statistics are the same as in real database
+
+Run from project folder: python -m benchmarks.dataset --db path/to/database.sqlite
+Default sizes(50k users, 5k projects, 2M issues) take a while, use smaller ones for quick runs
+"""
+import argparse
+import datetime
+import hashlib
+import itertools
+import random
+import time
+
+from collections import Counter
+from typing import List
+
+from benchmarks.fts_search import sentence
+from data import db_session
+from data.issue_bulk import insert_issues
+from data.models import (User, Project, ISSUE_PRIORITIES, ISSUE_STATES, association_table_priority_to_project,
+                         association_table_subsystems_to_project, association_table_user_to_project)
+
+# Issues inserted by one transaction
+CHUNK_SIZE = 10000
+# Password of every generated user
+PASSWORD = 'benchmark'
+SUBSYSTEMS = ('UI', 'API', 'Database', 'Auth', 'Search', 'Reports')
+# Issues are mostly closed, and most of them have Normal or Major priority
+STATE_WEIGHTS = (20, 5, 50, 10, 5, 10)
+PRIORITY_WEIGHTS = (5, 25, 20, 50)
+
+
+def api_key(user_id: int) -> str:
+    """
+    :return: API key of generated user, benchmarks use it to call API on behalf of user
+    """
+    return f'BENCH{user_id:019d}'
+
+
+def zipf_weights(count: int, exponent: float) -> List[float]:
+    """
+    :return: cumulative weights of count items, item with lower index is more popular
+    """
+    return list(itertools.accumulate(1 / rank ** exponent for rank in range(1, count + 1)))
+
+
+def generate(session, users: int, projects: int, issues: int, members_per_project: int = 10, seed: int = 1,
+             log=print) -> None:
+    """
+    Fills empty database with users, projects with members, priorities and subsystems and issues
+    :param session: Session of empty database
+    :param users: count of users, the first one is site admin
+    :param projects: count of projects
+    :param issues: count of issues
+    :param members_per_project: average count of project members
+    :param seed: seed of random generator
+    :param log: function that prints progress
+    """
+    generator = random.Random(seed)
+    now = datetime.datetime.now()
+    password_hash = hashlib.new('md5', PASSWORD.encode()).hexdigest()
+
+    session.bulk_insert_mappings(User, [
+        {'id': user_id, 'username': f'user{user_id}', 'hashed_password': password_hash, 'API_KEY': api_key(user_id),
+         'role': 'Admin' if user_id == 1 else 'User', 'created_date': now - datetime.timedelta(days=user_id % 1000)}
+        for user_id in range(1, users + 1)
+    ])
+    user_weights = zipf_weights(users, 1.0)
+    project_weights = zipf_weights(projects, 1.1)
+    total_weight = project_weights[-1]
+
+    members = {}
+    for project_id in range(1, projects + 1):
+        weight = project_weights[project_id - 1] - (project_weights[project_id - 2] if project_id > 1 else 0)
+        size = max(1, min(users, round(members_per_project * projects * weight / total_weight)))
+        # Popular users are members of many projects, the rest of members are uniform
+        chosen = generator.choices(range(1, users + 1), cum_weights=user_weights, k=size // 2)
+        chosen += generator.sample(range(1, users + 1), size - size // 2)
+        members[project_id] = list(dict.fromkeys(chosen))
+
+    session.bulk_insert_mappings(Project, [
+        {'id': project_id, 'project_name': f'Project {project_id}', 'short_project_tag': f'P{project_id}',
+         'description': sentence(generator, 10), 'root_user_id': members[project_id][0],
+         'created_date': now - datetime.timedelta(days=project_id % 1000)}
+        for project_id in range(1, projects + 1)
+    ])
+    session.execute(association_table_user_to_project.insert(), [
+        {'member_id': user_id, 'project_id': project_id, 'date_of_add': now,
+         'project_role': 'root' if index == 0 else ('manager' if index % 10 == 1 else 'developer')}
+        for project_id, project_members in members.items() for index, user_id in enumerate(project_members)
+    ])
+    session.execute(association_table_priority_to_project.insert(), [
+        {'project_id': project_id, 'priority': priority}
+        for project_id in range(1, projects + 1) for priority in ISSUE_PRIORITIES
+    ])
+    session.execute(association_table_subsystems_to_project.insert(), [
+        {'project_id': project_id, 'subsystem': subsystem}
+        for project_id in range(1, projects + 1) for subsystem in generator.sample(SUBSYSTEMS, 2)
+    ])
+    session.commit()
+    log(f'Generated {users} users and {projects} projects with {sum(map(len, members.values()))} members')
+
+    counts = Counter(generator.choices(range(1, projects + 1), cum_weights=project_weights, k=issues))
+    created = 0
+    started = time.perf_counter()
+    for project_id in sorted(counts):
+        left = counts[project_id]
+        while left:
+            size = min(left, CHUNK_SIZE)
+            insert_issues(session, project_id, f'P{project_id}', [
+                {'summary': sentence(generator, 6), 'description': sentence(generator, 30),
+                 'steps_to_reproduce': sentence(generator, 15),
+                 'state': generator.choices(ISSUE_STATES, weights=STATE_WEIGHTS)[0],
+                 'priority': generator.choices(ISSUE_PRIORITIES, weights=PRIORITY_WEIGHTS)[0],
+                 'date_of_creation': now - datetime.timedelta(minutes=generator.randint(0, 2 * 365 * 24 * 60)),
+                 'assignee_ids': [generator.choice(members[project_id])]}
+                for _ in range(size)
+            ])
+            session.commit()
+            left -= size
+            created += size
+            if created % (CHUNK_SIZE * 10) < size:
+                log(f'Generated {created} issues, {created / (time.perf_counter() - started):.0f} issues/sec')
+    log(f'Generated {created} issues in {time.perf_counter() - started:.1f}s')
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--db', required=True, help='Database file, it must not exist')
+    parser.add_argument('--users', type=int, default=50000)
+    parser.add_argument('--projects', type=int, default=5000)
+    parser.add_argument('--issues', type=int, default=2000000)
+    parser.add_argument('--members-per-project', type=int, default=10, help='Average count of project members')
+    parser.add_argument('--seed', type=int, default=1)
+    args = parser.parse_args()
+
+    engine = db_session.create_engine(args.db)
+    db_session.upgrade_database(engine)
+    session = db_session.create_session_factory(engine)()
+    if session.query(User.id).first() is not None:
+        parser.error(f'Database {args.db} is not empty')
+    generate(session, args.users, args.projects, args.issues, args.members_per_project, args.seed)
+    session.close()
+    engine.dispose()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,96 @@
+"""
+Benchmark of full-text search of issues(see data.search)
+Compares FTS5 search with LIKE scan of the same text columns on synthetic issues
+Synthetic text has 40 words only, so every common word is found in most issues and its search ranks them all
+
+Run from project folder: python -m benchmarks.fts_search
+Seeding of 1M issues takes a few minutes, use --rows for quick runs
+"""
+import argparse
+import os
+import random
+import statistics
+import tempfile
+import time
+
+from data import db_session
+from data.models import Project, ISSUE_PRIORITIES, ISSUE_STATES
+from data.search import search_issues
+
+WORDS = ('login crash button page error timeout upload file image profile settings password email server '
+         'database cache report export import search filter sort list table chart menu dialog form field '
+         'token session cookie api key request response status code message notification').split()
+
+LIKE_SQL = ("SELECT id FROM issues WHERE (summary LIKE :pattern OR description LIKE :pattern "
+            "OR steps_to_reproduce LIKE :pattern) LIMIT 20")
+
+
+def sentence(generator: random.Random, length: int) -> str:
+    return ' '.join(generator.choice(WORDS) for _ in range(length))
+
+
+def seed(session, rows: int, seed_value: int) -> None:
+    generator = random.Random(seed_value)
+    session.add(Project(id=1, project_name='Benchmark', short_project_tag='BENCH', description=''))
+    session.commit()
+    connection = session.connection()
+    # Raw insert takes codes of state and priority, see models.LookupCode
+    state, priority = ISSUE_STATES.index('Unresolved') + 1, ISSUE_PRIORITIES.index('Normal') + 1
+    batch = 10000
+    for start in range(1, rows + 1, batch):
+        # Words not from WORDS make every issue unique, so searched word is rare
+        connection.execute(
+            'INSERT INTO issues (id, tracking, project_id, state, priority, summary, description, steps_to_reproduce) '
+            'VALUES (?, ?, 1, ?, ?, ?, ?, ?)',
+            [(i, f'BENCH-{i}', state, priority, f'{sentence(generator, 6)} unique{i}',
+              sentence(generator, 30), sentence(generator, 15))
+             for i in range(start, min(start + batch, rows + 1))]
+        )
+    session.commit()
+
+
+def measure(function, queries) -> list:
+    timings = []
+    for query in queries:
+        started = time.perf_counter()
+        function(query)
+        timings.append((time.perf_counter() - started) * 1000)
+    return timings
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--rows', type=int, default=1000000, help='Issues created before benchmark')
+    parser.add_argument('--queries', type=int, default=50, help='Searches of every kind')
+    parser.add_argument('--seed', type=int, default=1)
+    args = parser.parse_args()
+
+    db_file = os.path.join(tempfile.mkdtemp(), 'fts.sqlite')
+    engine = db_session.create_engine(db_file)
+    db_session.upgrade_database(engine)
+    session = db_session.create_session_factory(engine)()
+    started = time.perf_counter()
+    seed(session, args.rows, args.seed)
+    print(f'Seeded {args.rows} issues in {time.perf_counter() - started:.1f}s')
+
+    generator = random.Random(args.seed)
+    # Rare word(one issue) and common pair of words(many issues)
+    rare = [f'unique{generator.randint(1, args.rows)}' for _ in range(args.queries)]
+    common = [f'{generator.choice(WORDS)} {generator.choice(WORDS)}' for _ in range(args.queries)]
+
+    kinds = (
+        ('fts rare word', lambda query: search_issues(session, query), rare),
+        ('fts common words', lambda query: search_issues(session, query), common),
+        ('LIKE rare word', lambda query: session.execute(LIKE_SQL, {'pattern': f'%{query}%'}).fetchall(), rare),
+    )
+    print(f'{"search":<20}{"median ms":>12}{"p95 ms":>12}')
+    for name, function, queries in kinds:
+        timings = sorted(measure(function, queries))
+        p95 = timings[min(len(timings) - 1, int(len(timings) * 0.95))]
+        print(f'{name:<20}{statistics.median(timings):>12.2f}{p95:>12.2f}')
+    session.close()
+    engine.dispose()
+
+
+if __name__ == '__main__':
+    main()
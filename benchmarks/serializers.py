@@ -0,0 +1,87 @@
+"""
+Benchmark of API list serialization
+Compares SerializerMixin.to_dict over ORM objects with compiled projections of api.serializers
+on the issue list fields returned by IssueResourceList
+
+Run from project folder: python -m benchmarks.serializers
+"""
+import argparse
+import os
+import tempfile
+import time
+
+from sqlalchemy import orm
+
+from api.resources import ISSUE_LIST_FIELDS
+from api.serializers import projection
+from data import db_session
+from data.models import User, Project, Issue, association_table_project_to_issue, association_table_user_to_issue
+from data.pagination import keyset_chunks
+
+
+def seed(session, rows: int) -> None:
+    user = User(username='benchmark', hashed_password='', API_KEY='BENCHMARK', role='user')
+    project = Project(project_name='Benchmark', short_project_tag='BENCH', description='')
+    session.add_all([user, project])
+    session.flush()
+    session.bulk_insert_mappings(Issue, [
+        {'id': i, 'tracking': f'BENCH-{i}', 'summary': f'Issue {i}', 'state': 'Unresolved', 'priority': 'Normal',
+         'description': 'Long description ' * 50, 'steps_to_reproduce': 'Long steps ' * 50,
+         'project_id': project.id}
+        for i in range(1, rows + 1)
+    ])
+    session.execute(association_table_project_to_issue.insert(),
+                    [{'issue_id': i, 'project_id': project.id} for i in range(1, rows + 1)])
+    session.execute(association_table_user_to_issue.insert(),
+                    [{'issue_id': i, 'user_id': user.id} for i in range(1, rows + 1)])
+    session.commit()
+
+
+def orm_to_dict(session, page_size: int) -> int:
+    query = session.query(Issue).options(orm.selectinload('project'), orm.selectinload('assignees'))
+    count = 0
+    for chunk in keyset_chunks(query, Issue.id, page_size):
+        count += len([item.to_dict(only=ISSUE_LIST_FIELDS) for item in chunk])
+    return count
+
+
+def compiled_projection(session, page_size: int) -> int:
+    issues_projection = projection(Issue, ISSUE_LIST_FIELDS)
+    count = 0
+    for chunk in keyset_chunks(issues_projection.query(session), issues_projection.key_column, page_size,
+                               key=issues_projection.key):
+        count += len([issues_projection.to_dict(row) for row in chunk])
+    return count
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--rows', type=int, default=20000, help='Issues created before benchmark')
+    parser.add_argument('--page-size', type=int, default=100)
+    parser.add_argument('--repeat', type=int, default=3, help='Runs of every serializer, the best one is shown')
+    args = parser.parse_args()
+
+    db_file = os.path.join(tempfile.mkdtemp(), 'serializers.sqlite')
+    engine = db_session.create_engine(db_file)
+    db_session.SqlAlchemyBase.metadata.create_all(engine)
+    factory = db_session.create_session_factory(engine)
+    session = factory()
+    seed(session, args.rows)
+
+    print(f'{"serializer":<22}{"seconds":>10}{"rows/sec":>12}')
+    for name, serializer in (('to_dict', orm_to_dict), ('projection', compiled_projection)):
+        best = None
+        for _ in range(args.repeat):
+            # Fresh session, so identity map doesn't keep objects of previous run
+            session.close()
+            started = time.perf_counter()
+            assert serializer(session, args.page_size) == args.rows
+            elapsed = time.perf_counter() - started
+            best = elapsed if best is None else min(best, elapsed)
+        print(f'{name:<22}{best:>10.3f}{args.rows / best:>12.0f}')
+    session.close()
+    engine.dispose()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,103 @@
+"""
+Benchmark of SQLite connection profiles(see data.db_session.SQLITE_PROFILES)
+Measures read throughput while writers are creating issues at the same time
+
+Run from project folder: python -m benchmarks.sqlite_profiles
+"""
+import argparse
+import os
+import random
+import tempfile
+import threading
+import time
+
+from sqlalchemy.exc import OperationalError
+
+from data import db_session
+from data.models import Issue, Project
+
+
+def seed(factory, rows: int) -> None:
+    session = factory()
+    project = Project(project_name='Benchmark', short_project_tag='BENCH', description='')
+    session.add(project)
+    session.flush()
+    session.bulk_insert_mappings(Issue, [
+        {'tracking': f'BENCH-{i}', 'summary': f'Issue {i}', 'state': 'Unresolved', 'priority': 'Normal',
+         'description': 'Benchmark issue', 'steps_to_reproduce': '', 'project_id': project.id}
+        for i in range(1, rows + 1)
+    ])
+    session.commit()
+    session.close()
+
+
+def run_profile(profile: str, rows: int, readers: int, writers: int, duration: float) -> dict:
+    """
+    :return: Dict with count of reads, writes and failed writes made in duration seconds
+    """
+    db_file = os.path.join(tempfile.mkdtemp(), f'{profile}.sqlite')
+    engine = db_session.create_engine(db_file, profile, pool_size=readers + writers)
+    db_session.SqlAlchemyBase.metadata.create_all(engine)
+    factory = db_session.create_session_factory(engine, profile)
+    seed(factory, rows)
+
+    result = {'reads': 0, 'writes': 0, 'write_errors': 0}
+    result_lock = threading.Lock()
+    stop_at = time.perf_counter() + duration
+
+    def reader():
+        reads = 0
+        session = factory()
+        while time.perf_counter() < stop_at:
+            session.query(Issue).filter(Issue.tracking == f'BENCH-{random.randint(1, rows)}').first()
+            session.rollback()
+            reads += 1
+        session.close()
+        with result_lock:
+            result['reads'] += reads
+
+    def writer(number):
+        writes, errors = 0, 0
+        session = factory()
+        while time.perf_counter() < stop_at:
+            session.add(Issue(tracking=f'W{number}-{writes + errors}', summary='New issue', state='Unresolved',
+                              priority='Normal', description='', steps_to_reproduce=''))
+            try:
+                session.commit()
+                writes += 1
+            except OperationalError:
+                # database is locked
+                session.rollback()
+                errors += 1
+        session.close()
+        with result_lock:
+            result['writes'] += writes
+            result['write_errors'] += errors
+
+    threads = [threading.Thread(target=reader) for _ in range(readers)]
+    threads += [threading.Thread(target=writer, args=(i,)) for i in range(writers)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    engine.dispose()
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--rows', type=int, default=20000, help='Issues created before benchmark')
+    parser.add_argument('--readers', type=int, default=4)
+    parser.add_argument('--writers', type=int, default=2)
+    parser.add_argument('--duration', type=float, default=5.0, help='Seconds per profile')
+    args = parser.parse_args()
+
+    print(f'{"profile":<12}{"reads/sec":>12}{"writes/sec":>12}{"failed writes":>15}')
+    for profile in db_session.SQLITE_PROFILES:
+        result = run_profile(profile, args.rows, args.readers, args.writers, args.duration)
+        print(f'{profile:<12}{result["reads"] / args.duration:>12.0f}{result["writes"] / args.duration:>12.0f}'
+              f'{result["write_errors"]:>15}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,227 @@
+"""
+End-to-end benchmark of main pages and API resources on generated database(see benchmarks.dataset)
+Every scenario is requested through app.test_client(), so time includes routing, templates and serialization
+For every scenario latency percentiles, SQL statements per request and peak memory of one request are recorded
+and compared with baseline JSON: more statements or p95 and memory worse than baseline by tolerance are regressions
+
+Run from project folder:
+    python -m benchmarks.dataset --db /tmp/bench.sqlite --users 5000 --projects 500 --issues 200000
+    python -m benchmarks.suite --db /tmp/bench.sqlite [--save-baseline]
+Exit code is 1 if there are regressions
+Only read requests are measured, so the database stays the same between runs
+"""
+import argparse
+import json
+import os
+import statistics
+import sys
+import time
+import tracemalloc
+
+from typing import Dict, List, NamedTuple, Optional
+
+import sqlalchemy
+
+BASELINE = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'baseline.json')
+# Requests before measurement, they fill caches of app and SQLite
+WARMUP_REQUESTS = 3
+# Slowdown of p95 smaller than this is noise even if it is larger than tolerance, e.g 6 ms against 4 ms
+MIN_SLOWDOWN_MS = 5
+
+
+class Scenario(NamedTuple):
+    name: str
+    path: str
+    # User.id of logged in user for pages, API requests pass API key in path instead
+    user_id: Optional[int] = None
+
+
+class Targets(NamedTuple):
+    """
+    Entities that scenarios request: the biggest project, its root, its newest issue and site admin
+    """
+    project_id: int
+    project_tag: str
+    root_id: int
+    root_key: str
+    admin_key: str
+    issue_tag: str
+    tags: List[str]
+    dataset: dict
+
+
+def percentile(timings: List[float], fraction: float) -> float:
+    """
+    :param timings: sorted timings
+    :param fraction: e.g 0.95
+    :return: nearest-rank percentile
+    """
+    return timings[min(len(timings) - 1, int(len(timings) * fraction))]
+
+
+def find_targets(session) -> Targets:
+    from data.models import Issue, Project, ProjectIssueStats, User
+    project_id = session.query(ProjectIssueStats.project_id).group_by(ProjectIssueStats.project_id).order_by(
+        sqlalchemy.func.sum(ProjectIssueStats.issue_count).desc()).limit(1).scalar()
+    project = session.query(Project).get(project_id)
+    tags = [row[0] for row in session.query(Issue.tracking).filter(Issue.project_id == project_id).order_by(
+        Issue.id.desc()).limit(50)]
+    return Targets(
+        project_id=project_id,
+        project_tag=project.short_project_tag,
+        root_id=project.root_user_id,
+        root_key=session.query(User.API_KEY).filter(User.id == project.root_user_id).scalar(),
+        admin_key=session.query(User.API_KEY).filter(User.role == 'Admin').order_by(User.id).limit(1).scalar(),
+        issue_tag=tags[0],
+        tags=tags,
+        dataset={'users': session.query(User).count(), 'projects': session.query(Project).count(),
+                 'issues': session.query(Issue).count()},
+    )
+
+
+def scenarios(targets: Targets, api_ver: str) -> List[Scenario]:
+    api = f'/api/v{api_ver}'
+    key, admin_key = targets.root_key, targets.admin_key
+    project_id, root_id = targets.project_id, targets.root_id
+    tags = ','.join(targets.tags)
+    return [
+        Scenario('project', f'/projects/{project_id}', root_id),
+        Scenario('project_issues', f'/projects/{project_id}/issues', root_id),
+        Scenario('project_issues_filtered', f'/projects/{project_id}/issues?state=Unresolved&sort=priority', root_id),
+        Scenario('project_members', f'/projects/{project_id}/manage/members', root_id),
+        Scenario('issue', f'/issue/{targets.issue_tag}', root_id),
+        Scenario('api_user', f'{api}/user/?API_KEY={key}&user_id={root_id}'),
+        Scenario('api_users', f'{api}/users/?API_KEY={admin_key}'),
+        Scenario('api_project', f'{api}/project/?API_KEY={key}&project_id={project_id}'),
+        Scenario('api_projects', f'{api}/projects/?API_KEY={admin_key}'),
+        Scenario('api_project_stats', f'{api}/project/stats/?API_KEY={key}&project_id={project_id}'),
+        Scenario('api_issue', f'{api}/issue/?API_KEY={key}&tag={targets.issue_tag}'),
+        Scenario('api_issues', f'{api}/issues/?API_KEY={key}&project_id={project_id}'),
+        Scenario('api_issue_search', f'{api}/issues/search/?API_KEY={key}&q=login+crash&project_id={project_id}'),
+        Scenario('api_saved_search_query', f'{api}/searches/?API_KEY={key}&query=state:Unresolved+assignee:me'),
+        Scenario('api_issues_batch', f'{api}/issues/batch/?API_KEY={key}&tags={tags}'),
+        Scenario('api_projects_batch', f'{api}/projects/batch/?API_KEY={key}&ids={project_id},1,2,3'),
+        Scenario('api_users_batch', f'{api}/users/batch/?API_KEY={key}&ids={root_id},1,2,3'),
+    ]
+
+
+def client_for(app, scenario: Scenario):
+    client = app.test_client()
+    if scenario.user_id is not None:
+        with client.session_transaction() as session:
+            session['_user_id'] = str(scenario.user_id)
+            session['_fresh'] = True
+    return client
+
+
+def run_scenario(app, engine, scenario: Scenario, requests: int) -> dict:
+    """
+    :return: latency percentiles in ms, median count of SQL statements and peak memory of one request in KB
+    """
+    client = client_for(app, scenario)
+    for _ in range(WARMUP_REQUESTS):
+        response = client.get(scenario.path)
+        if response.status_code != 200:
+            raise RuntimeError(f'{scenario.name}: GET {scenario.path} returned {response.status_code}')
+
+    statements = []
+
+    def count_statement(*args):
+        statements.append(args[2])
+
+    sqlalchemy.event.listen(engine, 'before_cursor_execute', count_statement)
+    timings, counts = [], []
+    try:
+        for _ in range(requests):
+            statements.clear()
+            started = time.perf_counter()
+            client.get(scenario.path)
+            timings.append((time.perf_counter() - started) * 1000)
+            counts.append(len(statements))
+    finally:
+        sqlalchemy.event.remove(engine, 'before_cursor_execute', count_statement)
+
+    # Memory is traced by separate request, tracing slows down everything
+    tracemalloc.start()
+    client.get(scenario.path)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    timings.sort()
+    return {'p50_ms': round(percentile(timings, 0.5), 2), 'p95_ms': round(percentile(timings, 0.95), 2),
+            'p99_ms': round(percentile(timings, 0.99), 2), 'queries': int(statistics.median(counts)),
+            'peak_kb': round(peak / 1024)}
+
+
+def compare(results: Dict[str, dict], baseline: Dict[str, dict], tolerance: float) -> List[str]:
+    """
+    :param results: scenario -> measurements of this run
+    :param baseline: scenario -> measurements of baseline
+    :param tolerance: allowed relative growth of p95 and memory, e.g 0.25, see also MIN_SLOWDOWN_MS
+    :return: messages about regressions
+    """
+    regressions = []
+    for name, result in results.items():
+        expected = baseline.get(name)
+        if expected is None:
+            continue
+        if result['queries'] > expected['queries']:
+            regressions.append(f'{name}: {result["queries"]} queries, baseline {expected["queries"]}')
+        if result['p95_ms'] > max(expected['p95_ms'] * (1 + tolerance), expected['p95_ms'] + MIN_SLOWDOWN_MS):
+            regressions.append(f'{name}: p95 {result["p95_ms"]} ms, baseline {expected["p95_ms"]} ms')
+        if result['peak_kb'] > expected['peak_kb'] * (1 + tolerance):
+            regressions.append(f'{name}: peak memory {result["peak_kb"]} KB, baseline {expected["peak_kb"]} KB')
+    return regressions
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--db', required=True, help='Database made by benchmarks.dataset')
+    parser.add_argument('--requests', type=int, default=50, help='Measured requests of every scenario')
+    parser.add_argument('--baseline', default=BASELINE, help=f'Baseline JSON, {BASELINE} by default')
+    parser.add_argument('--save-baseline', action='store_true', help='Write results to baseline instead of comparing')
+    parser.add_argument('--tolerance', type=float, default=0.25, help='Allowed growth of p95 and memory')
+    parser.add_argument('--only', action='append', help='Run only scenarios with these names')
+    args = parser.parse_args()
+
+    # App connects to database on import
+    os.environ['BUGTRACKER_DB'] = args.db
+    from main_app import app, API_VER
+    from data import db_session
+    app.config['WTF_CSRF_ENABLED'] = False
+
+    with app.app_context():
+        targets = find_targets(db_session.get_session())
+    engine = db_session.get_engine()
+    print(f'Dataset: {targets.dataset}, project {targets.project_tag}')
+    print(f'{"scenario":<26}{"p50 ms":>9}{"p95 ms":>9}{"p99 ms":>9}{"queries":>9}{"peak KB":>9}')
+    results = {}
+    for scenario in scenarios(targets, API_VER):
+        if args.only and scenario.name not in args.only:
+            continue
+        result = results[scenario.name] = run_scenario(app, engine, scenario, args.requests)
+        print(f'{scenario.name:<26}{result["p50_ms"]:>9}{result["p95_ms"]:>9}{result["p99_ms"]:>9}'
+              f'{result["queries"]:>9}{result["peak_kb"]:>9}')
+
+    if args.save_baseline:
+        with open(args.baseline, 'w') as file:
+            json.dump({'dataset': targets.dataset, 'scenarios': results}, file, indent=2, sort_keys=True)
+        print(f'Saved baseline to {args.baseline}')
+        return 0
+    if not os.path.exists(args.baseline):
+        print(f'No baseline {args.baseline}, run with --save-baseline to make it')
+        return 0
+    with open(args.baseline) as file:
+        baseline = json.load(file)
+    if baseline['dataset'] != targets.dataset:
+        print(f'Baseline was measured on another dataset {baseline["dataset"]}, timings are not comparable')
+    regressions = compare(results, baseline['scenarios'], args.tolerance)
+    for regression in regressions:
+        print(f'REGRESSION {regression}')
+    if not regressions:
+        print('No regressions against baseline')
+    return 1 if regressions else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
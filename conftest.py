@@ -0,0 +1,21 @@
+import pytest
+
+
+@pytest.fixture
+def query_budget():
+    """
+    Checks that request doesn't make more SQL statements than budget, see src.instrumentation
+    Usage: query_budget(client, '/projects/1', 10), returns response
+    Message of failed check lists statements that request repeated
+    """
+    from data import db_session
+    from src.instrumentation import record_queries
+
+    def check(client, path: str, budget: int, method: str = 'get', **kwargs):
+        with record_queries(db_session.get_engine()) as queries:
+            response = getattr(client, method)(path, **kwargs)
+        count = int(response.headers.get('X-Query-Count', queries.count))
+        assert count <= budget, f'{method.upper()} {path} is over query budget {budget}: {queries.describe()}'
+        return response
+
+    return check
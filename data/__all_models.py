@@ -1 +1,3 @@
 from . import models
+from . import issue_stats
+from . import search
@@ -1,36 +1,304 @@
+import os
+import re
+import threading
+
 import sqlalchemy as sa
 import sqlalchemy.orm as orm
 from sqlalchemy.orm import Session
+from sqlalchemy.pool import QueuePool
 import sqlalchemy.ext.declarative as dec
 
+from flask import _app_ctx_stack
+
 SqlAlchemyBase = dec.declarative_base()
 
 __factory = None
+__engine = None
+__scoped_session = None
+
+# Folder with alembic migration scripts
+MIGRATIONS_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'migrations')
+
+# Default engine pool settings, every of them can be overridden with global_init keyword arguments
+DEFAULT_POOL_SETTINGS = {
+    'pool_size': 5,
+    'max_overflow': 10,
+    'pool_recycle': 3600,
+    'pool_pre_ping': True,
+}
+
+# SQLite connection profiles
+# pragmas: PRAGMA statements executed on every new connection
+# serialize_writes: send all writes through single writer, see SerializedWriteSession
+SQLITE_PROFILES = {
+    'default': {
+        'pragmas': {},
+        'serialize_writes': False,
+    },
+    'production': {
+        'pragmas': {
+            # Readers don't block writer and writer doesn't block readers
+            'journal_mode': 'WAL',
+            # In WAL mode NORMAL is still safe from corruption and fsyncs only on checkpoints
+            'synchronous': 'NORMAL',
+            # Negative value means KiB, so 64MB of page cache per connection
+            'cache_size': -64000,
+            'mmap_size': 256 * 1024 * 1024,
+            # Wait for lock of another process instead of raising "database is locked" at once
+            'busy_timeout': 5000,
+        },
+        'serialize_writes': True,
+    },
+}
+
+# Statements that need the writer lock, see SerializedWriteSession
+WRITE_KEYWORDS = ('INSERT', 'UPDATE', 'DELETE', 'REPLACE')
+_LEADING_COMMENTS = re.compile(r'(\s+|--[^\n]*|/\*.*?\*/)*', re.DOTALL)
+
+# Counters of sessions created by factory, see session_stats()
+__stats_lock = threading.Lock()
+__stats = {'opened_total': 0, 'closed_total': 0}
 
 
 # logging.basicConfig(filename=f'{__name__}.log', format='%(levelname)s:%(module)s:%(asctime)s; %(message)s',
 # level=logging.INFO)
 
-def global_init(db_file):
-    global __factory
+def _count_session(counter: str) -> None:
+    with __stats_lock:
+        __stats[counter] += 1
+
+
+def _is_write_statement(statement: str, context=None) -> bool:
+    if context is not None and (context.isinsert or context.isupdate or context.isdelete):
+        return True
+    # Text statements don't mark context, so the first keyword after whitespace and comments is checked
+    words = _LEADING_COMMENTS.sub('', statement, count=1).split(None, 1)
+    return bool(words) and words[0].upper() in WRITE_KEYWORDS
+
+
+class CountingSession(Session):
+    """
+    Session that reports its opening and closing to the module counters
+    Session counts as open from creation till the first close() call
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._counted_open = True
+        _count_session('opened_total')
+
+    def close(self):
+        super().close()
+        if self._counted_open:
+            self._counted_open = False
+            _count_session('closed_total')
+
+
+class SerializedWriteSession(CountingSession):
+    """
+    Session that takes the writer lock before its first write and holds it till commit, rollback or close
+    So all writes of the process go one by one through single writer, while reads don't take the lock at all
+    Lock is reentrant, so nested sessions of the same thread don't deadlock each other
+    Writes are detected on connections of session(see _lock_writes), so flush, execute and bulk operations
+    take the lock alike
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._holds_writer_lock = False
+
+    def _acquire_writer_lock(self):
+        if not self._holds_writer_lock:
+            self.info['writer_lock'].acquire()
+            self._holds_writer_lock = True
+
+    def _release_writer_lock(self):
+        if self._holds_writer_lock:
+            self._holds_writer_lock = False
+            self.info['writer_lock'].release()
+
+    def commit(self):
+        try:
+            super().commit()
+        finally:
+            self._release_writer_lock()
+
+    def rollback(self):
+        try:
+            super().rollback()
+        finally:
+            self._release_writer_lock()
+
+    def close(self):
+        try:
+            super().close()
+        finally:
+            self._release_writer_lock()
+
+
+@sa.event.listens_for(SerializedWriteSession, 'after_begin')
+def _on_writer_session_begin(session, transaction, connection):
+    # Connection info is shared by connection branches that flush and bulk operations execute with
+    connection.info['writer_session'] = session
+    # Info dict itself is kept, connections are already closed when transaction ends
+    session.info.setdefault('writer_connections', []).append(connection.info)
+
+
+@sa.event.listens_for(SerializedWriteSession, 'after_transaction_end')
+def _on_writer_session_end(session, transaction):
+    if transaction.parent is None:
+        for info in session.info.pop('writer_connections', ()):
+            if info.get('writer_session') is session:
+                del info['writer_session']
+
+
+def _lock_writes(conn, cursor, statement, parameters, context, executemany):
+    session = conn.info.get('writer_session')
+    if session is not None and _is_write_statement(statement, context):
+        session._acquire_writer_lock()
 
-    if __factory:
-        return
+
+def _set_sqlite_pragmas(pragmas: dict):
+    def on_connect(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        for pragma, value in pragmas.items():
+            cursor.execute(f'PRAGMA {pragma}={value}')
+        cursor.close()
+
+    return on_connect
+
+
+def create_engine(db_file, profile: str = 'default', **pool_settings) -> sa.engine.Engine:
+    """
+    Creates engine for SQLite database file with pooled connections
+    :param db_file: path to database file
+    :param profile: name of connection profile from SQLITE_PROFILES
+    :param pool_settings: pool_size, max_overflow, pool_recycle and pool_pre_ping, see DEFAULT_POOL_SETTINGS
+    :return: Engine object
+    """
 
     if not db_file or not db_file.strip():
         raise Exception("Необходимо указать файл базы данных.")
 
+    settings = dict(DEFAULT_POOL_SETTINGS)
+    settings.update(pool_settings)
+
     conn_str = f'sqlite:///{db_file.strip()}?check_same_thread=False'
     print(f"Подключение к базе данных по адресу {conn_str}")
 
-    engine = sa.create_engine(conn_str, echo=False)
-    __factory = orm.sessionmaker(bind=engine)
+    # SQLAlchemy uses NullPool for file SQLite databases by default, so we have to ask for QueuePool explicitly
+    engine = sa.create_engine(conn_str, echo=False, poolclass=QueuePool, **settings)
+
+    pragmas = SQLITE_PROFILES[profile]['pragmas']
+    if pragmas:
+        sa.event.listen(engine, 'connect', _set_sqlite_pragmas(pragmas))
+    return engine
+
+
+def create_session_factory(engine, profile: str = 'default') -> orm.sessionmaker:
+    """
+    :param engine: Engine created by create_engine
+    :param profile: name of connection profile from SQLITE_PROFILES, the same as engine was created with
+    :return: sessionmaker that makes sessions suitable for profile
+    """
+    if SQLITE_PROFILES[profile]['serialize_writes']:
+        if not sa.event.contains(engine, 'before_cursor_execute', _lock_writes):
+            sa.event.listen(engine, 'before_cursor_execute', _lock_writes)
+        return orm.sessionmaker(bind=engine, class_=SerializedWriteSession,
+                                info={'writer_lock': threading.RLock()})
+    return orm.sessionmaker(bind=engine, class_=CountingSession)
+
+
+def global_init(db_file, profile: str = 'default', **pool_settings):
+    global __factory, __engine, __scoped_session
+
+    if __factory:
+        return
+
+    engine = create_engine(db_file, profile, **pool_settings)
+    __engine = engine
+    __factory = create_session_factory(engine, profile)
+    # Sessions are scoped by the app context(i.e by request), see init_app
+    __scoped_session = orm.scoped_session(__factory, scopefunc=_app_ctx_stack.__ident_func__)
+
+    upgrade_database(engine)
+
+
+def upgrade_database(engine) -> None:
+    """
+    Creates all tables in new database and marks it as up to date
+    Applies pending alembic migrations to existing database
+    :param engine: Engine of database
+    :return: None
+    """
+    from alembic import command
+    from alembic.config import Config
 
     from . import __all_models
 
-    SqlAlchemyBase.metadata.create_all(engine)
+    config = Config()
+    config.set_main_option('script_location', MIGRATIONS_DIR)
+    with engine.begin() as connection:
+        config.attributes['connection'] = connection
+        if engine.dialect.has_table(connection, 'users'):
+            command.upgrade(config, 'head')
+            SqlAlchemyBase.metadata.create_all(connection)
+        else:
+            SqlAlchemyBase.metadata.create_all(connection)
+            command.stamp(config, 'head')
+
+
+def init_app(app) -> None:
+    """
+    Registers teardown of the request session on the Flask app
+    :param app: Flask app object
+    :return: None
+    """
+    app.teardown_appcontext(remove_session)
 
 
 def create_session() -> Session:
+    """
+    :return: New session, caller have to close it by himself
+    """
     global __factory
     return __factory()
+
+
+def get_session() -> Session:
+    """
+    :return: Session of current request(app context), it will be closed on app context teardown
+    """
+    return __scoped_session()
+
+
+def get_scoped_session() -> orm.scoped_session:
+    """
+    :return: Registry of request sessions, suits for libraries that accept session object(e.g flask-admin)
+    """
+    return __scoped_session
+
+
+def remove_session(exception=None) -> None:
+    """
+    Closes session of current request, rollbacks uncommitted changes
+    :param exception: exception that ended the request if there was one
+    :return: None
+    """
+    if __scoped_session is not None:
+        __scoped_session.remove()
+
+
+def get_engine() -> sa.engine.Engine:
+    return __engine
+
+
+def session_stats() -> dict:
+    """
+    :return: Dict with count of opened, closed and still open sessions and connections checked out from pool
+    """
+    with __stats_lock:
+        stats = dict(__stats)
+    stats['open'] = stats['opened_total'] - stats['closed_total']
+    stats['pool_checked_out'] = __engine.pool.checkedout() if __engine is not None else 0
+    return stats
@@ -0,0 +1,235 @@
+"""
+Bulk creation and change of issues for importer scripts and triage sweeps, see api.resources.IssueBulkResource
+Every call is a few INSERT/UPDATE statements with many rows in the current transaction of session,
+so thousands of issues cost about as much as one, caller commits(or rolls back) all of them at once
+Statements don't go through ORM flush, so they change statistics(see data.issue_stats) themselves
+"""
+import datetime
+
+from collections import Counter
+from typing import Dict, Iterable, List, NamedTuple, Optional, Sequence
+
+from sqlalchemy import func, select
+
+from .issue_stats import apply_deltas
+from .models import (Issue, Project, ISSUE_STATES, association_table_priority_to_project,
+                     association_table_project_to_issue, association_table_user_to_issue,
+                     association_table_user_to_project)
+
+# Maximal count of issues created or changed by one call
+MAX_BULK_SIZE = 10000
+# Count of ids in one IN(...) of UPDATE and DELETE, SQLite limits count of bind parameters of statement
+BULK_CHUNK_SIZE = 500
+
+# Fields of created issue, all of them are required
+NEW_ISSUE_FIELDS = ('summary', 'description', 'steps_to_reproduce', 'state', 'priority')
+# Fields of issue that can be changed in bulk
+CHANGE_FIELDS = ('state', 'priority', 'assignee')
+
+
+class BulkError(ValueError):
+    """
+    Raised when the whole bulk request is wrong, e.g unknown state in changes
+    """
+
+
+class TargetIssue(NamedTuple):
+    """
+    Issue selected for bulk change, only columns that are needed to change it
+    """
+    id: int
+    tracking: str
+    project_id: int
+    state: Optional[str]
+    priority: Optional[str]
+
+
+def _chunks(values: Sequence, size: int = BULK_CHUNK_SIZE) -> Iterable[Sequence]:
+    for start in range(0, len(values), size):
+        yield values[start:start + size]
+
+
+def project_priorities(session, project_ids: Iterable[int]) -> Dict[int, list]:
+    """
+    :return: project id -> list of priorities allowed in project in order of their codes, selected by one query
+    """
+    project_ids = set(project_ids)
+    priorities = {project_id: [] for project_id in project_ids}
+    if project_ids:
+        rows = session.execute(select([association_table_priority_to_project.c.project_id,
+                                       association_table_priority_to_project.c.priority]).where(
+            association_table_priority_to_project.c.project_id.in_(project_ids)).order_by(
+            association_table_priority_to_project.c.priority))
+        for project_id, priority in rows:
+            priorities[project_id].append(priority)
+    return priorities
+
+
+def new_issue_error(item, priorities: Sequence[str]) -> Optional[str]:
+    """
+    :param item: dict with fields of NEW_ISSUE_FIELDS
+    :param priorities: priorities allowed in project of issue
+    :return: message about the first wrong field or None if issue can be created
+    """
+    if not isinstance(item, dict):
+        return 'Issue must be an object'
+    missing = [field for field in NEW_ISSUE_FIELDS if not isinstance(item.get(field), str) or not item[field]]
+    if missing:
+        return f'You did not pass {", ".join(missing)}'
+    if item['state'] not in ISSUE_STATES:
+        return f'state must be one of {", ".join(ISSUE_STATES)}'
+    if item['priority'] not in priorities:
+        return f'priority must be one of {", ".join(priorities)}'
+    return None
+
+
+def insert_issues(session, project_id: int, project_tag: str, rows: List[dict],
+                  assignee_ids: Sequence[int] = ()) -> List[str]:
+    """
+    Inserts checked issues of one project by one INSERT of every table, tracking numbers are reserved as one block
+    :param session: Session in which transaction issues are created
+    :param project_id: Project.id of all issues
+    :param project_tag: Project.short_project_tag
+    :param rows: dicts with fields of NEW_ISSUE_FIELDS and optional date_of_creation and assignee_ids,
+    they are changed in place
+    :param assignee_ids: ids of users on whom every issue without own assignee_ids is assigned
+    :return: tags of created issues in order of rows
+    """
+    if not rows:
+        return []
+    first_number = Project.allocate_issue_numbers(session, project_id, len(rows))
+    # UPDATE of project above took the RESERVED lock of database file, SQLite allows one writing transaction
+    # at a time for all connections and processes, whatever the profile(serialized writes only queue writers of
+    # the process before that lock). So no one else inserts issues till commit, and ids after the current maximal
+    # one are free. Writing transaction always sees the latest data(in WAL mode stale snapshot can't start writing),
+    # with known ids links are inserted without selecting them back
+    first_id = session.execute(select([func.coalesce(func.max(Issue.id), 0)])).scalar() + 1
+    now = datetime.datetime.now()
+    assignees = []
+    for offset, row in enumerate(rows):
+        row.update(id=first_id + offset, tracking=f'{project_tag}-{first_number + offset}', project_id=project_id)
+        row.setdefault('date_of_creation', now)
+        assignees.extend({'issue_id': row['id'], 'user_id': user_id}
+                         for user_id in row.pop('assignee_ids', assignee_ids))
+    session.execute(Issue.__table__.insert(), rows)
+    session.execute(association_table_project_to_issue.insert(),
+                    [{'issue_id': row['id'], 'project_id': project_id} for row in rows])
+    if assignees:
+        session.execute(association_table_user_to_issue.insert(), assignees)
+    apply_deltas(session, Counter((project_id, row['state'], row['priority']) for row in rows))
+    return [row['tracking'] for row in rows]
+
+
+def create_issues(session, project: Project, items: Sequence[dict], assignee_id: int) -> List[dict]:
+    """
+    Checks issues and creates valid ones by insert_issues()
+    :param session: Session in which transaction issues are created
+    :param project: Project of all issues
+    :param items: dicts with fields of NEW_ISSUE_FIELDS
+    :param assignee_id: User.id of user on whom issues are assigned
+    :return: result of every item in order of items: status 200 and tag of created issue or status 400 and message
+    """
+    priorities = project_priorities(session, [project.id])[project.id]
+    results, rows = [], []
+    for item in items:
+        error = new_issue_error(item, priorities)
+        if error is not None:
+            results.append({'status': 400, 'message': error})
+        else:
+            results.append({'status': 200})
+            rows.append({field: item[field] for field in NEW_ISSUE_FIELDS})
+    tags = iter(insert_issues(session, project.id, project.short_project_tag, rows, [assignee_id]))
+    for result in results:
+        if result['status'] == 200:
+            result['tag'] = next(tags)
+    return results
+
+
+def select_targets(query) -> List[TargetIssue]:
+    """
+    :param query: Query of issue columns of TargetIssue made by target_query(), filtered by caller
+    :return: issues to change
+    """
+    return [TargetIssue(*row) for row in query]
+
+
+def target_query(session):
+    """
+    :return: Query of issue columns that bulk change needs, filter it by tags or by issue query
+    """
+    return session.query(Issue.id, Issue.tracking, Issue.project_id, Issue.state, Issue.priority)
+
+
+def check_changes(changes) -> dict:
+    """
+    :param changes: dict of CHANGE_FIELDS passed by client
+    :return: the same changes or raise BulkError if they can't be applied to any issue
+    """
+    if not isinstance(changes, dict) or not changes:
+        raise BulkError(f'You did not pass changes, expected some of {", ".join(CHANGE_FIELDS)}')
+    unknown = [field for field in changes if field not in CHANGE_FIELDS]
+    if unknown:
+        raise BulkError(f'Unknown fields {", ".join(unknown)}, expected some of {", ".join(CHANGE_FIELDS)}')
+    if 'state' in changes and changes['state'] not in ISSUE_STATES:
+        raise BulkError(f'state must be one of {", ".join(ISSUE_STATES)}')
+    # Priorities differ between projects, they are checked for every issue by update_issues()
+    if 'priority' in changes and (not isinstance(changes['priority'], str) or not changes['priority']):
+        raise BulkError('priority must be a name of priority')
+    return changes
+
+
+def _assignee_projects(session, assignee, project_ids: set) -> set:
+    # Like in can_view(), admin can work with issues of any project
+    if assignee.is_admin:
+        return project_ids
+    rows = session.execute(select([association_table_user_to_project.c.project_id]).where(
+        association_table_user_to_project.c.member_id == assignee.id).where(
+        association_table_user_to_project.c.project_id.in_(project_ids)))
+    return {row[0] for row in rows}
+
+
+def update_issues(session, targets: Sequence[TargetIssue], changes: dict, assignee=None) -> Dict[str, dict]:
+    """
+    Applies the same changes to all issues that allow them by one UPDATE(and one DELETE and INSERT of assignees)
+    for every BULK_CHUNK_SIZE issues
+    :param session: Session in which transaction issues are changed
+    :param targets: issues to change, access of user to them is checked by caller
+    :param changes: changes checked by check_changes()
+    :param assignee: User(or Principal) on whom issues are assigned if changes have assignee
+    :return: tag -> status 200 or status 400 and message if change isn't allowed in project of issue
+    """
+    project_ids = {target.project_id for target in targets}
+    priorities = project_priorities(session, project_ids) if 'priority' in changes else {}
+    assignee_projects = _assignee_projects(session, assignee, project_ids) if assignee is not None else project_ids
+
+    results, changed = {}, []
+    for target in targets:
+        if 'priority' in changes and changes['priority'] not in priorities[target.project_id]:
+            results[target.tracking] = {'status': 400,
+                                        'message': f'Priority {changes["priority"]} is not used in project of issue'}
+        elif target.project_id not in assignee_projects:
+            results[target.tracking] = {'status': 400,
+                                        'message': f'{assignee.username} is not a member of project of issue'}
+        else:
+            results[target.tracking] = {'status': 200}
+            changed.append(target)
+
+    values = {Issue.__table__.c[field]: changes[field] for field in ('state', 'priority') if field in changes}
+    for chunk in _chunks(changed):
+        ids = [target.id for target in chunk]
+        if values:
+            session.execute(Issue.__table__.update().where(Issue.id.in_(ids)).values(values))
+        if assignee is not None:
+            session.execute(association_table_user_to_issue.delete().where(
+                association_table_user_to_issue.c.issue_id.in_(ids)))
+            session.execute(association_table_user_to_issue.insert(),
+                            [{'issue_id': issue_id, 'user_id': assignee.id} for issue_id in ids])
+
+    if values:
+        deltas = Counter()
+        for target in changed:
+            deltas[(target.project_id, target.state, target.priority)] -= 1
+            deltas[(target.project_id, changes.get('state', target.state),
+                    changes.get('priority', target.priority))] += 1
+        apply_deltas(session, deltas)
+    return results
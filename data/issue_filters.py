@@ -0,0 +1,193 @@
+"""
+Filters, sorting and keyset pagination of issue lists on project and user issue pages
+Everything is done by SQL on indexes of issues table, so a page costs the same in project with 10 and 100k issues
+Cursor of the page keeps value of sort column and id of the last issue of previous page
+"""
+import base64
+import binascii
+import datetime
+import json
+
+from typing import Callable, List, NamedTuple, Optional, Sequence, Tuple
+
+from sqlalchemy import and_, or_, select
+
+from .models import Issue, ISSUE_PRIORITIES, ISSUE_STATES, association_table_user_to_issue
+from .pagination import BadCursor
+
+ISSUES_PAGE_SIZE = 50
+
+# Sort key -> (column sorted ascending before id or None, whether id is sorted descending)
+# State and priority are sorted by codes, i.e in order of ISSUE_STATES and of issue_priorities table
+SORTS = {
+    'newest': (None, True),
+    'oldest': (None, False),
+    'state': (Issue.state, False),
+    'priority': (Issue.priority, False),
+}
+DEFAULT_SORT = 'newest'
+
+DATE_FORMAT = '%Y-%m-%d'
+
+
+class BadFilter(ValueError):
+    """
+    Raised when filter passed by client can't be parsed
+    """
+
+
+def _parse_date(value: Optional[str]) -> Optional[datetime.date]:
+    if not value:
+        return None
+    try:
+        return datetime.datetime.strptime(value, DATE_FORMAT).date()
+    except ValueError:
+        raise BadFilter(f'Bad date {value}, expected YYYY-MM-DD')
+
+
+def _parse_id(value: Optional[str]) -> Optional[int]:
+    if not value:
+        return None
+    try:
+        return int(value)
+    except ValueError:
+        raise BadFilter(f'Bad user id {value}')
+
+
+def _parse_names(values: List[str], names: Sequence[str]) -> Tuple[str, ...]:
+    # Names are compared as codes in SQL, unknown name has no code
+    unknown = [value for value in values if value and value not in names]
+    if unknown:
+        raise BadFilter(f'Unknown {", ".join(unknown)}, expected one of {", ".join(names)}')
+    return tuple(value for value in values if value)
+
+
+class IssueFilters(NamedTuple):
+    """
+    Filters of issue list, every empty filter is not applied
+    Values of one filter(e.g two states) are joined by OR, different filters are joined by AND
+    """
+    states: Tuple[str, ...] = ()
+    priorities: Tuple[str, ...] = ()
+    assignee_id: Optional[int] = None
+    # Both dates are included
+    created_from: Optional[datetime.date] = None
+    created_to: Optional[datetime.date] = None
+    sort: str = DEFAULT_SORT
+
+    @classmethod
+    def from_args(cls, args, priorities: Sequence[str] = ISSUE_PRIORITIES) -> 'IssueFilters':
+        """
+        :param args: Query string of request(request.args)
+        :param priorities: priorities that can be chosen, they differ between projects
+        :return: IssueFilters from state, priority(both can be repeated), assignee, created_from, created_to and sort
+        """
+        sort = args.get('sort') or DEFAULT_SORT
+        if sort not in SORTS:
+            raise BadFilter(f'Unknown sort {sort}, expected one of {", ".join(SORTS)}')
+        return cls(
+            states=_parse_names(args.getlist('state'), ISSUE_STATES),
+            priorities=_parse_names(args.getlist('priority'), priorities),
+            assignee_id=_parse_id(args.get('assignee')),
+            created_from=_parse_date(args.get('created_from')),
+            created_to=_parse_date(args.get('created_to')),
+            sort=sort,
+        )
+
+    def to_args(self) -> dict:
+        """
+        :return: Query string arguments that from_args turns into the same filters, used in links to other pages
+        """
+        args = {'state': list(self.states), 'priority': list(self.priorities), 'sort': self.sort}
+        if self.assignee_id is not None:
+            args['assignee'] = self.assignee_id
+        if self.created_from is not None:
+            args['created_from'] = self.created_from.strftime(DATE_FORMAT)
+        if self.created_to is not None:
+            args['created_to'] = self.created_to.strftime(DATE_FORMAT)
+        return args
+
+    def apply(self, query):
+        """
+        :param query: Query of issues
+        :return: Query of issues that pass all filters
+        """
+        if self.states:
+            query = query.filter(Issue.state.in_(self.states))
+        if self.priorities:
+            query = query.filter(Issue.priority.in_(self.priorities))
+        if self.assignee_id is not None:
+            query = query.filter(Issue.id.in_(
+                select([association_table_user_to_issue.c.issue_id]).where(
+                    association_table_user_to_issue.c.user_id == self.assignee_id)
+            ))
+        if self.created_from is not None:
+            query = query.filter(Issue.date_of_creation >= datetime.datetime.combine(self.created_from,
+                                                                                    datetime.time.min))
+        if self.created_to is not None:
+            query = query.filter(Issue.date_of_creation < datetime.datetime.combine(
+                self.created_to + datetime.timedelta(days=1), datetime.time.min))
+        return query
+
+    def page(self, query, after: Optional[str] = None, limit: int = ISSUES_PAGE_SIZE,
+             key: Callable[[object], int] = lambda issue: issue.id) -> Tuple[List, Optional[str]]:
+        """
+        Selects one page of filtered and sorted issues
+        :param query: Query of issues or of issue columns that have sort column under its name(e.g api projection)
+        :param after: cursor of the page, None for the first page
+        :param limit: page size
+        :param key: function that returns Issue.id of item of query
+        :return: List of page issues and cursor of the next page(None if it is the last page)
+        """
+        column, descending = SORTS[self.sort]
+        query = self.apply(query)
+        if after:
+            value, last_id = decode_issue_cursor(after)
+            # Value is compared by its code, see models.LookupCode and LookupTableCode
+            if value is not None and (column is None or not isinstance(value, str) or
+                                      value not in getattr(column.type, 'codes', (value,))):
+                raise BadCursor(f'Bad cursor {after}')
+            query = query.filter(_after_condition(column, descending, value, last_id))
+        order = [Issue.id.desc() if descending else Issue.id]
+        if column is not None:
+            order.insert(0, column)
+        # One extra row tells whether there is the next page
+        issues = query.order_by(*order).limit(limit + 1).all()
+        if len(issues) > limit:
+            issues = issues[:limit]
+            last = issues[-1]
+            return issues, encode_issue_cursor(getattr(last, column.key) if column is not None else None, key(last))
+        return issues, None
+
+
+def _after_condition(column, descending: bool, value, last_id: int):
+    id_condition = Issue.id < last_id if descending else Issue.id > last_id
+    if column is None:
+        return id_condition
+    # NULL is sorted before any value by SQLite
+    if value is None:
+        return or_(column.isnot(None), and_(column.is_(None), id_condition))
+    return or_(column > value, and_(column == value, id_condition))
+
+
+def encode_issue_cursor(value, last_id: int) -> str:
+    """
+    :param value: value of sort column of the last issue on the page
+    :param last_id: id of the last issue on the page
+    :return: Opaque cursor of the next page
+    """
+    return base64.urlsafe_b64encode(json.dumps([value, last_id]).encode()).decode()
+
+
+def decode_issue_cursor(cursor: str) -> Tuple[Optional[str], int]:
+    """
+    :param cursor: Cursor made by encode_issue_cursor
+    :return: value of sort column and id of the last issue on the previous page
+    """
+    try:
+        value, last_id = json.loads(base64.urlsafe_b64decode(cursor.encode()).decode())
+    except (binascii.Error, UnicodeError, ValueError, TypeError):
+        raise BadCursor(f'Bad cursor {cursor}')
+    if not isinstance(last_id, int) or not (value is None or isinstance(value, str)):
+        raise BadCursor(f'Bad cursor {cursor}')
+    return value, last_id
@@ -0,0 +1,216 @@
+"""
+Query language of issues used by saved searches, e.g
+    state:Unresolved priority:Critical,Major assignee:me created:>7d text:"login crash"
+
+Terms are separated by spaces and joined by AND, value with spaces is quoted:
+    state, priority   comma separated names, any of them matches(case doesn't matter), priorities of all
+                      projects can be used, so unknown priority matches nothing instead of being an error
+    assignee          username or me
+    project           short tag of project
+    created           >7d(in the last 7 days), <2w, >=2020-01-31: time ago(h, d, w) or date
+    text              words of summary, description or steps to reproduce, see data.search
+    sort              newest, oldest, state or priority, see data.issue_filters
+Term without key is the same as text
+
+Query is parsed and compiled into SQLAlchemy criteria once per query string(compile_query is cached),
+values that depend on time or on user who runs query are bind parameters filled by CompiledQuery.params
+"""
+import datetime
+import functools
+import re
+import shlex
+import time
+
+from typing import Callable, Dict, List, NamedTuple, Optional, Tuple
+
+from sqlalchemy import Integer, bindparam, column, func, select, text
+
+from .issue_filters import DEFAULT_SORT, SORTS
+from .models import (Issue, IssuePriority, Project, SavedSearch, User, ISSUE_STATES,
+                     association_table_user_to_issue, association_table_user_to_project)
+from .search import match_expression
+
+# Saved searches that take longer are logged as slow
+SLOW_SEARCH_MS = 200
+
+_AGE = re.compile(r'^(>=|<=|>|<)(\d+)([hdw])$')
+_DATE = re.compile(r'^(>=|<=|>|<)(\d{4}-\d{2}-\d{2})$')
+_AGE_UNITS = {'h': 'hours', 'd': 'days', 'w': 'weeks'}
+
+
+class QuerySyntaxError(ValueError):
+    """
+    Raised when query can't be parsed, message tells which term is wrong
+    """
+
+
+class CompiledQuery(NamedTuple):
+    """
+    Criteria of query, they don't depend on session and can be shared between requests
+    """
+    source: str
+    criteria: Tuple
+    sort: str
+    # Bind parameter name -> function of (user id, now) that gives its value
+    parameters: Dict[str, Callable[[int, datetime.datetime], object]]
+
+    def params(self, user_id: int, now: Optional[datetime.datetime] = None) -> dict:
+        """
+        :param user_id: User.id of user who runs query(value of assignee:me)
+        :param now: time of run, datetime.now() by default
+        :return: values of bind parameters of criteria
+        """
+        now = now or datetime.datetime.now()
+        return {name: value(user_id, now) for name, value in self.parameters.items()}
+
+    def apply(self, query, user_id: int, now: Optional[datetime.datetime] = None):
+        """
+        :param query: Query of issues or of issue columns
+        :param user_id: User.id of user who runs query
+        :param now: time of run, datetime.now() by default
+        :return: query filtered by criteria
+        """
+        return query.filter(*self.criteria).params(**self.params(user_id, now))
+
+
+def _names(key: str, value: str, names: Tuple[str, ...]) -> List[str]:
+    by_lower = {name.lower(): name for name in names}
+    result = []
+    for name in value.split(','):
+        if name.strip().lower() not in by_lower:
+            raise QuerySyntaxError(f'Unknown {key} {name}, expected one of {", ".join(names)}')
+        result.append(by_lower[name.strip().lower()])
+    return result
+
+
+def _assignee(value: str, parameters: dict):
+    issues_of = select([association_table_user_to_issue.c.issue_id])
+    if value.lower() == 'me':
+        parameters['me'] = lambda user_id, now: user_id
+        return Issue.id.in_(issues_of.where(association_table_user_to_issue.c.user_id == bindparam('me')))
+    return Issue.id.in_(issues_of.where(association_table_user_to_issue.c.user_id.in_(
+        select([User.id]).where(User.username == value))))
+
+
+def _created(value: str, parameters: dict):
+    operators = {'>': '__gt__', '>=': '__ge__', '<': '__lt__', '<=': '__le__'}
+    age = _AGE.match(value)
+    if age:
+        operator, count, unit = age.groups()
+        name = f'created_{len(parameters)}'
+        delta = datetime.timedelta(**{_AGE_UNITS[unit]: int(count)})
+        parameters[name] = lambda user_id, now: now - delta
+        # Like dates, >7d means created later than 7 days ago
+        created_after = bindparam(name, type_=Issue.date_of_creation.type)
+        return getattr(Issue.date_of_creation, operators[operator])(created_after)
+    date = _DATE.match(value)
+    if date:
+        operator, day = date.groups()
+        try:
+            day = datetime.datetime.strptime(day, '%Y-%m-%d')
+        except ValueError:
+            raise QuerySyntaxError(f'Bad date {day}, expected YYYY-MM-DD')
+        # Date means the whole day, so >day starts from the next one
+        if operator in ('>', '<='):
+            day += datetime.timedelta(days=1)
+        operator = {'>': '>=', '<=': '<'}.get(operator, operator)
+        return getattr(Issue.date_of_creation, operators[operator])(day)
+    raise QuerySyntaxError(f'Bad created:{value}, expected e.g >7d, <24h, >=2020-01-31')
+
+
+def _text(value: str, number: int):
+    match = match_expression(value)
+    if match is None:
+        raise QuerySyntaxError('Empty text')
+    name = f'match_{number}'
+    return Issue.id.in_(text(f'SELECT rowid FROM issues_fts WHERE issues_fts MATCH :{name}').bindparams(
+        **{name: match}).columns(column('rowid', Integer)))
+
+
+@functools.lru_cache(maxsize=256)
+def compile_query(source: str) -> CompiledQuery:
+    """
+    :param source: Query in query language, see module docstring
+    :return: CompiledQuery, the same object for the same string
+    """
+    try:
+        terms = shlex.split(source)
+    except ValueError as error:
+        raise QuerySyntaxError(f'Bad quotes: {error}')
+    if not terms:
+        raise QuerySyntaxError('Query is empty')
+    criteria, parameters, sort = [], {}, DEFAULT_SORT
+    for term in terms:
+        key, separator, value = term.partition(':')
+        if not separator:
+            key, value = 'text', term
+        key = key.lower()
+        if not value:
+            raise QuerySyntaxError(f'No value of {key}')
+        if key == 'state':
+            criteria.append(Issue.state.in_(_names(key, value, ISSUE_STATES)))
+        elif key == 'priority':
+            # Names are looked up in SQL, priorities are added to the table at runtime
+            names = [name.strip().lower() for name in value.split(',')]
+            criteria.append(Issue.priority.in_(select([IssuePriority.code]).where(
+                func.lower(IssuePriority.name).in_(names))))
+        elif key == 'assignee':
+            criteria.append(_assignee(value, parameters))
+        elif key == 'project':
+            criteria.append(Issue.project_id.in_(select([Project.id]).where(Project.short_project_tag == value)))
+        elif key == 'created':
+            criteria.append(_created(value, parameters))
+        elif key == 'text':
+            criteria.append(_text(value, len(criteria)))
+        elif key == 'sort':
+            if value not in SORTS:
+                raise QuerySyntaxError(f'Unknown sort {value}, expected one of {", ".join(SORTS)}')
+            sort = value
+        else:
+            raise QuerySyntaxError(f'Unknown key {key}, expected state, priority, assignee, project, created, '
+                                   f'text or sort')
+    return CompiledQuery(source, tuple(criteria), sort, parameters)
+
+
+def visible_issues(query, user):
+    """
+    :param query: Query of issues or of issue columns
+    :param user: User(or Principal, UserSnapshot) who sees issues
+    :return: query limited by projects where user is member, not limited for admin
+    """
+    if user.is_admin:
+        return query
+    return query.filter(Issue.project_id.in_(
+        select([association_table_user_to_project.c.project_id]).where(
+            association_table_user_to_project.c.member_id == user.id)
+    ))
+
+
+def record_run(session, saved_search_id: int, elapsed_ms: float) -> None:
+    """
+    Adds run to timing statistics of saved search by single UPDATE, caller commits
+    :param session: Session to update in
+    :param saved_search_id: SavedSearch.id
+    :param elapsed_ms: time of the run
+    """
+    session.query(SavedSearch).filter(SavedSearch.id == saved_search_id).update({
+        SavedSearch.run_count: SavedSearch.run_count + 1,
+        SavedSearch.total_ms: SavedSearch.total_ms + elapsed_ms,
+        SavedSearch.max_ms: func.max(SavedSearch.max_ms, elapsed_ms),
+        SavedSearch.last_ms: elapsed_ms,
+        SavedSearch.last_run_date: datetime.datetime.now(),
+    }, synchronize_session=False)
+
+
+class Timer:
+    """
+    Context manager that measures time of with block in milliseconds
+    """
+
+    def __enter__(self) -> 'Timer':
+        self.started = time.perf_counter()
+        self.elapsed_ms = 0.0
+        return self
+
+    def __exit__(self, *exc_info):
+        self.elapsed_ms = (time.perf_counter() - self.started) * 1000
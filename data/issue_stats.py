@@ -0,0 +1,181 @@
+"""
+Incremental maintenance of project_issue_stats(see models.ProjectIssueStats)
+Before every flush issues that are created, deleted or changed state, priority or project
+are turned into +1/-1 deltas of (project_id, state, priority) rows, which are applied in the same transaction
+Bulk statements pass their deltas to apply_deltas() themselves
+rebuild_stats() recounts rows from issues, check_stats() finds rows that differ from issues
+"""
+from collections import Counter, defaultdict
+from typing import Dict, List, NamedTuple, Optional, Tuple
+
+from sqlalchemy import bindparam, event, func, orm, text
+
+from .models import Issue, ProjectIssueStats
+
+StatsKey = Tuple[int, Optional[str], Optional[str]]
+
+# State and priority names are bound as codes by types of columns
+_STATS_PARAMS = (bindparam('state', type_=ProjectIssueStats.__table__.c.state.type),
+                 bindparam('priority', type_=ProjectIssueStats.__table__.c.priority.type))
+# Conflict target is the unique index on IFNULL of codes, see ProjectIssueStats
+_UPSERT = text(
+    'INSERT INTO project_issue_stats (project_id, state, priority, issue_count) '
+    'VALUES (:project_id, :state, :priority, :delta) '
+    'ON CONFLICT (project_id, IFNULL(state, 0), IFNULL(priority, 0)) '
+    'DO UPDATE SET issue_count = issue_count + excluded.issue_count'
+).bindparams(*_STATS_PARAMS)
+_DELETE_EMPTY = text(
+    'DELETE FROM project_issue_stats '
+    'WHERE project_id = :project_id AND state IS :state AND priority IS :priority AND issue_count <= 0'
+).bindparams(*_STATS_PARAMS)
+
+
+class StatsMismatch(NamedTuple):
+    key: StatsKey
+    stored: int
+    actual: int
+
+
+def _key(project_id, state, priority) -> Optional[StatsKey]:
+    if project_id is None:
+        return None
+    return int(project_id), state, priority
+
+
+def _sort_key(key: StatsKey):
+    # Missing state or priority goes first
+    return key[0], key[1] or '', key[2] or ''
+
+
+def _old_and_new_keys(issue: Issue) -> Tuple[Optional[StatsKey], Optional[StatsKey]]:
+    values = {}
+    for attribute in ('project_id', 'state', 'priority'):
+        history = orm.attributes.get_history(issue, attribute)
+        current = getattr(issue, attribute)
+        old = history.deleted[0] if history.deleted else current
+        values[attribute] = (old, current)
+    return (_key(*(old for old, _ in values.values())),
+            _key(*(current for _, current in values.values())))
+
+
+def _collect_deltas(session: orm.Session) -> Counter:
+    deltas = Counter()
+    for instance in session.new:
+        if isinstance(instance, Issue):
+            key = _key(instance.project_id, instance.state, instance.priority)
+            if key is not None:
+                deltas[key] += 1
+    for instance in session.dirty:
+        if isinstance(instance, Issue) and session.is_modified(instance, include_collections=False):
+            old_key, new_key = _old_and_new_keys(instance)
+            if old_key != new_key:
+                if old_key is not None:
+                    deltas[old_key] -= 1
+                if new_key is not None:
+                    deltas[new_key] += 1
+    for instance in session.deleted:
+        if isinstance(instance, Issue):
+            old_key, _ = _old_and_new_keys(instance)
+            if old_key is not None:
+                deltas[old_key] -= 1
+    return deltas
+
+
+@event.listens_for(Issue.project_id, 'set', active_history=True)
+@event.listens_for(Issue.state, 'set', active_history=True)
+@event.listens_for(Issue.priority, 'set', active_history=True)
+def _keep_old_value(target, value, oldvalue, initiator):
+    # Listener with active_history makes ORM load old value before it is replaced on expired issue,
+    # so attribute history tells from which stats row issue moves
+    pass
+
+
+@event.listens_for(orm.Session, 'before_flush')
+def _update_stats(session: orm.Session, flush_context, instances):
+    apply_deltas(session, _collect_deltas(session))
+
+
+def apply_deltas(session: orm.Session, deltas: Counter) -> None:
+    """
+    Changes counts of statistics rows, used by bulk statements that don't go through flush(see data.issue_bulk)
+    :param session: Session of the transaction that changes issues
+    :param deltas: (project_id, state, priority) -> change of count, missing state or priority is None
+    """
+    for (project_id, state, priority), delta in deltas.items():
+        if delta == 0:
+            continue
+        params = {'project_id': project_id, 'state': state, 'priority': priority, 'delta': delta}
+        session.execute(_UPSERT, params)
+        if delta < 0:
+            session.execute(_DELETE_EMPTY, params)
+
+
+def _actual_counts(session: orm.Session, project_id: Optional[int] = None) -> Dict[StatsKey, int]:
+    # Issue.state and Issue.priority are codes in database, names of them are made by column type
+    query = session.query(Issue.project_id, Issue.state, Issue.priority,
+                          func.count(Issue.id)).filter(Issue.project_id.isnot(None))
+    if project_id is not None:
+        query = query.filter(Issue.project_id == project_id)
+    query = query.group_by(Issue.project_id, Issue.state, Issue.priority)
+    return {_key(row[0], row[1], row[2]): row[3] for row in query}
+
+
+def _stored_counts(session: orm.Session, project_id: Optional[int] = None) -> Dict[StatsKey, int]:
+    query = session.query(ProjectIssueStats)
+    if project_id is not None:
+        query = query.filter(ProjectIssueStats.project_id == project_id)
+    return {(row.project_id, row.state, row.priority): row.issue_count for row in query if row.issue_count}
+
+
+def rebuild_stats(session: orm.Session, project_id: Optional[int] = None) -> int:
+    """
+    Recounts statistics from issues table, caller commits
+    :param session: Session to rebuild in
+    :param project_id: rebuild only this project, all projects by default
+    :return: count of written rows
+    """
+    delete = session.query(ProjectIssueStats)
+    if project_id is not None:
+        delete = delete.filter(ProjectIssueStats.project_id == project_id)
+    delete.delete(synchronize_session=False)
+    counts = _actual_counts(session, project_id)
+    session.bulk_insert_mappings(ProjectIssueStats, [
+        {'project_id': key[0], 'state': key[1], 'priority': key[2], 'issue_count': count}
+        for key, count in counts.items()
+    ])
+    return len(counts)
+
+
+def check_stats(session: orm.Session, project_id: Optional[int] = None) -> List[StatsMismatch]:
+    """
+    :param session: Session to check in
+    :param project_id: check only this project, all projects by default
+    :return: rows of statistics that differ from counts of issues, empty list if statistics are consistent
+    """
+    stored = _stored_counts(session, project_id)
+    actual = _actual_counts(session, project_id)
+    return [StatsMismatch(key, stored.get(key, 0), actual.get(key, 0))
+            for key in sorted(set(stored) | set(actual), key=_sort_key) if stored.get(key, 0) != actual.get(key, 0)]
+
+
+def project_stats(session: orm.Session, project_id: int) -> dict:
+    """
+    :param session: Session to select in
+    :param project_id: Project.id
+    :return: Dict with total count of issues, counts by state, by priority and by both of them,
+    missing state or priority is empty string(names are keys of JSON objects)
+    """
+    rows = session.query(ProjectIssueStats).filter(ProjectIssueStats.project_id == project_id).filter(
+        ProjectIssueStats.issue_count > 0).order_by(ProjectIssueStats.state, ProjectIssueStats.priority).all()
+    by_state, by_priority, by_state_and_priority = defaultdict(int), defaultdict(int), []
+    for row in rows:
+        state, priority = row.state or '', row.priority or ''
+        by_state[state] += row.issue_count
+        by_priority[priority] += row.issue_count
+        by_state_and_priority.append({'state': state, 'priority': priority, 'count': row.issue_count})
+    return {
+        'total': sum(by_state.values()),
+        'by_state': dict(by_state),
+        'by_priority': dict(by_priority),
+        'by_state_and_priority': by_state_and_priority,
+    }
@@ -2,20 +2,76 @@ import datetime
 import sqlalchemy
 import hashlib
 
-from typing import Iterable, Optional
+from typing import Dict, Iterable, Optional, List, NamedTuple
 
-from .db_session import SqlAlchemyBase, create_session
+from .db_session import SqlAlchemyBase, get_session
 from src.misc_funcs import generate_random_string
 
-from sqlalchemy import orm, select
+from sqlalchemy import orm, select, func
 from flask_login import UserMixin
 from sqlalchemy_serializer import SerializerMixin
 
+# States that issue can be in, code of name is its position + 1
+# Codes are stored in database, so new names are only appended to the end
+ISSUE_STATES = ('Unresolved', 'In progress', 'Fixed', 'Not bug', 'Cant reproduce', 'Rejected')
+# Priorities of new projects, they take the first codes of issue_priorities
+# Projects can have other priorities too, their codes are added to the table with them(see IssuePriority.add_names)
+ISSUE_PRIORITIES = ('Critical', 'Major', 'Minor', 'Normal')
+
+
+class LookupCode(sqlalchemy.types.TypeDecorator):
+    """
+    Name from fixed tuple of names stored as its small integer code
+    Comparisons and sorting of column are done by codes, Python side sees only names
+    """
+    impl = sqlalchemy.SmallInteger
+
+    def __init__(self, names: Iterable[str]):
+        super().__init__()
+        self.names = tuple(names)
+        self.codes = {name: code for code, name in enumerate(self.names, 1)}
+
+    def process_bind_param(self, value, dialect):
+        if value is None:
+            return None
+        try:
+            return self.codes[value]
+        except KeyError:
+            raise ValueError(f'Unknown value {value}, expected one of {", ".join(self.names)}')
+
+    def process_result_value(self, value, dialect):
+        return None if value is None else self.names[value - 1]
+
+
+class LookupTableCode(sqlalchemy.types.TypeDecorator):
+    """
+    Name from lookup table that grows at runtime stored as its small integer code
+    Names are turned into codes and back by subqueries on primary key and unique name of the table, so names
+    added by other processes are seen at once. Comparisons and sorting of column are done by codes
+    Name that isn't in the table is stored as NULL, callers check names before(e.g against priorities of project)
+    """
+    impl = sqlalchemy.SmallInteger
+
+    def __init__(self, table_name: str):
+        super().__init__()
+        self.table_name = table_name
+        self.lookup = sqlalchemy.table(table_name, sqlalchemy.column('code'), sqlalchemy.column('name'))
+
+    def bind_expression(self, bindvalue):
+        return select([self.lookup.c.code]).where(self.lookup.c.name == bindvalue).as_scalar()
+
+    def column_expression(self, column):
+        return select([self.lookup.c.name]).where(self.lookup.c.code == column).as_scalar()
+
+
 association_table_user_to_issue = sqlalchemy.Table('user_to_issue', SqlAlchemyBase.metadata,
                                                    sqlalchemy.Column('user_id', sqlalchemy.Integer,
                                                                      sqlalchemy.ForeignKey('users.id')),
                                                    sqlalchemy.Column('issue_id', sqlalchemy.Integer,
-                                                                     sqlalchemy.ForeignKey('issues.id'))
+                                                                     sqlalchemy.ForeignKey('issues.id')),
+                                                   sqlalchemy.Index('ix_user_to_issue_user_id_issue_id',
+                                                                    'user_id', 'issue_id', unique=True),
+                                                   sqlalchemy.Index('ix_user_to_issue_issue_id', 'issue_id')
                                                    )
 association_table_user_to_project = sqlalchemy.Table('user_to_project', SqlAlchemyBase.metadata,
                                                      sqlalchemy.Column('member_id', sqlalchemy.Integer,
@@ -24,33 +80,92 @@ association_table_user_to_project = sqlalchemy.Table('user_to_project', SqlAlche
                                                                        sqlalchemy.ForeignKey('projects.id')),
                                                      sqlalchemy.Column('project_role', sqlalchemy.String),
                                                      sqlalchemy.Column('date_of_add', sqlalchemy.DateTime,
-                                                                       default=datetime.datetime.now)
+                                                                       default=datetime.datetime.now),
+                                                     sqlalchemy.Index('ix_user_to_project_member_id_project_id',
+                                                                      'member_id', 'project_id', unique=True),
+                                                     sqlalchemy.Index('ix_user_to_project_project_id_project_role',
+                                                                      'project_id', 'project_role')
                                                      )
 
 association_table_project_to_issue = sqlalchemy.Table('project_to_issue', SqlAlchemyBase.metadata,
                                                       sqlalchemy.Column('issue_id', sqlalchemy.Integer,
                                                                         sqlalchemy.ForeignKey('issues.id')),
                                                       sqlalchemy.Column('project_id', sqlalchemy.Integer,
-                                                                        sqlalchemy.ForeignKey('projects.id'))
+                                                                        sqlalchemy.ForeignKey('projects.id')),
+                                                      sqlalchemy.Index('ix_project_to_issue_project_id_issue_id',
+                                                                       'project_id', 'issue_id', unique=True),
+                                                      sqlalchemy.Index('ix_project_to_issue_issue_id', 'issue_id')
                                                       )
 association_table_subsystems_to_project = sqlalchemy.Table('subsystems_to_project', SqlAlchemyBase.metadata,
                                                            sqlalchemy.Column('project_id', sqlalchemy.Integer,
                                                                              sqlalchemy.ForeignKey('projects.id')),
-                                                           sqlalchemy.Column('subsystem', sqlalchemy.String)
+                                                           sqlalchemy.Column('subsystem', sqlalchemy.String),
+                                                           sqlalchemy.Index('ix_subsystems_to_project_project_id',
+                                                                            'project_id')
                                                            )
 association_table_file_to_issue = sqlalchemy.Table('file_to_issue', SqlAlchemyBase.metadata,
                                                    sqlalchemy.Column('issue_id', sqlalchemy.Integer,
                                                                      sqlalchemy.ForeignKey('issues.id')),
-                                                   sqlalchemy.Column('file_path', sqlalchemy.String)
+                                                   sqlalchemy.Column('file_path', sqlalchemy.String),
+                                                   sqlalchemy.Index('ix_file_to_issue_issue_id', 'issue_id')
                                                    )
 
 association_table_priority_to_project = sqlalchemy.Table('priority_to_project', SqlAlchemyBase.metadata,
                                                          sqlalchemy.Column('project_id', sqlalchemy.Integer,
                                                                            sqlalchemy.ForeignKey('projects.id')),
-                                                         sqlalchemy.Column('priority', sqlalchemy.String)
+                                                         sqlalchemy.Column('priority',
+                                                                           LookupTableCode('issue_priorities'),
+                                                                           sqlalchemy.ForeignKey(
+                                                                               'issue_priorities.code')),
+                                                         sqlalchemy.Index('ix_priority_to_project_project_id_priority',
+                                                                          'project_id', 'priority', unique=True)
                                                          )
 
 
+class IssueState(SqlAlchemyBase):
+    """
+    Lookup table of issue states, filled from ISSUE_STATES
+    """
+    __tablename__ = 'issue_states'
+
+    code = sqlalchemy.Column(sqlalchemy.SmallInteger, primary_key=True, autoincrement=False)
+    name = sqlalchemy.Column(sqlalchemy.String, nullable=False, unique=True)
+
+
+class IssuePriority(SqlAlchemyBase):
+    """
+    Lookup table of issue priorities, filled from ISSUE_PRIORITIES, other priorities of projects are appended
+    Priorities of every project are listed in priority_to_project
+    """
+    __tablename__ = 'issue_priorities'
+
+    code = sqlalchemy.Column(sqlalchemy.SmallInteger, primary_key=True, autoincrement=False)
+    name = sqlalchemy.Column(sqlalchemy.String, nullable=False, unique=True)
+
+    @staticmethod
+    def add_names(session, names: Iterable[str]) -> None:
+        """
+        Gives codes to priorities that don't have them yet, next code is taken for every new name
+        :param session: Session(or Connection) in which transaction names are added
+        :param names: names of priorities
+        :return: None
+        """
+        for name in dict.fromkeys(names):
+            session.execute(_ADD_PRIORITY, {'name': name})
+
+
+# Name that is already in table is ignored by its unique constraint
+_ADD_PRIORITY = sqlalchemy.text('INSERT OR IGNORE INTO issue_priorities (code, name) '
+                                'SELECT IFNULL(MAX(code), 0) + 1, :name FROM issue_priorities')
+
+
+@sqlalchemy.event.listens_for(IssueState.__table__, 'after_create')
+@sqlalchemy.event.listens_for(IssuePriority.__table__, 'after_create')
+def _fill_lookup_table(target, connection, **kw):
+    names = ISSUE_STATES if target.name == 'issue_states' else ISSUE_PRIORITIES
+    connection.execute(target.insert(), [{'code': code, 'name': name} for code, name in enumerate(names, 1)])
+
+
 class User(SqlAlchemyBase, UserMixin, SerializerMixin):
     """
     Implementation of user table
@@ -77,7 +192,7 @@ class User(SqlAlchemyBase, UserMixin, SerializerMixin):
     created_date = sqlalchemy.Column(sqlalchemy.DateTime,
                                      default=datetime.datetime.now)
     role = sqlalchemy.Column(sqlalchemy.String, default='User')
-    API_KEY = sqlalchemy.Column(sqlalchemy.String(24))
+    API_KEY = sqlalchemy.Column(sqlalchemy.String(24), index=True, unique=True)
 
     issues = orm.relation('Issue',
                           secondary=association_table_user_to_issue,
@@ -108,28 +223,33 @@ class User(SqlAlchemyBase, UserMixin, SerializerMixin):
         :return: String if User in project members and None if user not in that project
         """
 
-        session = create_session()
+        session = get_session()
         result = session.execute(
             select([association_table_user_to_project.c.project_role]).where(
                 association_table_user_to_project.c.member_id == self.id).where(
                 association_table_user_to_project.c.project_id == project_id)
         ).fetchone()
-        session.close()
-        return result[0]
+        return result[0] if result else None
 
     def change_project_role(self, project_id: int, role: str) -> None:
         """
         Updates User role in Project
+        Also moves Project.root_user_id on new root or clears it if root gets another role
         :param project_id: Project.id of Project in what we want to update user Role
         :param role: new user role
         :return: None
         """
 
-        session = create_session()
+        session = get_session()
         session.execute(association_table_user_to_project.update().where(
             association_table_user_to_project.c.project_id == project_id).where(
             association_table_user_to_project.c.member_id == self.id).values(
             project_role=role))
+        if role == 'root':
+            session.execute(Project.__table__.update().where(Project.id == project_id).values(root_user_id=self.id))
+        else:
+            session.execute(Project.__table__.update().where(Project.id == project_id).where(
+                Project.root_user_id == self.id).values(root_user_id=None))
         session.merge(self)
         session.commit()
 
@@ -139,7 +259,7 @@ class User(SqlAlchemyBase, UserMixin, SerializerMixin):
         :return: User join time to Project
         """
 
-        session = create_session()
+        session = get_session()
         result = session.execute(
             select([association_table_user_to_project.c.date_of_add]).where(
                 association_table_user_to_project.c.member_id == self.id).where(
@@ -154,34 +274,59 @@ class User(SqlAlchemyBase, UserMixin, SerializerMixin):
         :param project_id: Project.id of Project in what we want to count user issues
         :return: Amount of user assignees in Project
         """
-        session = create_session()
-        temp = session.query(Issue).filter(Issue.project_id == project_id).filter(Issue.assignees.contains(self)).all()
-        return len(temp)
+        session = get_session()
+        return session.query(func.count(association_table_user_to_issue.c.issue_id)).join(
+            Issue, Issue.id == association_table_user_to_issue.c.issue_id).filter(
+            Issue.project_id == project_id).filter(
+            association_table_user_to_issue.c.user_id == self.id).scalar()
+
+    @property
+    def project_count(self) -> int:
+        """
+        :return: Amount of projects in which User is member, counted without loading projects
+        """
+        session = orm.object_session(self) or get_session()
+        return session.query(func.count(association_table_user_to_project.c.project_id)).filter(
+            association_table_user_to_project.c.member_id == self.id).scalar()
+
+    @staticmethod
+    def count_total(session=None) -> int:
+        """
+        :param session: Session to count in, request session by default
+        :return: Amount of registered users
+        """
+        session = session or get_session()
+        return session.query(func.count(User.id)).scalar()
 
     def regenerate_API_key(self) -> None:
         """
         Regenerates User API key with 24-length string
         :return: None
         """
-        session = create_session()
+        session = orm.object_session(self) or get_session()
         new_key = generate_random_string(24)
         # Check if there is any user with exact same API key as just generated
-        if new_key not in session.query(User.API_KEY).all():
-            self.API_KEY = new_key
-            session.merge(self)
-            session.commit()
-        else:
-            while new_key in session.query(User.API_KEY).all():
-                new_key = generate_random_string(24)
-            self.API_KEY = new_key
-            session.merge(self)
-            session.commit()
+        while session.query(User.id).filter(User.API_KEY == new_key).first() is not None:
+            new_key = generate_random_string(24)
+        self.API_KEY = new_key
+        session.merge(self)
+        session.commit()
 
     @property
     def is_admin(self) -> bool:
         return self.role == 'Admin'
 
 
+class MemberDetails(NamedTuple):
+    """
+    Project member with his membership info, see Project.member_details
+    """
+    user: User
+    role: Optional[str]
+    date_of_add: datetime.datetime
+    issues_total: int
+
+
 class Project(SqlAlchemyBase, SerializerMixin):
     """
         Implementation of project table
@@ -207,9 +352,18 @@ class Project(SqlAlchemyBase, SerializerMixin):
     short_project_tag = sqlalchemy.Column(sqlalchemy.String, unique=True)
     issues = orm.relation('Issue', secondary=association_table_project_to_issue, backref='project')
 
+    # Denormalized project root, kept in sync by User.change_project_role
+    root_user_id = sqlalchemy.Column(sqlalchemy.Integer, sqlalchemy.ForeignKey('users.id'), index=True)
+    # Joined with project in the same query, so getting root costs no extra queries
+    root_user = orm.relation('User', foreign_keys=[root_user_id], lazy='joined')
+
+    # Number of the next issue in the project, use allocate_issue_numbers to get it
+    next_issue_number = sqlalchemy.Column(sqlalchemy.Integer, nullable=False, default=1, server_default='1')
+
     def __repr__(self):
-        return f'Project name= {self.project_name}; id= {self.id}; root= {self.get_root().username}\ndesc: {self.description}' \
-               f'\nmembers: {len(self.members)}\nissues: {len(self.issues)}'
+        root = self.root_user.username if self.root_user else None
+        return f'Project name= {self.project_name}; id= {self.id}; root= {root}\ndesc: {self.description}' \
+               f'\nmembers: {self.member_count}\nissues: {self.issue_count}'
 
     def __str__(self):
         return self.__repr__()
@@ -219,13 +373,12 @@ class Project(SqlAlchemyBase, SerializerMixin):
         :return: Either iterable object that contains strings of Project subsystems
         """
 
-        session = create_session()
+        session = get_session()
         result = session.execute(
             select([association_table_subsystems_to_project.c.subsystem]).where(
                 association_table_subsystems_to_project.c.project_id == self.id
             )
         ).fetchall()
-        session.close()
         return result
 
     def add_project_subsystems(self, subsystems: Iterable[str]) -> None:
@@ -235,23 +388,21 @@ class Project(SqlAlchemyBase, SerializerMixin):
         :return: None
         """
 
-        session = create_session()
+        session = get_session()
         for subsystem in subsystems:
             session.execute(association_table_subsystems_to_project.insert().values(self.id, subsystem))
         session.commit()
-        session.close()
 
     def get_project_priorities(self) -> Optional[Iterable[str]]:
         """
         :return: Iterable object that contains all strings of project priorities
         """
-        session = create_session()
+        session = get_session()
         priorities_list = session.execute(
             select([association_table_priority_to_project.c.priority]).where(
                 association_table_priority_to_project.c.project_id == self.id
-            )
+            ).order_by(association_table_priority_to_project.c.priority)
         ).fetchall()
-        session.close()
         return priorities_list
 
     def add_project_priorities(self, priorities: Iterable) -> None:
@@ -261,29 +412,102 @@ class Project(SqlAlchemyBase, SerializerMixin):
         :return: None
         """
 
-        session = create_session()
+        session = get_session()
+        priorities = list(priorities)
+        IssuePriority.add_names(session, priorities)
         for priority in priorities:
             session.execute(association_table_priority_to_project.insert(),
                             {'project_id': self.id, 'priority': priority})
         session.commit()
-        session.close()
 
     def get_root(self) -> Optional[User]:
         """
         :return: Return User object of project root (i.e creator)
         """
-        session = create_session()
-        member_id = session.execute(
-            select([association_table_user_to_project.c.member_id]).where(
-                association_table_user_to_project.c.project_id == self.id
-            ).where(
-                association_table_user_to_project.c.project_role == 'root'
-            )
-        ).fetchone()
-        member_id = member_id['member_id']
-        user = session.query(User).filter(User.id == member_id).first()
-        session.close()
-        return user
+        return self.root_user
+
+    @staticmethod
+    def allocate_issue_numbers(session, project_id: int, count: int = 1) -> int:
+        """
+        Reserves count issue numbers in Project by single UPDATE inside current transaction of session
+        Database write lock is held by transaction till commit, so concurrent transactions get different numbers
+        :param session: Session in which transaction issues will be created
+        :param project_id: Project.id of Project in which we want to create issues
+        :param count: how many numbers to reserve
+        :return: First reserved number, the rest of them follow it
+        """
+        session.execute(Project.__table__.update().where(Project.id == project_id).values(
+            next_issue_number=Project.next_issue_number + count))
+        next_number = session.execute(
+            select([Project.next_issue_number]).where(Project.id == project_id)
+        ).scalar()
+        return next_number - count
+
+    def next_issue_tracking(self) -> str:
+        """
+        Reserves number for new issue in the Project
+        :return: Tracking tag for new issue, e.g TAG-12
+        """
+        session = orm.object_session(self) or get_session()
+        return f'{self.short_project_tag}-{Project.allocate_issue_numbers(session, self.id)}'
+
+    def member_details(self) -> List[MemberDetails]:
+        """
+        Loads all project members with their project role, date of adding and count of assigned issues
+        Uses two queries regardless of members count
+        :return: List of MemberDetails ordered by date of adding to the project
+        """
+        session = get_session()
+        members = session.query(
+            User, association_table_user_to_project.c.project_role, association_table_user_to_project.c.date_of_add
+        ).join(
+            association_table_user_to_project, association_table_user_to_project.c.member_id == User.id
+        ).filter(
+            association_table_user_to_project.c.project_id == self.id
+        ).order_by(association_table_user_to_project.c.date_of_add).all()
+
+        issues_total = dict(session.query(
+            association_table_user_to_issue.c.user_id, func.count(association_table_user_to_issue.c.issue_id)
+        ).join(
+            Issue, Issue.id == association_table_user_to_issue.c.issue_id
+        ).filter(
+            Issue.project_id == self.id
+        ).group_by(association_table_user_to_issue.c.user_id).all())
+
+        return [MemberDetails(user, role, date_of_add, issues_total.get(user.id, 0))
+                for user, role, date_of_add in members]
+
+    @property
+    def issue_count(self) -> int:
+        """
+        :return: Amount of issues in the Project, counted without loading issues
+        Issue.project_id is the source of issues of project, like for lists, search and access checks
+        """
+        session = orm.object_session(self) or get_session()
+        return session.query(func.count(Issue.id)).filter(Issue.project_id == self.id).scalar()
+
+    @property
+    def member_count(self) -> int:
+        """
+        :return: Amount of members of the Project, counted without loading members
+        """
+        session = orm.object_session(self) or get_session()
+        return session.query(func.count(association_table_user_to_project.c.member_id)).filter(
+            association_table_user_to_project.c.project_id == self.id).scalar()
+
+    @staticmethod
+    def issue_counts(session, project_ids: Iterable[int]) -> Dict[int, int]:
+        """
+        Counts issues of several projects by one query
+        :param session: Session to count in
+        :param project_ids: Project.id of projects
+        :return: Dict Project.id -> amount of issues, projects without issues are absent
+        """
+        project_ids = list(project_ids)
+        if not project_ids:
+            return {}
+        return dict(session.query(Issue.project_id, func.count(Issue.id)).filter(
+            Issue.project_id.in_(project_ids)).group_by(Issue.project_id).all())
 
     # API METHODS BLOCK BELOW
     def subsystems(self) -> Optional[Iterable[str]]:
@@ -311,7 +535,7 @@ class Project(SqlAlchemyBase, SerializerMixin):
         :return: Return username of User-project root (i.e creator)
         """
 
-        return self.get_root().username if self.get_root() else None
+        return self.root_user.username if self.root_user else None
     # API METHODS BLOCK ABOVE
 
 
@@ -322,20 +546,28 @@ class Issue(SqlAlchemyBase, SerializerMixin):
     To get access specific project issues try Issue.project
     """
     __tablename__ = 'issues'
+    # Filters of issue lists inside one project(see data.issue_filters), SQLite appends id to every index,
+    # so issues with the same value are also read in id order
+    __table_args__ = (
+        sqlalchemy.Index('ix_issues_project_id_state_priority', 'project_id', 'state', 'priority'),
+        sqlalchemy.Index('ix_issues_project_id_priority', 'project_id', 'priority'),
+        sqlalchemy.Index('ix_issues_project_id_date_of_creation', 'project_id', 'date_of_creation'),
+    )
 
     id = sqlalchemy.Column(sqlalchemy.Integer,
                            primary_key=True, autoincrement=True, unique=True)
 
     tracking = sqlalchemy.Column(sqlalchemy.String, unique=True)
-    priority = sqlalchemy.Column(sqlalchemy.String, index=True)
-    state = sqlalchemy.Column(sqlalchemy.String)
+    # Stored as codes of issue_priorities and ISSUE_STATES, see LookupTableCode and LookupCode
+    priority = sqlalchemy.Column(LookupTableCode('issue_priorities'), sqlalchemy.ForeignKey('issue_priorities.code'))
+    state = sqlalchemy.Column(LookupCode(ISSUE_STATES), sqlalchemy.ForeignKey('issue_states.code'))
     description = sqlalchemy.Column(sqlalchemy.String)
     steps_to_reproduce = sqlalchemy.Column(sqlalchemy.String)
     summary = sqlalchemy.Column(sqlalchemy.String)
-    date_of_creation = sqlalchemy.Column(sqlalchemy.DateTime, default=datetime.datetime.now())
+    date_of_creation = sqlalchemy.Column(sqlalchemy.DateTime, default=datetime.datetime.now)
     attachments = sqlalchemy.Column(sqlalchemy.String)
 
-    project_id = sqlalchemy.Column(sqlalchemy.Integer, sqlalchemy.ForeignKey('projects.id'))
+    project_id = sqlalchemy.Column(sqlalchemy.Integer, sqlalchemy.ForeignKey('projects.id'), index=True)
 
     def __repr__(self):
         return f'Issue name={self.tracking}; id={self.id}\ndesc: {self.description}'
@@ -347,13 +579,12 @@ class Issue(SqlAlchemyBase, SerializerMixin):
         """
         :return: list of attachments path
         """
-        session = create_session()
+        session = get_session()
         attachments_list = session.execute(
             select([association_table_file_to_issue.c.file_path]).where(
                 association_table_file_to_issue.c.issue_id == self.id
             )
         ).fetchall()['file_path']
-        session.close()
         return attachments_list
 
     # API METHODS BLOCK BELOW
@@ -363,3 +594,58 @@ class Issue(SqlAlchemyBase, SerializerMixin):
     def assign_on(self):
         return self.assignees[0].username
     # API METHOD ABOVE
+
+
+class ProjectIssueStats(SqlAlchemyBase, SerializerMixin):
+    """
+    Count of project issues with the same state and priority
+    Rows are kept up to date on every flush of issues, see data.issue_stats
+    State and priority are codes of lookup tables like in issues, missing state or priority is NULL
+    NULLs of unique index are distinct, so rows are unique by index on IFNULL(code, 0), upsert of stats uses it
+    """
+    __tablename__ = 'project_issue_stats'
+    __table_args__ = (
+        sqlalchemy.Index('ix_project_issue_stats_project_id_state_priority', 'project_id',
+                         sqlalchemy.text('IFNULL(state, 0)'), sqlalchemy.text('IFNULL(priority, 0)'), unique=True),
+    )
+
+    project_id = sqlalchemy.Column(sqlalchemy.Integer, sqlalchemy.ForeignKey('projects.id'), nullable=False)
+    state = sqlalchemy.Column(LookupCode(ISSUE_STATES), sqlalchemy.ForeignKey('issue_states.code'))
+    priority = sqlalchemy.Column(LookupTableCode('issue_priorities'), sqlalchemy.ForeignKey('issue_priorities.code'))
+    issue_count = sqlalchemy.Column(sqlalchemy.Integer, nullable=False, default=0)
+
+    # Table has no primary key because of NULLs, rows are identified by the columns of unique index
+    __mapper_args__ = {'primary_key': [project_id, state, priority]}
+
+    def __repr__(self):
+        return f'Project id={self.project_id}; state={self.state}; priority={self.priority}; count={self.issue_count}'
+
+
+class SavedSearch(SqlAlchemyBase, SerializerMixin):
+    """
+    Named query of issue query language(see data.issue_query) saved by user
+    Every run adds its time to run_count, total_ms, max_ms and last_ms, so slow searches can be found
+    """
+    __tablename__ = 'saved_searches'
+
+    id = sqlalchemy.Column(sqlalchemy.Integer, primary_key=True, autoincrement=True)
+    owner_id = sqlalchemy.Column(sqlalchemy.Integer, sqlalchemy.ForeignKey('users.id'), nullable=False, index=True)
+    name = sqlalchemy.Column(sqlalchemy.String, nullable=False)
+    query = sqlalchemy.Column(sqlalchemy.String, nullable=False)
+    created_date = sqlalchemy.Column(sqlalchemy.DateTime, default=datetime.datetime.now)
+
+    run_count = sqlalchemy.Column(sqlalchemy.Integer, nullable=False, default=0)
+    total_ms = sqlalchemy.Column(sqlalchemy.Float, nullable=False, default=0)
+    max_ms = sqlalchemy.Column(sqlalchemy.Float, nullable=False, default=0)
+    last_ms = sqlalchemy.Column(sqlalchemy.Float, nullable=True)
+    last_run_date = sqlalchemy.Column(sqlalchemy.DateTime, nullable=True)
+
+    @property
+    def average_ms(self) -> Optional[float]:
+        """
+        :return: average time of run or None if search has never been run
+        """
+        return self.total_ms / self.run_count if self.run_count else None
+
+    def __repr__(self):
+        return f'SavedSearch id={self.id}; name={self.name}; query={self.query}'
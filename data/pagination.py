@@ -0,0 +1,91 @@
+"""
+Keyset(cursor) pagination of queries
+Page is selected by "id > last id of previous page" instead of OFFSET,
+so with index on id every page costs the same as the first one
+"""
+import base64
+import binascii
+
+from typing import Any, Callable, Iterator, List, Optional, Tuple
+
+DEFAULT_PAGE_SIZE = 100
+MAX_PAGE_SIZE = 1000
+
+
+class BadCursor(ValueError):
+    """
+    Raised when cursor passed by client can't be decoded
+    """
+
+
+def encode_cursor(last_id: int) -> str:
+    """
+    :param last_id: id of the last item on the page
+    :return: Opaque cursor of the next page
+    """
+    return base64.urlsafe_b64encode(str(last_id).encode()).decode()
+
+
+def decode_cursor(cursor: str) -> int:
+    """
+    :param cursor: Cursor made by encode_cursor
+    :return: id of the last item on the previous page
+    """
+    try:
+        return int(base64.urlsafe_b64decode(cursor.encode()).decode())
+    except (binascii.Error, UnicodeError, ValueError):
+        raise BadCursor(f'Bad cursor {cursor}')
+
+
+def page_size(limit: Optional[int]) -> int:
+    """
+    :param limit: page size requested by client or None
+    :return: page size limited by MAX_PAGE_SIZE
+    """
+    if limit is None:
+        return DEFAULT_PAGE_SIZE
+    return max(1, min(limit, MAX_PAGE_SIZE))
+
+
+def keyset_page(query, column, limit: Optional[int] = None, after: Optional[str] = None,
+                key: Callable[[Any], int] = lambda item: item.id) -> Tuple[List, Optional[str]]:
+    """
+    Selects one page of query ordered by column
+    :param query: Query to paginate
+    :param column: Unique indexed integer column to sort by(e.g Issue.id)
+    :param limit: page size, see page_size
+    :param after: cursor of the page, None for the first page
+    :param key: function that gets value of column from selected item
+    :return: List of page items and cursor of the next page(None if it is the last page)
+    """
+    limit = page_size(limit)
+    if after:
+        query = query.filter(column > decode_cursor(after))
+    # One extra row tells whether there is the next page
+    items = query.order_by(column).limit(limit + 1).all()
+    if len(items) > limit:
+        items = items[:limit]
+        return items, encode_cursor(key(items[-1]))
+    return items, None
+
+
+def keyset_chunks(query, column, chunk_size: int = DEFAULT_PAGE_SIZE, after_id: Optional[int] = None,
+                  key: Callable[[Any], int] = lambda item: item.id) -> Iterator[List]:
+    """
+    Iterates over the whole query chunk by chunk, every chunk is selected by separate keyset query
+    Only one chunk is kept in memory at once
+    :param query: Query to iterate over
+    :param column: Unique indexed integer column to sort by(e.g Issue.id)
+    :param chunk_size: count of rows selected by one query
+    :param after_id: start after item with this value of column, None to start from the beginning
+    :param key: function that gets value of column from selected item
+    :return: Iterator of lists of items
+    """
+    while True:
+        chunk_query = query if after_id is None else query.filter(column > after_id)
+        chunk = chunk_query.order_by(column).limit(chunk_size).all()
+        if chunk:
+            yield chunk
+        if len(chunk) < chunk_size:
+            return
+        after_id = key(chunk[-1])
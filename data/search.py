@@ -0,0 +1,113 @@
+"""
+Full-text search over issues with SQLite FTS5
+issues_fts is external content index of summary, description and steps_to_reproduce of issues table,
+triggers keep it in sync with inserts, updates and deletes of issues
+"""
+from typing import Iterable, List, NamedTuple, Optional
+
+from markupsafe import escape, Markup
+from sqlalchemy import event, text
+
+from .models import Issue
+
+# Statements that create index and triggers in new database, migration 0c6d2e8f4a13 has their copy
+FTS_DDL = (
+    "CREATE VIRTUAL TABLE IF NOT EXISTS issues_fts USING fts5("
+    "summary, description, steps_to_reproduce, content='issues', content_rowid='id')",
+
+    "CREATE TRIGGER IF NOT EXISTS issues_fts_insert AFTER INSERT ON issues BEGIN "
+    "INSERT INTO issues_fts(rowid, summary, description, steps_to_reproduce) "
+    "VALUES (new.id, new.summary, new.description, new.steps_to_reproduce); END",
+
+    "CREATE TRIGGER IF NOT EXISTS issues_fts_delete AFTER DELETE ON issues BEGIN "
+    "INSERT INTO issues_fts(issues_fts, rowid, summary, description, steps_to_reproduce) "
+    "VALUES ('delete', old.id, old.summary, old.description, old.steps_to_reproduce); END",
+
+    "CREATE TRIGGER IF NOT EXISTS issues_fts_update AFTER UPDATE OF summary, description, steps_to_reproduce "
+    "ON issues BEGIN "
+    "INSERT INTO issues_fts(issues_fts, rowid, summary, description, steps_to_reproduce) "
+    "VALUES ('delete', old.id, old.summary, old.description, old.steps_to_reproduce); "
+    "INSERT INTO issues_fts(rowid, summary, description, steps_to_reproduce) "
+    "VALUES (new.id, new.summary, new.description, new.steps_to_reproduce); END",
+)
+# Fills index from existing issues
+FTS_REBUILD = "INSERT INTO issues_fts(issues_fts) VALUES ('rebuild')"
+
+DEFAULT_SEARCH_LIMIT = 20
+MAX_SEARCH_LIMIT = 100
+
+# Control characters can't appear in issue text, they mark matched terms in snippet before escaping
+_MATCH_START, _MATCH_END = '\x02', '\x03'
+
+_SEARCH_SQL = (
+    "SELECT issues.id, issues.tracking, issues.summary, issues.project_id, "
+    f"snippet(issues_fts, -1, '{_MATCH_START}', '{_MATCH_END}', '...', 12) AS snippet, "
+    "bm25(issues_fts) AS rank "
+    "FROM issues_fts JOIN issues ON issues.id = issues_fts.rowid "
+    "WHERE issues_fts MATCH :match {scope} ORDER BY rank LIMIT :limit"
+)
+
+
+@event.listens_for(Issue.__table__, 'after_create')
+def _create_index(target, connection, **kw):
+    for statement in FTS_DDL:
+        connection.execute(statement)
+
+
+class SearchResult(NamedTuple):
+    id: int
+    tracking: str
+    summary: str
+    project_id: int
+    # HTML with matched terms wrapped in <mark>, the rest of issue text is escaped
+    snippet: Markup
+    rank: float
+
+
+def match_expression(query: str) -> Optional[str]:
+    """
+    Turns text typed by user into FTS5 query where every word is a quoted prefix, so FTS5 syntax characters
+    are ignored and "test" finds "testing"
+    :param query: Text typed by user
+    :return: MATCH expression that finds issues containing all words or None if there are no words
+    """
+    words = query.split()
+    if not words:
+        return None
+    return ' '.join('"{}"*'.format(word.replace('"', '""')) for word in words)
+
+
+def _highlight(snippet: Optional[str]) -> Markup:
+    return Markup(str(escape(snippet or '')).replace(_MATCH_START, '<mark>').replace(_MATCH_END, '</mark>'))
+
+
+def search_issues(session, query: str, member_id: Optional[int] = None, project_ids: Optional[Iterable[int]] = None,
+                  limit: int = DEFAULT_SEARCH_LIMIT) -> List[SearchResult]:
+    """
+    Finds issues containing all words of query, the most relevant first
+    bm25 ranks every issue found, so words found in most issues take much longer than rare ones
+    :param session: Session to search in
+    :param query: Text typed by user
+    :param member_id: search only in projects where this User.id is a member, None for all projects(admin)
+    :param project_ids: search only in these projects
+    :param limit: maximal count of results, limited by MAX_SEARCH_LIMIT
+    :return: List of SearchResult
+    """
+    match = match_expression(query)
+    if match is None:
+        return []
+    params = {'match': match, 'limit': max(1, min(limit, MAX_SEARCH_LIMIT))}
+    scope = ''
+    if member_id is not None:
+        scope += 'AND issues.project_id IN (SELECT project_id FROM user_to_project WHERE member_id = :member_id) '
+        params['member_id'] = member_id
+    if project_ids is not None:
+        project_ids = [int(project_id) for project_id in project_ids]
+        if not project_ids:
+            return []
+        names = [f'project_{number}' for number in range(len(project_ids))]
+        scope += 'AND issues.project_id IN ({}) '.format(', '.join(f':{name}' for name in names))
+        params.update(zip(names, project_ids))
+    rows = session.execute(text(_SEARCH_SQL.format(scope=scope)), params).fetchall()
+    return [SearchResult(row.id, row.tracking, row.summary, row.project_id, _highlight(row.snippet), row.rank)
+            for row in rows]
@@ -0,0 +1,359 @@
+"""
+Streaming import and export of projects, members and issues, see manage.py import and export commands
+
+JSONL file has one record per line, type of record tells what it is:
+    {"type": "project", "project_name": "Bugtracker", "short_project_tag": "BT", "description": "",
+     "priorities": ["Critical", "Major"], "subsystems": ["UI"]}
+    {"type": "member", "project": "BT", "username": "alice", "role": "developer"}
+    {"type": "issue", "project": "BT", "summary": "...", "description": "...", "steps_to_reproduce": "...",
+     "state": "Unresolved", "priority": "Major", "date_of_creation": "2020-01-31T12:00:00", "assignees": ["alice"]}
+CSV file has records of one type, header row names fields of the type, lists are separated by ;
+
+Records are imported chunk by chunk, every chunk is one transaction with a few bulk INSERT statements,
+so memory doesn't depend on size of file. Members who don't exist are created as users without password
+Issues get new tracking numbers of their project, tracking field of exported issue is ignored by import
+Export streams one project by keyset chunks(see data.pagination), so memory doesn't depend on count of issues
+"""
+import csv
+import datetime
+import itertools
+import json
+import time
+
+from collections import defaultdict
+from typing import Callable, Dict, Iterable, Iterator, List, Optional, TextIO, Tuple
+
+from sqlalchemy import exists, select
+
+from .issue_bulk import NEW_ISSUE_FIELDS, insert_issues, new_issue_error, project_priorities
+from .models import (Issue, IssuePriority, Project, User, ISSUE_PRIORITIES, association_table_priority_to_project,
+                     association_table_subsystems_to_project, association_table_user_to_issue,
+                     association_table_user_to_project)
+from .pagination import keyset_chunks
+
+# Count of records imported by one transaction
+IMPORT_CHUNK_SIZE = 1000
+# Count of issues selected by one query of export
+EXPORT_CHUNK_SIZE = 1000
+
+RECORD_TYPES = ('project', 'member', 'issue')
+# Fields of CSV records that are lists
+CSV_LIST_FIELDS = ('priorities', 'subsystems', 'assignees')
+CSV_LIST_SEPARATOR = ';'
+# Project roles of imported members, same as roles of change_project_role route
+MEMBER_ROLES = ('root', 'manager', 'developer')
+# Project role of imported member without role
+DEFAULT_MEMBER_ROLE = 'developer'
+
+# Line number of record in file and the record
+Record = Tuple[int, dict]
+
+
+class TransferError(ValueError):
+    """
+    Raised when file can't be imported at all, e.g unknown format
+    """
+
+
+class TransferStats:
+    """
+    Counts of imported or exported records and time spent on them
+    """
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.seconds = 0.0
+        self.rows = 0
+        self.rejected = 0
+
+    def stop(self) -> 'TransferStats':
+        self.seconds = time.perf_counter() - self.started
+        return self
+
+    @property
+    def rows_per_second(self) -> float:
+        return self.rows / self.seconds if self.seconds else 0.0
+
+
+def read_jsonl(file: TextIO) -> Iterator[Record]:
+    """
+    :param file: JSONL file opened for reading
+    :return: Iterator of line numbers and records, record of line that isn't a JSON object has only error
+    """
+    for number, line in enumerate(file, start=1):
+        if not line.strip():
+            continue
+        try:
+            record = json.loads(line)
+        except ValueError as error:
+            record = {'error': f'Bad JSON: {error}'}
+        if not isinstance(record, dict):
+            record = {'error': 'Record must be an object'}
+        yield number, record
+
+
+def read_csv(file: TextIO, record_type: str) -> Iterator[Record]:
+    """
+    :param file: CSV file with header row opened for reading(with newline='')
+    :param record_type: type of all records of file, one of RECORD_TYPES
+    :return: Iterator of line numbers and records
+    """
+    if record_type not in RECORD_TYPES:
+        raise TransferError(f'Unknown type {record_type}, expected one of {", ".join(RECORD_TYPES)}')
+    reader = csv.DictReader(file)
+    for record in reader:
+        for field in CSV_LIST_FIELDS:
+            if field in record:
+                record[field] = [value for value in (record[field] or '').split(CSV_LIST_SEPARATOR) if value]
+        record['type'] = record_type
+        yield reader.line_num, record
+
+
+class Importer:
+    """
+    Imports records into database of session, see module docstring
+    Ids of projects and users are cached for the whole import, so every chunk selects only new of them
+    """
+
+    def __init__(self, session, chunk_size: int = IMPORT_CHUNK_SIZE,
+                 on_error: Optional[Callable[[int, str], None]] = None):
+        """
+        :param session: Session to import in, it is committed after every chunk
+        :param chunk_size: count of records imported by one transaction
+        :param on_error: function called with line number and message of every rejected record
+        """
+        self.session = session
+        self.chunk_size = chunk_size
+        self.on_error = on_error or (lambda number, message: None)
+        self.stats = TransferStats()
+        # Tag -> (Project.id, priorities of project)
+        self.projects: Dict[str, Tuple[int, list]] = {}
+        # Username -> User.id
+        self.users: Dict[str, int] = {}
+
+    def run(self, records: Iterable[Record]) -> TransferStats:
+        """
+        :param records: line numbers and records made by read_jsonl or read_csv
+        :return: Stats of import
+        """
+        records = iter(records)
+        with self.session.no_autoflush:
+            while True:
+                chunk = list(itertools.islice(records, self.chunk_size))
+                if not chunk:
+                    break
+                try:
+                    self.import_chunk(chunk)
+                    self.session.commit()
+                except Exception:
+                    self.session.rollback()
+                    raise
+        return self.stats.stop()
+
+    def reject(self, number: int, message: str) -> None:
+        self.stats.rejected += 1
+        self.on_error(number, message)
+
+    def import_chunk(self, chunk: List[Record]) -> None:
+        by_type = defaultdict(list)
+        for number, record in chunk:
+            if 'error' in record:
+                self.reject(number, record['error'])
+            elif record.get('type') not in RECORD_TYPES:
+                self.reject(number, f'Unknown type {record.get("type")}, expected one of {", ".join(RECORD_TYPES)}')
+            else:
+                by_type[record['type']].append((number, record))
+        # Members and issues can refer to projects of the same chunk
+        self.import_projects(by_type['project'])
+        self.import_members(by_type['member'])
+        self.import_issues(by_type['issue'])
+
+    def load_projects(self, tags: Iterable[str]) -> None:
+        tags = {tag for tag in tags if tag and tag not in self.projects}
+        if not tags:
+            return
+        rows = self.session.execute(select([Project.short_project_tag, Project.id]).where(
+            Project.short_project_tag.in_(tags))).fetchall()
+        priorities = project_priorities(self.session, [project_id for _, project_id in rows])
+        for tag, project_id in rows:
+            self.projects[tag] = (project_id, priorities[project_id])
+
+    def load_users(self, usernames: Iterable[str]) -> None:
+        usernames = {username for username in usernames if username and username not in self.users}
+        if usernames:
+            self.users.update(self.session.execute(select([User.username, User.id]).where(
+                User.username.in_(usernames))).fetchall())
+
+    def import_projects(self, records: List[Record]) -> None:
+        if not records:
+            return
+        self.load_projects(record.get('short_project_tag') for _, record in records)
+        names = {record.get('project_name') for _, record in records}
+        taken_names = {row[0] for row in self.session.execute(select([Project.project_name]).where(
+            Project.project_name.in_(names)))}
+        rows, links = [], []
+        for number, record in records:
+            tag, name = record.get('short_project_tag'), record.get('project_name')
+            priorities = record.get('priorities') or ISSUE_PRIORITIES
+            wrong = not isinstance(priorities, list) or not all(isinstance(priority, str) and priority
+                                                                 for priority in priorities)
+            if not tag or not name:
+                self.reject(number, 'You did not pass project_name or short_project_tag')
+            elif tag in self.projects or name in taken_names:
+                self.reject(number, f'Project {name} or tag {tag} already exists')
+            elif wrong:
+                self.reject(number, 'priorities must be a list of names')
+            else:
+                taken_names.add(name)
+                priorities = list(dict.fromkeys(priorities))
+                # Id is known after insert, placeholder keeps tag taken for the rest of chunk
+                self.projects[tag] = (None, priorities)
+                rows.append({'project_name': name, 'short_project_tag': tag,
+                             'description': record.get('description') or '',
+                             'created_date': datetime.datetime.now()})
+                links.append((tag, priorities, record.get('subsystems') or ()))
+        if not rows:
+            return
+        self.session.execute(Project.__table__.insert(), rows)
+        # Priorities that no project had before get their codes
+        IssuePriority.add_names(self.session, (priority for _, priorities, _ in links for priority in priorities))
+        ids = dict(self.session.execute(select([Project.short_project_tag, Project.id]).where(
+            Project.short_project_tag.in_([row['short_project_tag'] for row in rows]))).fetchall())
+        for tag, priorities, _ in links:
+            self.projects[tag] = (ids[tag], priorities)
+        self.session.execute(association_table_priority_to_project.insert(), [
+            {'project_id': ids[tag], 'priority': priority} for tag, priorities, _ in links for priority in priorities])
+        subsystems = [{'project_id': ids[tag], 'subsystem': subsystem}
+                      for tag, _, project_subsystems in links for subsystem in project_subsystems]
+        if subsystems:
+            self.session.execute(association_table_subsystems_to_project.insert(), subsystems)
+        self.stats.rows += len(rows)
+
+    def import_members(self, records: List[Record]) -> None:
+        if not records:
+            return
+        self.load_projects(record.get('project') for _, record in records)
+        # Project has one root, so root of other user is rejected like by change_project_role route
+        roots = dict(self.session.execute(select([Project.id, User.username]).select_from(
+            Project.__table__.outerjoin(User.__table__, User.id == Project.root_user_id)).where(
+            Project.id.in_({self.projects[record.get('project')][0] for _, record in records
+                            if record.get('project') in self.projects}))).fetchall())
+        valid = []
+        for number, record in records:
+            role = record.get('role') or DEFAULT_MEMBER_ROLE
+            project_id = self.projects.get(record.get('project'), (None,))[0]
+            if project_id is None:
+                self.reject(number, f'Project {record.get("project")} doesnt exist')
+            elif not record.get('username'):
+                self.reject(number, 'You did not pass username')
+            elif role not in MEMBER_ROLES:
+                self.reject(number, f'Excepted root, manager or developer, got: {role}')
+            elif role == 'root' and roots[project_id] not in (None, record['username']):
+                self.reject(number, f'Project {record["project"]} already has root')
+            else:
+                if role == 'root':
+                    roots[project_id] = record['username']
+                valid.append((record['username'], project_id, role))
+        if not valid:
+            return
+
+        self.load_users(username for username, _, _ in valid)
+        new_users = {username for username, _, _ in valid if username not in self.users}
+        if new_users:
+            now = datetime.datetime.now()
+            self.session.execute(User.__table__.insert(), [{'username': username, 'role': 'User', 'created_date': now}
+                                                           for username in sorted(new_users)])
+            self.load_users(new_users)
+
+        rows = [{'member_id': self.users[username], 'project_id': project_id, 'project_role': role,
+                 'date_of_add': datetime.datetime.now()} for username, project_id, role in valid]
+        # Member who is already in project keeps his role, so he becomes root of project only if he is root there
+        self.session.execute(association_table_user_to_project.insert().prefix_with('OR IGNORE'), rows)
+        members = association_table_user_to_project.c
+        for row in rows:
+            if row['project_role'] == 'root':
+                self.session.execute(Project.__table__.update().where(
+                    (Project.id == row['project_id']) & exists().where(
+                        (members.member_id == row['member_id']) & (members.project_id == row['project_id'])
+                        & (members.project_role == 'root'))).values(root_user_id=row['member_id']))
+        self.stats.rows += len(rows)
+
+    def import_issues(self, records: List[Record]) -> None:
+        if not records:
+            return
+        self.load_projects(record.get('project') for _, record in records)
+        self.load_users(username for _, record in records for username in record.get('assignees') or ())
+        by_project = defaultdict(list)
+        for number, record in records:
+            project = self.projects.get(record.get('project'))
+            assignees = record.get('assignees') or ()
+            error = new_issue_error(record, project[1]) if project is not None else \
+                f'Project {record.get("project")} doesnt exist'
+            unknown = [username for username in assignees if username not in self.users]
+            date_of_creation = None
+            if error is None and unknown:
+                error = f'Unknown assignees {", ".join(unknown)}'
+            if error is None and record.get('date_of_creation'):
+                try:
+                    date_of_creation = datetime.datetime.fromisoformat(record['date_of_creation'])
+                except (TypeError, ValueError):
+                    error = f'Bad date_of_creation {record["date_of_creation"]}, expected ISO format'
+            if error is not None:
+                self.reject(number, error)
+                continue
+            row = {field: record[field] for field in NEW_ISSUE_FIELDS}
+            row['date_of_creation'] = date_of_creation or datetime.datetime.now()
+            row['assignee_ids'] = [self.users[username] for username in assignees]
+            by_project[record['project']].append(row)
+        for tag, rows in by_project.items():
+            insert_issues(self.session, self.projects[tag][0], tag, rows)
+            self.stats.rows += len(rows)
+
+
+def export_project(session, project_tag: str, file: TextIO, chunk_size: int = EXPORT_CHUNK_SIZE) -> TransferStats:
+    """
+    Writes project, its members and issues with assignees to JSONL file that can be imported back
+    :param session: Session to select in
+    :param project_tag: Project.short_project_tag
+    :param file: file opened for writing
+    :param chunk_size: count of issues selected by one query
+    :return: Stats of export
+    """
+    stats = TransferStats()
+    project = session.query(Project).filter(Project.short_project_tag == project_tag).first()
+    if project is None:
+        raise TransferError(f'Project {project_tag} doesnt exist')
+
+    def write(record: dict) -> None:
+        file.write(json.dumps(record, ensure_ascii=False) + '\n')
+        stats.rows += 1
+
+    write({'type': 'project', 'project_name': project.project_name, 'short_project_tag': project_tag,
+           'description': project.description,
+           'priorities': project_priorities(session, [project.id])[project.id],
+           'subsystems': [row[0] for row in session.execute(
+               select([association_table_subsystems_to_project.c.subsystem]).where(
+                   association_table_subsystems_to_project.c.project_id == project.id))]})
+    # Rows of result are fetched from cursor while they are written
+    for username, role in session.execute(
+            select([User.username, association_table_user_to_project.c.project_role]).select_from(
+                association_table_user_to_project.join(User, User.id == association_table_user_to_project.c.member_id)
+            ).where(association_table_user_to_project.c.project_id == project.id).order_by(User.id)):
+        write({'type': 'member', 'project': project_tag, 'username': username, 'role': role})
+
+    issues = session.query(Issue.id, Issue.tracking, Issue.date_of_creation,
+                           *(getattr(Issue, field) for field in NEW_ISSUE_FIELDS)).filter(
+        Issue.project_id == project.id)
+    for chunk in keyset_chunks(issues, Issue.id, chunk_size):
+        assignees = defaultdict(list)
+        for issue_id, username in session.execute(
+                select([association_table_user_to_issue.c.issue_id, User.username]).select_from(
+                    association_table_user_to_issue.join(User, User.id == association_table_user_to_issue.c.user_id)
+                ).where(association_table_user_to_issue.c.issue_id.in_([issue.id for issue in chunk]))):
+            assignees[issue_id].append(username)
+        for issue in chunk:
+            write({'type': 'issue', 'project': project_tag, 'tracking': issue.tracking,
+                   **{field: getattr(issue, field) for field in NEW_ISSUE_FIELDS},
+                   'date_of_creation': issue.date_of_creation.isoformat() if issue.date_of_creation else None,
+                   'assignees': assignees[issue.id]})
+    return stats.stop()
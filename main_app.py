@@ -4,9 +4,7 @@ import sys
 
 from typing import Optional
 
-from data.models import association_table_user_to_project
-
-from flask import render_template, flash, url_for, redirect, request, abort, send_from_directory
+from flask import render_template, flash, url_for, redirect, request, abort, send_from_directory, Response
 from flask import Flask
 
 from flask_login import LoginManager
@@ -19,13 +17,26 @@ from flask_restful import Api
 import logging
 from logging.config import dictConfig
 
-from data.models import User, Project, Issue
+from sqlalchemy import orm, select
+from werkzeug.urls import url_encode
+
+from data.models import User, Project, Issue, SavedSearch, ISSUE_STATES
+from data.models import association_table_priority_to_project, association_table_user_to_project
 from data import db_session
+from data.issue_stats import project_stats
+from data.search import search_issues, MAX_SEARCH_LIMIT
+from data.issue_filters import IssueFilters, BadFilter, SORTS
+from data.pagination import BadCursor
+from data.issue_query import compile_query, record_run, visible_issues, QuerySyntaxError, Timer, SLOW_SEARCH_MS
 
 from src import forms
 from src.model_views import MyAdminIndexView, MyModelView
 from src.misc_funcs import generate_random_string
+from src.user_cache import load_user_snapshot
+from src.authorization import can_view, can_manage, membership
+from src import instrumentation, metrics
 from api import resources
+from api.auth import authenticate
 
 ########################################################################################################################
 ############################################# Init PORT, HOST AND ADMIN PANEL OBJECTS ##################################
@@ -54,36 +65,50 @@ app = Flask('App')
 app.config['SECRET_KEY'] = generate_random_string(16)
 
 app.config['SQLITE3_SETTINGS'] = {
-    'host': 'db/bugtracker.sqlite'
+    # Database file can be replaced by another one, e.g by generated database of benchmarks
+    'host': os.environ.get('BUGTRACKER_DB', 'db/bugtracker.sqlite'),
+    # Connection profile, see data.db_session.SQLITE_PROFILES
+    'profile': os.environ.get('BUGTRACKER_DB_PROFILE', 'default'),
+    # Engine pool settings, see data.db_session.DEFAULT_POOL_SETTINGS
+    'pool': {
+        'pool_size': 5,
+        'max_overflow': 10,
+        'pool_recycle': 3600,
+        'pool_pre_ping': True
+    }
 }
 
 # This for pythonwanywhere.com
 if __name__ != '__main__' and not app.testing and os.path.exists('/home/Sadn3ss'):
     app.root_path = os.path.dirname(os.path.abspath(__file__))
     if sys.platform != 'win32':
-        app.config['SQLITE3_SETTINGS'] = {
-            'host': '/home/Sadn3ss/mysite/db/bugtracker.sqlite'
-        }
+        app.config['SQLITE3_SETTINGS']['host'] = '/home/Sadn3ss/mysite/db/bugtracker.sqlite'
+        app.config['SQLITE3_SETTINGS']['profile'] = 'production'
     else:
-        app.config['SQLITE3_SETTINGS'] = {
-            'host': 'db/bugtracker.sqlite'
-        }
-
-db_session.global_init(app.config['SQLITE3_SETTINGS']['host'])
+        app.config['SQLITE3_SETTINGS']['host'] = 'db/bugtracker.sqlite'
+
+db_session.global_init(app.config['SQLITE3_SETTINGS']['host'], app.config['SQLITE3_SETTINGS']['profile'],
+                       **app.config['SQLITE3_SETTINGS']['pool'])
+# One database session per request, closed on app context teardown
+db_session.init_app(app)
+# Statements of every request are counted, headers with them are sent only outside of production
+app.config['SQL_QUERY_HEADERS'] = app.config['SQLITE3_SETTINGS']['profile'] != 'production'
+instrumentation.init_app(app, db_session.get_engine())
+# Request latency, status codes and gauges of database and caches, see /metrics
+metrics.init_app(app)
 
 # Init login manager
 login_manager = LoginManager()
 login_manager.init_app(app)
 
-# Create session for flask-admin
-adm_session = db_session.create_session()
+# flask-admin uses request sessions registry, so every admin request gets its own session
+adm_session = db_session.get_scoped_session()
 admin = Admin(app, index_view=MyAdminIndexView(), template_mode='bootstrap3')
 
 # Add all our models to flask-admin
 admin.add_view(MyModelView(User, adm_session))
 admin.add_view(MyModelView(Project, adm_session))
 admin.add_view(MyModelView(Issue, adm_session))
-adm_session.close()
 
 # Init api object
 api = Api(app)
@@ -93,15 +118,24 @@ api.add_resource(resources.UserResource, f'/api/v{API_VER}/user/', f'/api/v{API_
 api.add_resource(resources.ProjectResource, f'/api/v{API_VER}/project/', f'/api/v{API_VER}/project')
 api.add_resource(resources.UserResourceList, f'/api/v{API_VER}/users/', f'/api/v{API_VER}/users')
 api.add_resource(resources.ProjectResourceList, f'/api/v{API_VER}/projects/', f'/api/v{API_VER}/projects')
+api.add_resource(resources.ProjectStatsResource, f'/api/v{API_VER}/project/stats/',
+                 f'/api/v{API_VER}/project/stats')
 api.add_resource(resources.IssueResource, f'/api/v{API_VER}/issue/', f'/api/v{API_VER}/issue')
 api.add_resource(resources.IssueResourceList, f'/api/v{API_VER}/issues/', f'/api/v{API_VER}/issues')
+api.add_resource(resources.IssueSearchResource, f'/api/v{API_VER}/issues/search/',
+                 f'/api/v{API_VER}/issues/search')
+api.add_resource(resources.SavedSearchResource, f'/api/v{API_VER}/searches/', f'/api/v{API_VER}/searches')
+api.add_resource(resources.IssueBatchResource, f'/api/v{API_VER}/issues/batch/',
+                 f'/api/v{API_VER}/issues/batch')
+api.add_resource(resources.ProjectBatchResource, f'/api/v{API_VER}/projects/batch/',
+                 f'/api/v{API_VER}/projects/batch')
+api.add_resource(resources.UserBatchResource, f'/api/v{API_VER}/users/batch/', f'/api/v{API_VER}/users/batch')
+api.add_resource(resources.IssueBulkResource, f'/api/v{API_VER}/issues/bulk/', f'/api/v{API_VER}/issues/bulk')
 
 # Port, IP address and debug mode
 PORT, HOST = int(os.environ.get("PORT", 8080)), '0.0.0.0'
 DEBUG = True
 
-# Role of users that can change project properties
-PROJECT_MANAGE_ROLES = ['root', 'manager']
 logger = app.logger
 
 
@@ -113,10 +147,9 @@ logger = app.logger
 # Loading current user
 @login_manager.user_loader
 def load_user(user_id):
-    session = db_session.create_session()
-    loaded_user = session.query(User).get(user_id)
-    logger.debug(f'User {loaded_user.username} loaded ')
-    session.close()
+    loaded_user = load_user_snapshot(user_id)
+    if loaded_user is not None:
+        logger.debug(f'User {loaded_user.username} loaded ')
     return loaded_user
 
 
@@ -124,9 +157,7 @@ def load_user(user_id):
 @app.route('/')
 @app.route('/index')
 def index():
-    session = db_session.create_session()
     title = 'Index'
-    session.close()
     return render_template('index.html', title=title)
 
 
@@ -139,16 +170,13 @@ def join():
     :return:
     """
     title = 'Join us'
-    session = db_session.create_session()
     # Registration form
     form = forms.RegistrationForm()
     if form.validate_on_submit():
-        # Creating Database Session
-        session = db_session.create_session()
+        session = db_session.get_session()
 
         # checking if user already registered
         if session.query(User).filter(User.username == form.username.data).all():
-            session.close()
             logger.info(f'user with username {form.username.data} already registered, redirecting on /join with'
                         f' the flash')
             flash('User with this username already registered', 'alert alert-danger')
@@ -171,11 +199,9 @@ def join():
         session.merge(user)
         # Commiting changes
         session.commit()
-        session.close()
         logger.info(f'User {form.username.data} with IP {request.remote_addr} just registered, redirecting on /index')
         flash('Your account has been created and now you are able to log in', 'alert alert-primary')
         return redirect(url_for('index'))
-    session.close()
     return render_template('join.html', title=title, form=form)
 
 
@@ -189,7 +215,7 @@ def login():
     title = 'Login'
     form = forms.LoginForm()
 
-    session = db_session.create_session()
+    session = db_session.get_session()
 
     if form.validate_on_submit():
         user = session.query(User).filter(User.username == form.username.data).first()
@@ -236,7 +262,7 @@ def profile(user_id):
     :param user_id: User.id of user whose profile we want to see
     :return:Profile page rendered using profile.html template if all OK
     """
-    session = db_session.create_session()
+    session = db_session.get_session()
 
     # Get data that we need
     user = session.query(User).filter(User.id == user_id).first()
@@ -262,7 +288,7 @@ def regenerate_api_key_page(user_id):
     :param user_id: User.id of User who want to change their API key
     :return: redirect on profile page
     """
-    session = db_session.create_session()
+    session = db_session.get_session()
     user_object = session.query(User).filter(User.id == user_id).first()
     if current_user != user_object:
         abort(403)
@@ -281,7 +307,7 @@ def profile_projects(user_id):
     :param user_id: User.id whom projects we want to see
     :return: Page with all user projects if current_user == User or current_user.is_admin
     """
-    session = db_session.create_session()
+    session = db_session.get_session()
 
     user = session.query(User).filter(User.id == user_id).first()
     # Check if user actually exist
@@ -294,7 +320,11 @@ def profile_projects(user_id):
         logger.info(f'User {current_user.username} doesnt have access to {user.username}`s projects')
         abort(403)
     title = f"{user.username}'s projects"
-    return render_template('user_projects.html', title=title, user=user)
+    projects = user.projects
+    # Issues of all projects are counted by one query
+    issue_counts = Project.issue_counts(session, [project_object.id for project_object in projects])
+    return render_template('user_projects.html', title=title, user=user, projects=projects,
+                           issue_counts=issue_counts)
 
 
 @app.route('/profile/<user_id>/issues')
@@ -306,13 +336,12 @@ def profile_issues(user_id):
     :param user_id: User.id whom issue we want to see
     :return: Page with all user issues if current_user == User or current_user.is_admin
     """
-    session = db_session.create_session()
+    session = db_session.get_session()
     user = session.query(User).filter(User.id == user_id).first()
 
     # Check if user actually exists
     if user is None:
         # User doesn't exist -> throw 404
-        session.close()
         logger.info(f'User with User.id={user_id} doesnt exist')
         abort(404)
     if current_user.id != user.id and not current_user.is_admin:
@@ -320,13 +349,23 @@ def profile_issues(user_id):
         logger.info(f'User {current_user.username} doesnt have access to {user.username}`s issues')
         abort(403)
 
-    return render_template('user_issues.html', user=user)
+    # Priorities of all projects of user to choose from
+    priorities = [row[0] for row in session.execute(
+        select([association_table_priority_to_project.c.priority]).distinct().where(
+            association_table_priority_to_project.c.project_id.in_(
+                select([association_table_user_to_project.c.project_id]).where(
+                    association_table_user_to_project.c.member_id == user.id)
+            )).order_by(association_table_priority_to_project.c.priority)
+    )]
+    # One page of filtered issues, projects of page issues are loaded by one query
+    query = session.query(Issue).with_parent(user, 'issues').options(orm.selectinload('project'))
+    return render_issue_page('user_issues.html', query, priorities, user=user)
 
 
 @app.route('/projects/<project_id>/issues')
 @login_required
 def project_issues(project_id):
-    session = db_session.create_session()
+    session = db_session.get_session()
     # Get project object
     project_object = session.query(Project).filter(Project.id == project_id).first()
     # Check if project exist
@@ -334,10 +373,126 @@ def project_issues(project_id):
         # Project object is None -> project doesn't exist, throw 404
         abort(404)
     # Check does user have access to this project
-    if current_user not in project_object.members and not current_user.is_admin:
+    if not can_view(current_user, project_object.id):
         # Current user doesn't have access to this project, throw 403
         abort(403)
-    return render_template('project_issues.html', project=project_object)
+    # Search box, the most relevant issues of the project first
+    search_query = request.args.get('q', '').strip()
+    if search_query:
+        results = search_issues(session, search_query, project_ids=[project_object.id], limit=MAX_SEARCH_LIMIT)
+        return render_template('project_issues.html', project=project_object, search_query=search_query,
+                               results=results)
+
+    # One page of filtered issues, template doesn't use issue relations, so nothing is loaded lazily
+    query = session.query(Issue).filter(Issue.project_id == project_object.id)
+    priorities = [row[0] for row in project_object.get_project_priorities()]
+    return render_issue_page('project_issues.html', query, priorities, assignees=project_object.members,
+                             project=project_object)
+
+
+def render_issue_page(template: str, query, priorities, assignees=(), **context):
+    """
+    Renders one page of issues filtered and sorted by arguments of request, see data.issue_filters
+    Throws 400 if filters or cursor are incorrect
+    :param template: Template of page
+    :param query: Query of all issues that could be shown on page
+    :param priorities: Priorities to choose from in filters form
+    :param assignees: Users to choose from in filters form
+    :param context: Rest of template context
+    :return: Rendered page
+    """
+    cursor = request.args.get('cursor')
+    try:
+        filters = IssueFilters.from_args(request.args, priorities)
+        issues, next_cursor = filters.page(query, after=cursor)
+    except (BadFilter, BadCursor) as error:
+        logger.info(f'Bad issue filters {request.args}: {error}')
+        abort(400)
+    return render_template(template, issues=issues, filters=filters, cursor=cursor, next_cursor=next_cursor,
+                           filter_query=url_encode(filters.to_args()), filters_action=request.path,
+                           states=ISSUE_STATES, priorities=priorities, assignees=assignees, sorts=SORTS, **context)
+
+
+@app.route('/searches', methods=['GET', 'POST'])
+@login_required
+def saved_searches():
+    """
+    List of saved searches of current user with their timing and form to save new one
+    :return: Page with saved searches or redirect on it when search saved
+    """
+    session = db_session.get_session()
+    form = forms.SavedSearchForm()
+    if form.validate_on_submit():
+        try:
+            compile_query(form.query.data)
+        except QuerySyntaxError as error:
+            form.query.errors.append(str(error))
+        else:
+            session.add(SavedSearch(owner_id=current_user.id, name=form.name.data, query=form.query.data))
+            session.commit()
+            logger.info(f'User {current_user.username} saved search {form.query.data}')
+            return redirect('/searches')
+    searches = session.query(SavedSearch).filter(SavedSearch.owner_id == current_user.id).order_by(
+        SavedSearch.name).all()
+    return render_template('saved_searches.html', title='Saved searches', form=form, searches=searches,
+                           slow_ms=SLOW_SEARCH_MS)
+
+
+def get_own_search(session, search_id: int) -> SavedSearch:
+    """
+    :return: SavedSearch with search_id if it belongs to current user(or current user is admin)
+    Otherwise abort with 404 or 403
+    """
+    saved_search = session.query(SavedSearch).get(search_id)
+    if saved_search is None:
+        abort(404)
+    if saved_search.owner_id != current_user.id and not current_user.is_admin:
+        logger.info(f'User {current_user.username} doesnt have access to saved search {search_id}')
+        abort(403)
+    return saved_search
+
+
+@app.route('/searches/<int:search_id>')
+@login_required
+def run_saved_search(search_id: int):
+    """
+    Runs saved search and renders one page of found issues, time of the run is added to search statistics
+    :param search_id: SavedSearch.id
+    :return: Page with found issues
+    """
+    session = db_session.get_session()
+    saved_search = get_own_search(session, search_id)
+    try:
+        compiled = compile_query(saved_search.query)
+    except QuerySyntaxError as error:
+        # Query was valid when saved, but query language could change since then
+        flash(f'Query of this search is invalid: {error}', 'alert alert-danger')
+        return redirect('/searches')
+
+    cursor = request.args.get('cursor')
+    query = visible_issues(session.query(Issue).options(orm.selectinload('project')), current_user)
+    try:
+        with Timer() as timer:
+            issues, next_cursor = IssueFilters(sort=compiled.sort).page(compiled.apply(query, current_user.id),
+                                                                        after=cursor)
+    except BadCursor:
+        abort(400)
+    if timer.elapsed_ms > SLOW_SEARCH_MS:
+        logger.warning(f'Slow saved search {saved_search.id} ({saved_search.query}): {timer.elapsed_ms:.0f} ms')
+    record_run(session, saved_search.id, timer.elapsed_ms)
+    session.commit()
+    return render_template('saved_search.html', title=saved_search.name, saved_search=saved_search, issues=issues,
+                           cursor=cursor, next_cursor=next_cursor, elapsed_ms=timer.elapsed_ms,
+                           filters_action=request.path, filter_query='')
+
+
+@app.route('/searches/<int:search_id>/delete', methods=['POST'])
+@login_required
+def delete_saved_search(search_id: int):
+    session = db_session.get_session()
+    session.delete(get_own_search(session, search_id))
+    session.commit()
+    return redirect('/searches')
 
 
 @app.route('/project/new', methods=['GET', 'POST'])
@@ -349,15 +504,14 @@ def new_project():
     """
     title = 'Create project'
     creating_project_form = forms.CreateProject()
-    session = db_session.create_session()
-    registered_users = len(session.query(User).all())
+    session = db_session.get_session()
+    registered_users = User.count_total(session)
 
     if creating_project_form.validate_on_submit():
         # Check if project with that project name or project tag already exist
         if session.query(Project).filter(Project.project_name == creating_project_form.project_name.data).all() or \
                 session.query(Project).filter(
                     Project.short_project_tag == creating_project_form.short_project_tag.data).all():
-            session.close()
             logger.info(f'Project with project_name={creating_project_form.project_name.data} or'
                         f' project_tag={creating_project_form.short_project_tag.data} already exist')
             flash('Project with that name already created', 'alert alert-danger')
@@ -369,34 +523,25 @@ def new_project():
         project_object.short_project_tag = creating_project_form.short_project_tag.data if \
             creating_project_form.short_project_tag.data else creating_project_form.project_name.data[:4]
 
-        project_object.members.append(current_user)
+        project_object.members.append(current_user.get_user())
 
         # Commiting changes
         session.merge(project_object)
         session.commit()
-        session.close()
 
-        # Re-creating session to update DB state
-        session = db_session.create_session()
         project_object = \
             session.query(Project).filter(Project.project_name == creating_project_form.project_name.data).first()
 
-        # Updating association table with new user role and adding priorities
-        upd = association_table_user_to_project.update().values(project_role='root').where(
-            association_table_user_to_project.c.member_id == current_user.id).where(
-            association_table_user_to_project.c.project_id == project_object.id)
+        # Making current user project root and adding priorities
         project_id = project_object.id
         project_object.add_project_priorities(('Critical', 'Major', 'Minor', 'Normal'))
-        session.execute(upd)
-        session.commit()
+        current_user.change_project_role(project_id, 'root')
 
         logger.info(f'User {current_user.username} just created the project {project_object.project_name} with ID'
                     f' {project_id}')
 
-        session.close()
         return redirect(f'/projects/{project_id}')
 
-    session.close()
     return render_template('new_project.html', title=title, form=creating_project_form,
                            registred_users=registered_users)
 
@@ -412,9 +557,7 @@ def project(project_id):
     :return: rendered page using project.html
     """
     # Creating db session
-    session = db_session.create_session()
-
-    registered_users = len(session.query(User).all())
+    session = db_session.get_session()
 
     project_object = session.query(Project).filter(Project.id == project_id).first()
 
@@ -424,8 +567,8 @@ def project(project_id):
         logger.info(f'Project with Project.id {project_id} doesnt exist')
         abort(404)
 
-    if current_user not in project_object.members and not current_user.is_admin:
-        logger.info(f'User {current_user.username} doesnt have access to Project(project_name={project_object.name},'
+    if not can_view(current_user, project_object.id):
+        logger.info(f'User {current_user.username} doesnt have access to Project(project_name={project_object.project_name},'
                     f'project_id={project_object.id})')
         abort(403)
 
@@ -434,7 +577,9 @@ def project(project_id):
     date_of_creation = f'{date_of_creation.day}-{date_of_creation.month}-{date_of_creation.year} at {date_of_creation.hour}:' \
                        f'{date_of_creation.minute}:{date_of_creation.second}'
 
-    return render_template('project.html', project=project_object, date_of_creation=date_of_creation)
+    return render_template('project.html', project=project_object, date_of_creation=date_of_creation,
+                           can_manage_project=can_manage(current_user, project_object.id),
+                           stats=project_stats(session, project_object.id))
 
 
 @app.route('/projects/<project_id>/manage')
@@ -449,7 +594,7 @@ def manage_project(project_id):
     :return: Page rendered using project_members.html template
     """
     # Creating db session
-    session = db_session.create_session()
+    session = db_session.get_session()
 
     project_object = session.query(Project).filter(Project.id == project_id).first()
 
@@ -467,7 +612,7 @@ def manage_project(project_id):
 
     # Check does current user have access manage to this project
     # If don`t, throw error page
-    if current_user.project_role(project_object.id) not in PROJECT_MANAGE_ROLES and not current_user.is_admin:
+    if not can_manage(current_user, project_object.id):
         logger.info(f'User {current_user.username} doenst have access to manage Project(project_id={project_id}'
                     f'project_name={project_object.project_name}')
         abort(403)
@@ -483,17 +628,19 @@ def project_members(project_id):
     :param project_id: Project.id in which want to see members
     :return: Page rendered using project_members.html template
     """
-    session = db_session.create_session()
+    session = db_session.get_session()
 
     project_object = session.query(Project).filter(Project.id == project_id).first()
     if project_object is None:
         logger.info(f'Project with Project.id {project_id} doesnt exist')
         abort(404)
-    if current_user.project_role(project_object.id) not in PROJECT_MANAGE_ROLES and not current_user.is_admin:
+    current_user_role = membership(current_user, project_object.id).role
+    if not can_manage(current_user, project_object.id):
         logger.info(f'User {current_user.username} dosent have access to Project(project_name='
                     f'{project_object.project_name}, project_id={project_object.id}')
         abort(403)
-    return render_template('project_members.html', project=project_object)
+    return render_template('project_members.html', project=project_object, members=project_object.member_details(),
+                           current_user_role=current_user_role)
 
 
 @app.route('/projects/<project_id>/manage/add_member/')
@@ -512,8 +659,8 @@ def add_member_to_project(project_id):
         logger.error(KE)
         abort(422)
 
-    session = db_session.create_session()
-    if current_user.project_role(project_id) not in PROJECT_MANAGE_ROLES and not current_user.is_admin:
+    session = db_session.get_session()
+    if not can_manage(current_user, project_id):
         abort(403)
 
     # Check is user exist
@@ -539,7 +686,6 @@ def add_member_to_project(project_id):
     # Commiting changes
     session.merge(user)
     session.commit()
-    session.close()
 
     # Redirect on project members page with flash notification
     flash(f'User {username} successfully joined to the project', 'alert alert-success')
@@ -559,7 +705,7 @@ def remove_user_from_project(project_id):
         name = request.args['name']
     except KeyError as KE:
         abort(422)
-    session = db_session.create_session()
+    session = db_session.get_session()
 
     # Get user object
     user = session.query(User).filter(User.username == name).first()
@@ -578,7 +724,7 @@ def remove_user_from_project(project_id):
         abort(404)
 
     # Check does current user have access
-    if current_user.project_role(project_object.id) not in PROJECT_MANAGE_ROLES and not current_user.is_admin:
+    if not can_manage(current_user, project_object.id):
         abort(403)
 
     # And remove project from user project list
@@ -615,7 +761,7 @@ def change_project_role(project_id):
         logger.error(VE)
         abort(422)
 
-    session = db_session.create_session()
+    session = db_session.get_session()
 
     # Check if project actually exists
     project_object = session.query(Project).filter(Project.id == project_id).first()
@@ -624,7 +770,7 @@ def change_project_role(project_id):
         abort(404)
 
     # Only root and manager can change role of users
-    if current_user.project_role(project_id) not in PROJECT_MANAGE_ROLES and not current_user.is_admin:
+    if not can_manage(current_user, project_id):
         logger.info(
             f'User {current_user.username}(is_admin={current_user.is_admin}) tried change project roles(project'
             f' root:{project_object.get_root()}')
@@ -652,17 +798,17 @@ def change_project_role(project_id):
 
         # All checks behind: user exists, current user either site admin or project root
         logger.info(f'Changing on root, project id:{project_id}')
+        old_root = project_object.get_root()
         # Making new root
         user_object_to_change.change_project_role(project_id, role)
         # Making Old root a project manager
-        logger.info(f'{project_object.get_root().username} became manager, new root'
-                    f' - {user_object_to_change.username}')
-
-        project_object.get_root().change_project_role(project_id, 'manager')
+        if old_root is not None and old_root.id != user_object_to_change.id:
+            logger.info(f'{old_root.username} became manager, new root'
+                        f' - {user_object_to_change.username}')
+            old_root.change_project_role(project_id, 'manager')
         # Making flash notification that we successfully changed project root
         flash(f'User {user_object_to_change.username} became {user_object_to_change.project_role(project_id)}'
               f' of project', 'alert alert-success')
-        session.close()
 
     if role in ('manager', 'developer'):
         # Check if current user is actually root or site admin
@@ -672,15 +818,19 @@ def change_project_role(project_id):
                 f'User {current_user.username}(is_admin={current_user.is_admin}) tried change project {role}, (project'
                 f' root-{project_object.get_root().username}')
             abort(403)
+        # Project can't be left without root, root changes only by making another user root
+        if project_object.root_user_id == user_object_to_change.id:
+            flash('Make another user root of the project first', 'alert alert-danger')
+            return redirect(f'/projects/{project_id}/manage')
         # All checks behind: user exists, current user either site admin or project root
         logger.info(
-            f'Changing {user_object_to_change.username} role in {project_object.prpject_name}(ID = {project_id}) '
+            f'Changing {user_object_to_change.username} role in {project_object.project_name}(ID = {project_id}) '
             f'Old role: {user_object_to_change.project_role(project_id)}, new role: {role}'
         )
+        user_object_to_change.change_project_role(project_id, role)
         # Making flash notification that we successfully changed user role
         flash(f'User {user_object_to_change.username} became {user_object_to_change.project_role(project_id)}'
               f' of project', 'alert alert-success')
-        session.close()
 
     return redirect(f'/projects/{project_id}/manage')
 
@@ -695,7 +845,7 @@ def issue(issue_tag):
     :param issue_tag: Unique tag of issue
     :return: Page that rendered from issue.html template
     """
-    session = db_session.create_session()
+    session = db_session.get_session()
     # Get issue object from database
     issue_object = session.query(Issue).filter(Issue.tracking == issue_tag).first()
     # Check if issue with that tag actually exists
@@ -704,10 +854,8 @@ def issue(issue_tag):
         logger.info(f'Issue with {issue_tag} doesnt exist, throw 404')
         abort(404)
     # If issue exists then check does current user actually have access to the issue
-    project_obj = issue_object.project[0]  # Using index because .project contain list of projects
-    if current_user not in project_obj.members and not current_user.is_admin:
+    if not can_view(current_user, issue_object.project_id):
         # User doesnt have access to project -> throw 403
-        session.close()
         logger.info(f'User {current_user.username} doesnt have access to Issue with tag {issue_tag}')
         abort(403)
     # User have access -> render template
@@ -726,31 +874,28 @@ def create_issue(project_id):
     """
     title = 'New issue'
     # Creating db session
-    session = db_session.create_session()
+    session = db_session.get_session()
 
     project_object = session.query(Project).filter(Project.id == project_id).first()
     # Check does project with this project_id actually exist
     if project_object is None:
         # If project doesnt exist -> throw 404
         logger.info(f'Project with {project_id} doesnt exist, throw 404')
-        session.close()
         abort(404)
 
     # Check does user have access to this project
-    if current_user not in project_object.members and not current_user.is_admin:
+    if not can_view(current_user, project_object.id):
         logger.info(f'User {current_user.username} doesnt have access to Project(project_name='
                     f'{project_object.project_name}, id={project_id}')
-        abort(403, message="You don't have access to this project")
+        abort(403)
 
     create_issue_form = forms.CreateIssue()
     create_issue_form.priority.choices = [(pr[0], pr[0]) for pr in project_object.get_project_priorities()]
-    create_issue_form.state.choices = [(st, st) for st in (
-        'Unresolved', 'Fixed', 'Not bug', 'Cant reproduce', 'In progress', 'Fixed', 'Rejected')]
+    create_issue_form.state.choices = [(st, st) for st in ISSUE_STATES]
 
     if create_issue_form.validate_on_submit():
-        all_issues = len(project_object.issues)
         issue_object = Issue()
-        issue_object.tracking = f'{project_object.short_project_tag}-{all_issues + 1}'
+        issue_object.tracking = project_object.next_issue_tracking()
         issue_object.summary = create_issue_form.summary.data
         issue_object.priority = create_issue_form.priority.data
         issue_object.state = create_issue_form.state.data
@@ -758,14 +903,12 @@ def create_issue(project_id):
         issue_object.steps_to_reproduce = create_issue_form.steps_to_reproduce.data
         issue_object.attachments = create_issue_form.attachments.data
         issue_object.project_id = project_id
-        # Append issue_object to user and project
-        project_object.issues.append(issue_object)
+        # Append issue_object to user and project from the issue side, so their issue lists are not loaded
+        issue_object.project.append(project_object)
+        issue_object.assignees.append(current_user.get_user())
 
         issue_tag = issue_object.tracking
-        session.merge(issue_object)
-        session.commit()
-        session.refresh(issue_object)
-        issue_object.assignees.append(current_user)
+        session.add(issue_object)
         session.commit()
 
         return redirect(f'/issue/{issue_tag}')
@@ -786,21 +929,18 @@ def change_issue(issue_tag: str):
     :param issue_tag: Issue that we want to change
     :return: Page rendered using new_issue.html with new issue data
     """
-    session = db_session.create_session()
+    session = db_session.get_session()
 
     issue_object: Optional[Issue] = session.query(Issue).filter(Issue.tracking == issue_tag).first()
     # Check does issue with that tag actually exist
     if issue_object is None:
         # If it doesn`t -> throw 404 error page
         logger.info(f'Issue with tag {issue_tag} doesnt exist, throw 404')
-        session.close()
         abort(404)
 
     # Check does user have access to the issue
-    # Using index because .project contain list of projects
-    if current_user not in issue_object.project[0].members and not current_user.is_admin:
+    if not can_view(current_user, issue_object.project_id):
         logger.info(f'User {current_user.username} doesnt have access to issue with tag {issue_tag}')
-        session.close()
         abort(403)
 
     title = f'Change {issue_object.tracking}'
@@ -808,8 +948,7 @@ def change_issue(issue_tag: str):
     change_issue_form: forms.CreateIssue = forms.CreateIssue()
     change_issue_form.submit.label = 'Update'
     change_issue_form.priority.choices = [(pr[0], pr[0]) for pr in issue_object.project[0].get_project_priorities()]
-    change_issue_form.state.choices = [(st, st) for st in (
-        'Unresolved', 'Fixed', 'Not bug', 'Cant reproduce', 'In progress', 'Fixed', 'Rejected')]
+    change_issue_form.state.choices = [(st, st) for st in ISSUE_STATES]
 
     if request.method == 'GET':
         # IMPORTANT: USING GET CONDITION BECAUSE WITHOUT IT DATA FROM DATABASE REWRITES DATA IN FORM
@@ -820,7 +959,6 @@ def change_issue(issue_tag: str):
             issue_object.steps_to_reproduce, issue_object.attachments
 
     if change_issue_form.validate_on_submit():
-        session = db_session.create_session()
         issue_object = session.query(Issue).filter(Issue.tracking == issue_tag).first()
         if issue_object:
             issue_object.summary, issue_object.priority, issue_object.state, issue_object.description, \
@@ -859,6 +997,24 @@ def get_app_logs():
     return redirect('index')
 
 
+@app.route('/metrics')
+def get_metrics():
+    """
+    Metrics of the process in Prometheus text format, only for site admin
+    Admin is either logged in or passes API key in Authorization: Bearer header(or API_KEY argument) like scrapers do
+    :return: Metrics, 401 if user is not logged in and didn't pass API key, 403 if user is not admin
+    """
+    authorization = request.headers.get('Authorization', '')
+    api_key = authorization[len('Bearer '):] if authorization.startswith('Bearer ') else request.args.get('API_KEY')
+    user = authenticate(api_key) if api_key else (current_user if current_user.is_authenticated else None)
+    if user is None:
+        abort(401)
+    if not user.is_admin:
+        logger.info(f'User {user.username} tried to get metrics, he is not admin')
+        abort(403)
+    return Response(metrics.render(), content_type=metrics.CONTENT_TYPE)
+
+
 def main(host=HOST, port=PORT, debug=1):
     db_session.global_init(app.config['SQLITE3_SETTINGS']['host'])
     app.run(host=host, port=port, debug=debug)
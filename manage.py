@@ -0,0 +1,124 @@
+"""
+Maintenance commands of bugtracker database
+
+python manage.py rebuild-stats [--project-id ID]   recount project_issue_stats from issues
+python manage.py check-stats [--project-id ID]     compare project_issue_stats with issues, exit code 1 on mismatch
+python manage.py import FILE [--format csv --type issue] [--chunk-size N]
+                                                   import projects, members and issues, see data.transfer
+python manage.py export TAG [--output FILE]         export project with members and issues to JSONL
+"""
+import argparse
+import os
+import sys
+
+from data import db_session
+from data.issue_stats import rebuild_stats, check_stats
+from data.transfer import (Importer, TransferError, export_project, read_csv, read_jsonl, EXPORT_CHUNK_SIZE,
+                           IMPORT_CHUNK_SIZE, RECORD_TYPES)
+
+DEFAULT_DB = 'db/bugtracker.sqlite'
+
+
+def open_session(db_file: str):
+    engine = db_session.create_engine(db_file)
+    db_session.upgrade_database(engine)
+    return db_session.create_session_factory(engine)()
+
+
+def command_rebuild_stats(session, args) -> int:
+    rows = rebuild_stats(session, args.project_id)
+    session.commit()
+    print(f'Rebuilt {rows} rows of project issue stats')
+    return 0
+
+
+def command_check_stats(session, args) -> int:
+    mismatches = check_stats(session, args.project_id)
+    for mismatch in mismatches:
+        project_id, state, priority = mismatch.key
+        print(f'project_id={project_id} state={state!r} priority={priority!r}: '
+              f'stored {mismatch.stored}, actual {mismatch.actual}')
+    if mismatches:
+        print(f'{len(mismatches)} mismatched rows, run rebuild-stats to fix them')
+        return 1
+    print('Project issue stats are consistent')
+    return 0
+
+
+def report(action: str, stats) -> None:
+    # Printed to stderr, so export to stdout stays valid JSONL
+    print(f'{action} {stats.rows} rows in {stats.seconds:.1f} s, {stats.rows_per_second:.0f} rows/sec',
+          file=sys.stderr)
+
+
+def command_import(session, args) -> int:
+    file_format = args.format or ('csv' if args.file.lower().endswith('.csv') else 'jsonl')
+    if file_format == 'csv' and args.type is None:
+        print('Pass --type of records of CSV file', file=sys.stderr)
+        return 2
+    importer = Importer(session, args.chunk_size,
+                        lambda number, message: print(f'{args.file}:{number}: {message}', file=sys.stderr))
+    with open(args.file, encoding='utf-8', newline='') as file:
+        records = read_csv(file, args.type) if file_format == 'csv' else read_jsonl(file)
+        stats = importer.run(records)
+    report('Imported', stats)
+    if stats.rejected:
+        print(f'{stats.rejected} records rejected', file=sys.stderr)
+        return 1
+    return 0
+
+
+def command_export(session, args) -> int:
+    output = args.output or f'{args.tag}.jsonl'
+    try:
+        if output == '-':
+            stats = export_project(session, args.tag, sys.stdout, args.chunk_size)
+        else:
+            with open(output, 'w', encoding='utf-8') as file:
+                stats = export_project(session, args.tag, file, args.chunk_size)
+    except TransferError as error:
+        # Project is checked before anything is written, so the file is empty
+        if output != '-':
+            os.remove(output)
+        print(error, file=sys.stderr)
+        return 1
+    report('Exported', stats)
+    return 0
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--db', default=DEFAULT_DB, help=f'Database file, {DEFAULT_DB} by default')
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    rebuild = commands.add_parser('rebuild-stats', help='Recount project issue stats from issues')
+    rebuild.add_argument('--project-id', type=int, default=None)
+    rebuild.set_defaults(handler=command_rebuild_stats)
+
+    check = commands.add_parser('check-stats', help='Compare project issue stats with issues')
+    check.add_argument('--project-id', type=int, default=None)
+    check.set_defaults(handler=command_check_stats)
+
+    load = commands.add_parser('import', help='Import projects, members and issues from JSONL or CSV file')
+    load.add_argument('file')
+    load.add_argument('--format', choices=('jsonl', 'csv'), default=None, help='By extension of file by default')
+    load.add_argument('--type', choices=RECORD_TYPES, default=None, help='Type of records of CSV file')
+    load.add_argument('--chunk-size', type=int, default=IMPORT_CHUNK_SIZE, help='Records imported by one transaction')
+    load.set_defaults(handler=command_import)
+
+    dump = commands.add_parser('export', help='Export project with members and issues to JSONL file')
+    dump.add_argument('tag', help='Short tag of project')
+    dump.add_argument('--output', default=None, help='File to write, TAG.jsonl by default, - for stdout')
+    dump.add_argument('--chunk-size', type=int, default=EXPORT_CHUNK_SIZE, help='Issues selected by one query')
+    dump.set_defaults(handler=command_export)
+
+    args = parser.parse_args(argv)
+    session = open_session(args.db)
+    try:
+        return args.handler(session, args)
+    finally:
+        session.close()
+
+
+if __name__ == '__main__':
+    sys.exit(main())
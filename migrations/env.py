@@ -0,0 +1,69 @@
+"""
+Alembic environment of bugtracker database
+Migrations run either from alembic command line or from data.db_session.upgrade_database,
+in the second case connection is passed through config.attributes['connection']
+"""
+import os
+import sys
+from logging.config import fileConfig
+
+from sqlalchemy import create_engine, pool
+
+from alembic import context
+
+# Project folder have to be importable to get models metadata
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from data.db_session import SqlAlchemyBase  # noqa: E402
+from data import __all_models  # noqa: E402, F401
+
+config = context.config
+
+if config.config_file_name is not None:
+    fileConfig(config.config_file_name)
+
+target_metadata = SqlAlchemyBase.metadata
+
+
+def database_url() -> str:
+    db_file = context.get_x_argument(as_dictionary=True).get('db')
+    if db_file:
+        return f'sqlite:///{db_file}'
+    return config.get_main_option('sqlalchemy.url')
+
+
+def run_migrations_offline():
+    context.configure(
+        url=database_url(),
+        target_metadata=target_metadata,
+        literal_binds=True,
+        render_as_batch=True,
+    )
+
+    with context.begin_transaction():
+        context.run_migrations()
+
+
+def run_migrations(connection):
+    # Batch mode is the only way to alter constraints in SQLite
+    context.configure(connection=connection, target_metadata=target_metadata, render_as_batch=True)
+
+    with context.begin_transaction():
+        context.run_migrations()
+
+
+def run_migrations_online():
+    connection = config.attributes.get('connection')
+    if connection is not None:
+        run_migrations(connection)
+        return
+
+    engine = create_engine(database_url(), poolclass=pool.NullPool)
+    with engine.connect() as connection:
+        run_migrations(connection)
+
+
+if context.is_offline_mode():
+    run_migrations_offline()
+else:
+    run_migrations_online()
@@ -0,0 +1,50 @@
+"""issues full text search
+
+Revision ID: 0c6d2e8f4a13
+Revises: f3a91c2d7b85
+Create Date: 2026-10-18 20:41:09.873215
+
+"""
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision = '0c6d2e8f4a13'
+down_revision = 'f3a91c2d7b85'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # Same statements as data.search.FTS_DDL at the moment of this revision
+    op.execute(
+        "CREATE VIRTUAL TABLE IF NOT EXISTS issues_fts USING fts5("
+        "summary, description, steps_to_reproduce, content='issues', content_rowid='id')"
+    )
+    op.execute(
+        "CREATE TRIGGER IF NOT EXISTS issues_fts_insert AFTER INSERT ON issues BEGIN "
+        "INSERT INTO issues_fts(rowid, summary, description, steps_to_reproduce) "
+        "VALUES (new.id, new.summary, new.description, new.steps_to_reproduce); END"
+    )
+    op.execute(
+        "CREATE TRIGGER IF NOT EXISTS issues_fts_delete AFTER DELETE ON issues BEGIN "
+        "INSERT INTO issues_fts(issues_fts, rowid, summary, description, steps_to_reproduce) "
+        "VALUES ('delete', old.id, old.summary, old.description, old.steps_to_reproduce); END"
+    )
+    op.execute(
+        "CREATE TRIGGER IF NOT EXISTS issues_fts_update AFTER UPDATE OF summary, description, steps_to_reproduce "
+        "ON issues BEGIN "
+        "INSERT INTO issues_fts(issues_fts, rowid, summary, description, steps_to_reproduce) "
+        "VALUES ('delete', old.id, old.summary, old.description, old.steps_to_reproduce); "
+        "INSERT INTO issues_fts(rowid, summary, description, steps_to_reproduce) "
+        "VALUES (new.id, new.summary, new.description, new.steps_to_reproduce); END"
+    )
+    # Index issues created before migration
+    op.execute("INSERT INTO issues_fts(issues_fts) VALUES ('rebuild')")
+
+
+def downgrade():
+    op.execute('DROP TRIGGER IF EXISTS issues_fts_update')
+    op.execute('DROP TRIGGER IF EXISTS issues_fts_delete')
+    op.execute('DROP TRIGGER IF EXISTS issues_fts_insert')
+    op.execute('DROP TABLE IF EXISTS issues_fts')
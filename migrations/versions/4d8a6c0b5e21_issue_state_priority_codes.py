@@ -0,0 +1,141 @@
+"""issue state and priority codes
+
+Revision ID: 4d8a6c0b5e21
+Revises: 9b4f1e7a2c36
+Create Date: 2026-10-18 22:03:51.118642
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '4d8a6c0b5e21'
+down_revision = '9b4f1e7a2c36'
+branch_labels = None
+depends_on = None
+
+# Same as data.models.ISSUE_STATES and ISSUE_PRIORITIES at the moment of this revision
+# Other priorities used by projects get the next codes
+STATES = ('Unresolved', 'In progress', 'Fixed', 'Not bug', 'Cant reproduce', 'Rejected')
+PRIORITIES = ('Critical', 'Major', 'Minor', 'Normal')
+# Priority names and codes are turned into each other by lookup table
+PRIORITY_CODE = '(SELECT code FROM issue_priorities WHERE name = {})'
+PRIORITY_NAME = '(SELECT name FROM issue_priorities WHERE code = {})'
+
+# Same as data.search.FTS_DDL triggers, they are dropped with old issues table
+FTS_TRIGGERS = (
+    "CREATE TRIGGER IF NOT EXISTS issues_fts_insert AFTER INSERT ON issues BEGIN "
+    "INSERT INTO issues_fts(rowid, summary, description, steps_to_reproduce) "
+    "VALUES (new.id, new.summary, new.description, new.steps_to_reproduce); END",
+
+    "CREATE TRIGGER IF NOT EXISTS issues_fts_delete AFTER DELETE ON issues BEGIN "
+    "INSERT INTO issues_fts(issues_fts, rowid, summary, description, steps_to_reproduce) "
+    "VALUES ('delete', old.id, old.summary, old.description, old.steps_to_reproduce); END",
+
+    "CREATE TRIGGER IF NOT EXISTS issues_fts_update AFTER UPDATE OF summary, description, steps_to_reproduce "
+    "ON issues BEGIN "
+    "INSERT INTO issues_fts(issues_fts, rowid, summary, description, steps_to_reproduce) "
+    "VALUES ('delete', old.id, old.summary, old.description, old.steps_to_reproduce); "
+    "INSERT INTO issues_fts(rowid, summary, description, steps_to_reproduce) "
+    "VALUES (new.id, new.summary, new.description, new.steps_to_reproduce); END",
+)
+
+
+def _case(column: str, names, to_code: bool) -> str:
+    # CASE expression that turns names into codes or codes into names, other values become NULL
+    pairs = [(f"'{name}'", str(code)) if to_code else (str(code), f"'{name}'")
+             for code, name in enumerate(names, 1)]
+    return 'CASE {} {} END'.format(column, ' '.join(f'WHEN {old} THEN {new}' for old, new in pairs))
+
+
+def _check_known(table: str, column: str, names) -> None:
+    known = ', '.join(f"'{name}'" for name in names)
+    unknown = op.get_bind().execute(
+        f'SELECT DISTINCT {column} FROM {table} WHERE {column} IS NOT NULL AND {column} NOT IN ({known})'
+    ).fetchall()
+    if unknown:
+        raise RuntimeError(f'{table}.{column} has values without code: {", ".join(row[0] for row in unknown)}. '
+                           f'Change them to one of {known} and run migration again')
+
+
+def _add_priorities(start: int) -> None:
+    # Codes of custom priorities follow the default ones, empty name is a missing priority
+    names = op.get_bind().execute(
+        "SELECT priority FROM issues WHERE priority IS NOT NULL AND priority != '' UNION "
+        "SELECT priority FROM priority_to_project WHERE priority IS NOT NULL AND priority != '' ORDER BY 1"
+    ).fetchall()
+    for code, (name,) in enumerate([row for row in names if row[0] not in PRIORITIES], start):
+        op.execute(sa.text('INSERT INTO issue_priorities (code, name) VALUES (:code, :name)').bindparams(
+            code=code, name=name))
+
+
+def upgrade():
+    states = op.create_table('issue_states',
+                             sa.Column('code', sa.SmallInteger(), autoincrement=False, nullable=False),
+                             sa.Column('name', sa.String(), nullable=False),
+                             sa.PrimaryKeyConstraint('code'),
+                             sa.UniqueConstraint('name'))
+    priorities = op.create_table('issue_priorities',
+                                 sa.Column('code', sa.SmallInteger(), autoincrement=False, nullable=False),
+                                 sa.Column('name', sa.String(), nullable=False),
+                                 sa.PrimaryKeyConstraint('code'),
+                                 sa.UniqueConstraint('name'))
+    op.bulk_insert(states, [{'code': code, 'name': name} for code, name in enumerate(STATES, 1)])
+    op.bulk_insert(priorities, [{'code': code, 'name': name} for code, name in enumerate(PRIORITIES, 1)])
+
+    _check_known('issues', 'state', STATES)
+    _add_priorities(len(PRIORITIES) + 1)
+
+    # Names are replaced by codes in place, then tables are rebuilt with integer columns
+    op.execute(f"UPDATE issues SET state = {_case('state', STATES, True)}, "
+               f"priority = {PRIORITY_CODE.format('issues.priority')}")
+    op.execute(f"UPDATE priority_to_project SET priority = {PRIORITY_CODE.format('priority_to_project.priority')}")
+    op.execute('DELETE FROM priority_to_project WHERE rowid NOT IN '
+               '(SELECT MIN(rowid) FROM priority_to_project GROUP BY project_id, priority)')
+
+    op.drop_index('ix_issues_priority', table_name='issues')
+    op.drop_index('ix_issues_project_id_state', table_name='issues')
+    with op.batch_alter_table('issues', recreate='always') as batch_op:
+        batch_op.alter_column('state', type_=sa.SmallInteger(), existing_type=sa.String())
+        batch_op.alter_column('priority', type_=sa.SmallInteger(), existing_type=sa.String())
+        batch_op.create_foreign_key('fk_issues_state_issue_states', 'issue_states', ['state'], ['code'])
+        batch_op.create_foreign_key('fk_issues_priority_issue_priorities', 'issue_priorities',
+                                    ['priority'], ['code'])
+    op.create_index('ix_issues_project_id_state_priority', 'issues', ['project_id', 'state', 'priority'],
+                    unique=False)
+    for statement in FTS_TRIGGERS:
+        op.execute(statement)
+
+    op.drop_index('ix_priority_to_project_project_id', table_name='priority_to_project')
+    with op.batch_alter_table('priority_to_project', recreate='always') as batch_op:
+        batch_op.alter_column('priority', type_=sa.SmallInteger(), existing_type=sa.String())
+        batch_op.create_foreign_key('fk_priority_to_project_priority_issue_priorities', 'issue_priorities',
+                                    ['priority'], ['code'])
+    op.create_index('ix_priority_to_project_project_id_priority', 'priority_to_project',
+                    ['project_id', 'priority'], unique=True)
+
+
+def downgrade():
+    op.drop_index('ix_priority_to_project_project_id_priority', table_name='priority_to_project')
+    with op.batch_alter_table('priority_to_project', recreate='always') as batch_op:
+        batch_op.drop_constraint('fk_priority_to_project_priority_issue_priorities', type_='foreignkey')
+        batch_op.alter_column('priority', type_=sa.String(), existing_type=sa.SmallInteger())
+    op.execute(f"UPDATE priority_to_project SET priority = {PRIORITY_NAME.format('priority_to_project.priority')}")
+    op.create_index('ix_priority_to_project_project_id', 'priority_to_project', ['project_id'], unique=False)
+
+    op.drop_index('ix_issues_project_id_state_priority', table_name='issues')
+    with op.batch_alter_table('issues', recreate='always') as batch_op:
+        batch_op.drop_constraint('fk_issues_priority_issue_priorities', type_='foreignkey')
+        batch_op.drop_constraint('fk_issues_state_issue_states', type_='foreignkey')
+        batch_op.alter_column('state', type_=sa.String(), existing_type=sa.SmallInteger())
+        batch_op.alter_column('priority', type_=sa.String(), existing_type=sa.SmallInteger())
+    op.execute(f"UPDATE issues SET state = {_case('state', STATES, False)}, "
+               f"priority = {PRIORITY_NAME.format('issues.priority')}")
+    op.create_index('ix_issues_project_id_state', 'issues', ['project_id', 'state'], unique=False)
+    op.create_index('ix_issues_priority', 'issues', ['priority'], unique=False)
+    for statement in FTS_TRIGGERS:
+        op.execute(statement)
+
+    op.drop_table('issue_priorities')
+    op.drop_table('issue_states')
@@ -0,0 +1,39 @@
+"""project root user id
+
+Revision ID: 5b2e7d41c0f9
+Revises: c8c750c0e0ab
+Create Date: 2026-10-18 12:04:51.317402
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '5b2e7d41c0f9'
+down_revision = 'c8c750c0e0ab'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # SQLite can't add foreign key by ALTER, batch mode copies projects table
+    with op.batch_alter_table('projects') as batch_op:
+        batch_op.add_column(sa.Column('root_user_id', sa.Integer(), nullable=True))
+        batch_op.create_foreign_key('fk_projects_root_user_id_users', 'users', ['root_user_id'], ['id'])
+        batch_op.create_index('ix_projects_root_user_id', ['root_user_id'], unique=False)
+
+    # Backfill from association table, first root member like Project.get_root did
+    op.execute(
+        "UPDATE projects SET root_user_id = ("
+        "SELECT member_id FROM user_to_project "
+        "WHERE user_to_project.project_id = projects.id AND user_to_project.project_role = 'root' "
+        "ORDER BY user_to_project.rowid LIMIT 1)"
+    )
+
+
+def downgrade():
+    with op.batch_alter_table('projects') as batch_op:
+        batch_op.drop_index('ix_projects_root_user_id')
+        batch_op.drop_constraint('fk_projects_root_user_id_users', type_='foreignkey')
+        batch_op.drop_column('root_user_id')
@@ -0,0 +1,114 @@
+"""initial schema
+
+Revision ID: 96983eb2ea1a
+Revises: 
+Create Date: 2020-04-06 16:50:12.480129
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '96983eb2ea1a'
+down_revision = None
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table(
+        'users',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('username', sa.String(), nullable=False),
+        sa.Column('hashed_password', sa.String(), nullable=True),
+        sa.Column('reg_ip', sa.String(), nullable=True),
+        sa.Column('last_ip', sa.String(), nullable=True),
+        sa.Column('created_date', sa.DateTime(), nullable=True),
+        sa.Column('role', sa.String(), nullable=True),
+        sa.Column('API_KEY', sa.String(length=24), nullable=True),
+        sa.PrimaryKeyConstraint('id'),
+        sa.UniqueConstraint('username')
+    )
+    op.create_table(
+        'projects',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('project_name', sa.String(), nullable=False),
+        sa.Column('created_date', sa.DateTime(), nullable=True),
+        sa.Column('description', sa.String(length=256), nullable=True),
+        sa.Column('short_project_tag', sa.String(), nullable=True),
+        sa.PrimaryKeyConstraint('id'),
+        sa.UniqueConstraint('project_name'),
+        sa.UniqueConstraint('short_project_tag')
+    )
+    op.create_table(
+        'user_to_project',
+        sa.Column('member_id', sa.Integer(), nullable=True),
+        sa.Column('project_id', sa.Integer(), nullable=True),
+        sa.Column('project_role', sa.String(), nullable=True),
+        sa.Column('date_of_add', sa.DateTime(), nullable=True),
+        sa.ForeignKeyConstraint(['member_id'], ['users.id'], ),
+        sa.ForeignKeyConstraint(['project_id'], ['projects.id'], )
+    )
+    op.create_table(
+        'subsystems_to_project',
+        sa.Column('project_id', sa.Integer(), nullable=True),
+        sa.Column('subsystem', sa.String(), nullable=True),
+        sa.ForeignKeyConstraint(['project_id'], ['projects.id'], )
+    )
+    op.create_table(
+        'priority_to_project',
+        sa.Column('project_id', sa.Integer(), nullable=True),
+        sa.Column('priority', sa.String(), nullable=True),
+        sa.ForeignKeyConstraint(['project_id'], ['projects.id'], )
+    )
+    op.create_table(
+        'issues',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('tracking', sa.String(), nullable=True),
+        sa.Column('priority', sa.String(), nullable=True),
+        sa.Column('state', sa.String(), nullable=True),
+        sa.Column('description', sa.String(), nullable=True),
+        sa.Column('steps_to_reproduce', sa.String(), nullable=True),
+        sa.Column('summary', sa.String(), nullable=True),
+        sa.Column('date_of_creation', sa.DateTime(), nullable=True),
+        sa.Column('project_id', sa.Integer(), nullable=True),
+        sa.ForeignKeyConstraint(['project_id'], ['projects.id'], ),
+        sa.PrimaryKeyConstraint('id'),
+        sa.UniqueConstraint('id'),
+        sa.UniqueConstraint('tracking')
+    )
+    op.create_index('ix_issues_priority', 'issues', ['priority'], unique=False)
+    op.create_table(
+        'user_to_issue',
+        sa.Column('user_id', sa.Integer(), nullable=True),
+        sa.Column('issue_id', sa.Integer(), nullable=True),
+        sa.ForeignKeyConstraint(['issue_id'], ['issues.id'], ),
+        sa.ForeignKeyConstraint(['user_id'], ['users.id'], )
+    )
+    op.create_table(
+        'project_to_issue',
+        sa.Column('issue_id', sa.Integer(), nullable=True),
+        sa.Column('project_id', sa.Integer(), nullable=True),
+        sa.ForeignKeyConstraint(['issue_id'], ['issues.id'], ),
+        sa.ForeignKeyConstraint(['project_id'], ['projects.id'], )
+    )
+    op.create_table(
+        'file_to_issue',
+        sa.Column('issue_id', sa.Integer(), nullable=True),
+        sa.Column('file_path', sa.String(), nullable=True),
+        sa.ForeignKeyConstraint(['issue_id'], ['issues.id'], )
+    )
+
+
+def downgrade():
+    op.drop_table('file_to_issue')
+    op.drop_table('project_to_issue')
+    op.drop_table('user_to_issue')
+    op.drop_index('ix_issues_priority', table_name='issues')
+    op.drop_table('issues')
+    op.drop_table('priority_to_project')
+    op.drop_table('subsystems_to_project')
+    op.drop_table('user_to_project')
+    op.drop_table('projects')
+    op.drop_table('users')
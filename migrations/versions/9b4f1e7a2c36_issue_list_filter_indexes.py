@@ -0,0 +1,33 @@
+"""issue list filter indexes
+
+Revision ID: 9b4f1e7a2c36
+Revises: 0c6d2e8f4a13
+Create Date: 2026-10-18 21:26:37.402518
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '9b4f1e7a2c36'
+down_revision = '0c6d2e8f4a13'
+branch_labels = None
+depends_on = None
+
+# (index name, columns) of issues table
+INDEXES = [
+    ('ix_issues_project_id_state', ['project_id', 'state']),
+    ('ix_issues_project_id_priority', ['project_id', 'priority']),
+    ('ix_issues_project_id_date_of_creation', ['project_id', 'date_of_creation']),
+]
+
+
+def upgrade():
+    for name, columns in INDEXES:
+        op.create_index(name, 'issues', columns, unique=False)
+
+
+def downgrade():
+    for name, columns in reversed(INDEXES):
+        op.drop_index(name, table_name='issues')
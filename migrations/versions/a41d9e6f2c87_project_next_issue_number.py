@@ -0,0 +1,33 @@
+"""project next issue number
+
+Revision ID: a41d9e6f2c87
+Revises: 5b2e7d41c0f9
+Create Date: 2026-10-18 15:37:02.118946
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'a41d9e6f2c87'
+down_revision = '5b2e7d41c0f9'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.add_column('projects', sa.Column('next_issue_number', sa.Integer(), nullable=False, server_default='1'))
+
+    # Next number goes after the biggest number in existing tags(TAG-<number>) and after count of issues
+    op.execute(
+        "UPDATE projects SET next_issue_number = 1 + MAX("
+        "COALESCE((SELECT MAX(CAST(SUBSTR(issues.tracking, LENGTH(projects.short_project_tag) + 2) AS INTEGER)) "
+        "FROM issues WHERE issues.tracking LIKE projects.short_project_tag || '-%'), 0), "
+        "(SELECT COUNT(*) FROM project_to_issue WHERE project_to_issue.project_id = projects.id))"
+    )
+
+
+def downgrade():
+    with op.batch_alter_table('projects') as batch_op:
+        batch_op.drop_column('next_issue_number')
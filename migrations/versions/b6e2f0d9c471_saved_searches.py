@@ -0,0 +1,38 @@
+"""saved searches
+
+Revision ID: b6e2f0d9c471
+Revises: 4d8a6c0b5e21
+Create Date: 2026-10-18 22:47:12.530914
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'b6e2f0d9c471'
+down_revision = '4d8a6c0b5e21'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('saved_searches',
+                    sa.Column('id', sa.Integer(), nullable=False),
+                    sa.Column('owner_id', sa.Integer(), nullable=False),
+                    sa.Column('name', sa.String(), nullable=False),
+                    sa.Column('query', sa.String(), nullable=False),
+                    sa.Column('created_date', sa.DateTime(), nullable=True),
+                    sa.Column('run_count', sa.Integer(), nullable=False),
+                    sa.Column('total_ms', sa.Float(), nullable=False),
+                    sa.Column('max_ms', sa.Float(), nullable=False),
+                    sa.Column('last_ms', sa.Float(), nullable=True),
+                    sa.Column('last_run_date', sa.DateTime(), nullable=True),
+                    sa.ForeignKeyConstraint(['owner_id'], ['users.id'], ),
+                    sa.PrimaryKeyConstraint('id'))
+    op.create_index('ix_saved_searches_owner_id', 'saved_searches', ['owner_id'], unique=False)
+
+
+def downgrade():
+    op.drop_index('ix_saved_searches_owner_id', table_name='saved_searches')
+    op.drop_table('saved_searches')
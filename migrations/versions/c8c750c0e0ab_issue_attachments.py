@@ -0,0 +1,25 @@
+"""issue attachments
+
+Revision ID: c8c750c0e0ab
+Revises: 96983eb2ea1a
+Create Date: 2020-04-18 14:21:37.902114
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'c8c750c0e0ab'
+down_revision = '96983eb2ea1a'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.add_column('issues', sa.Column('attachments', sa.String(), nullable=True))
+
+
+def downgrade():
+    with op.batch_alter_table('issues') as batch_op:
+        batch_op.drop_column('attachments')
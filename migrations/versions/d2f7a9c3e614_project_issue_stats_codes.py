@@ -0,0 +1,75 @@
+"""project issue stats codes
+
+Revision ID: d2f7a9c3e614
+Revises: b6e2f0d9c471
+Create Date: 2026-10-19 10:41:27.903518
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'd2f7a9c3e614'
+down_revision = 'b6e2f0d9c471'
+branch_labels = None
+depends_on = None
+
+# Same as STATES of 4d8a6c0b5e21, priorities are looked up in issue_priorities
+STATES = ('Unresolved', 'In progress', 'Fixed', 'Not bug', 'Cant reproduce', 'Rejected')
+
+
+def _case(column: str, to_code: bool) -> str:
+    # CASE expression that turns state names into codes or codes into names, other values become NULL
+    pairs = [(f"'{name}'", str(code)) if to_code else (str(code), f"'{name}'")
+             for code, name in enumerate(STATES, 1)]
+    return 'CASE {} {} END'.format(column, ' '.join(f'WHEN {old} THEN {new}' for old, new in pairs))
+
+
+def _has_codes() -> bool:
+    # Databases that ran 4d8a6c0b5e21 while it converted statistics itself already have codes
+    columns = {row[1]: row[2] for row in op.get_bind().execute('PRAGMA table_info(project_issue_stats)')}
+    return columns['state'].upper() == 'SMALLINT'
+
+
+def upgrade():
+    if _has_codes():
+        return
+    # Priorities that are left only in statistics get codes too, so no count is lost
+    op.execute("INSERT OR IGNORE INTO issue_priorities (code, name) "
+               "SELECT (SELECT MAX(code) FROM issue_priorities) + ROW_NUMBER() OVER (ORDER BY priority), priority "
+               "FROM (SELECT DISTINCT priority FROM project_issue_stats WHERE priority != '' "
+               "AND priority NOT IN (SELECT name FROM issue_priorities))")
+    # Statistics are copied to table of codes, missing state or priority(empty string before) becomes NULL
+    op.create_table('project_issue_stats_codes',
+                    sa.Column('project_id', sa.Integer(), nullable=False),
+                    sa.Column('state', sa.SmallInteger(), nullable=True),
+                    sa.Column('priority', sa.SmallInteger(), nullable=True),
+                    sa.Column('issue_count', sa.Integer(), nullable=False),
+                    sa.ForeignKeyConstraint(['project_id'], ['projects.id'], ),
+                    sa.ForeignKeyConstraint(['state'], ['issue_states.code'], ),
+                    sa.ForeignKeyConstraint(['priority'], ['issue_priorities.code'], ))
+    op.execute(f"INSERT INTO project_issue_stats_codes (project_id, state, priority, issue_count) "
+               f"SELECT project_id, {_case('state', True)}, "
+               f"(SELECT code FROM issue_priorities WHERE name = priority), SUM(issue_count) "
+               f"FROM project_issue_stats GROUP BY 1, 2, 3")
+    op.drop_table('project_issue_stats')
+    op.rename_table('project_issue_stats_codes', 'project_issue_stats')
+    op.create_index('ix_project_issue_stats_project_id_state_priority', 'project_issue_stats',
+                    ['project_id', sa.text('IFNULL(state, 0)'), sa.text('IFNULL(priority, 0)')], unique=True)
+
+
+def downgrade():
+    op.create_table('project_issue_stats_names',
+                    sa.Column('project_id', sa.Integer(), nullable=False),
+                    sa.Column('state', sa.String(), nullable=False),
+                    sa.Column('priority', sa.String(), nullable=False),
+                    sa.Column('issue_count', sa.Integer(), nullable=False),
+                    sa.ForeignKeyConstraint(['project_id'], ['projects.id'], ),
+                    sa.PrimaryKeyConstraint('project_id', 'state', 'priority'))
+    op.execute(f"INSERT INTO project_issue_stats_names (project_id, state, priority, issue_count) "
+               f"SELECT project_id, COALESCE({_case('state', False)}, ''), "
+               f"COALESCE((SELECT name FROM issue_priorities WHERE code = priority), ''), SUM(issue_count) "
+               f"FROM project_issue_stats GROUP BY 1, 2, 3")
+    op.drop_table('project_issue_stats')
+    op.rename_table('project_issue_stats_names', 'project_issue_stats')
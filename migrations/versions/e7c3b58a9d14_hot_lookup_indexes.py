@@ -0,0 +1,54 @@
+"""hot lookup indexes
+
+Revision ID: e7c3b58a9d14
+Revises: a41d9e6f2c87
+Create Date: 2026-10-18 17:12:44.650213
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'e7c3b58a9d14'
+down_revision = 'a41d9e6f2c87'
+branch_labels = None
+depends_on = None
+
+# (index name, table, columns, unique)
+# Unique constraints are made as unique indexes, SQLite can create them without rebuilding the table
+INDEXES = [
+    ('ix_users_API_KEY', 'users', ['API_KEY'], True),
+    ('ix_issues_project_id', 'issues', ['project_id'], False),
+    ('ix_user_to_project_member_id_project_id', 'user_to_project', ['member_id', 'project_id'], True),
+    ('ix_user_to_project_project_id_project_role', 'user_to_project', ['project_id', 'project_role'], False),
+    ('ix_user_to_issue_user_id_issue_id', 'user_to_issue', ['user_id', 'issue_id'], True),
+    ('ix_user_to_issue_issue_id', 'user_to_issue', ['issue_id'], False),
+    ('ix_project_to_issue_project_id_issue_id', 'project_to_issue', ['project_id', 'issue_id'], True),
+    ('ix_project_to_issue_issue_id', 'project_to_issue', ['issue_id'], False),
+    ('ix_subsystems_to_project_project_id', 'subsystems_to_project', ['project_id'], False),
+    ('ix_priority_to_project_project_id', 'priority_to_project', ['project_id'], False),
+    ('ix_file_to_issue_issue_id', 'file_to_issue', ['issue_id'], False),
+]
+
+# (table, columns) of association tables that have to be unique before creating unique indexes
+DEDUPLICATE = [
+    ('user_to_project', ['member_id', 'project_id']),
+    ('user_to_issue', ['user_id', 'issue_id']),
+    ('project_to_issue', ['project_id', 'issue_id']),
+]
+
+
+def upgrade():
+    # Duplicated rows of association tables would break unique indexes, keep the first of them
+    for table, columns in DEDUPLICATE:
+        columns = ', '.join(columns)
+        op.execute(f'DELETE FROM {table} WHERE rowid NOT IN (SELECT MIN(rowid) FROM {table} GROUP BY {columns})')
+
+    for name, table, columns, unique in INDEXES:
+        op.create_index(name, table, columns, unique=unique)
+
+
+def downgrade():
+    for name, table, columns, unique in reversed(INDEXES):
+        op.drop_index(name, table_name=table)
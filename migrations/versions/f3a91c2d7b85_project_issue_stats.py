@@ -0,0 +1,39 @@
+"""project issue stats
+
+Revision ID: f3a91c2d7b85
+Revises: e7c3b58a9d14
+Create Date: 2026-10-18 19:12:44.502317
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'f3a91c2d7b85'
+down_revision = 'e7c3b58a9d14'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table(
+        'project_issue_stats',
+        sa.Column('project_id', sa.Integer(), nullable=False),
+        sa.Column('state', sa.String(), nullable=False),
+        sa.Column('priority', sa.String(), nullable=False),
+        sa.Column('issue_count', sa.Integer(), nullable=False),
+        sa.ForeignKeyConstraint(['project_id'], ['projects.id'], ),
+        sa.PrimaryKeyConstraint('project_id', 'state', 'priority')
+    )
+
+    # Backfill from existing issues
+    op.execute(
+        "INSERT INTO project_issue_stats (project_id, state, priority, issue_count) "
+        "SELECT project_id, COALESCE(state, ''), COALESCE(priority, ''), COUNT(*) FROM issues "
+        "WHERE project_id IS NOT NULL GROUP BY project_id, COALESCE(state, ''), COALESCE(priority, '')"
+    )
+
+
+def downgrade():
+    op.drop_table('project_issue_stats')
@@ -0,0 +1,57 @@
+"""
+Access checks of users to projects
+Membership and role of user in project are selected by one query on unique (member_id, project_id) index
+and memoized for the rest of the request in flask.g
+User here is anything with id and is_admin: User, logged in UserSnapshot or API Principal
+"""
+from typing import NamedTuple, Optional
+
+from flask import g, has_app_context
+from sqlalchemy import select
+
+from data import db_session
+from data.models import association_table_user_to_project
+
+# Role of users that can change project properties
+PROJECT_MANAGE_ROLES = ('root', 'manager')
+
+
+class Membership(NamedTuple):
+    is_member: bool
+    role: Optional[str]
+
+
+def membership(user, project_id) -> Membership:
+    """
+    :param user: User whose membership we check
+    :param project_id: Project.id
+    :return: Membership of user in project, selected once per request
+    """
+    try:
+        key = (user.id, int(project_id))
+    except (TypeError, ValueError):
+        # Project id from URL that is not a number can't belong to any project
+        return Membership(False, None)
+    memo = g.setdefault('project_memberships', {}) if has_app_context() else {}
+    if key not in memo:
+        row = db_session.get_session().execute(
+            select([association_table_user_to_project.c.project_role]).where(
+                association_table_user_to_project.c.member_id == key[0]).where(
+                association_table_user_to_project.c.project_id == key[1]).limit(1)
+        ).fetchone()
+        memo[key] = Membership(row is not None, row[0] if row is not None else None)
+    return memo[key]
+
+
+def can_view(user, project_id) -> bool:
+    """
+    :return: True if user is site admin or member of project
+    """
+    return user.is_admin or membership(user, project_id).is_member
+
+
+def can_manage(user, project_id) -> bool:
+    """
+    :return: True if user is site admin or root or manager of project
+    """
+    return user.is_admin or membership(user, project_id).role in PROJECT_MANAGE_ROLES
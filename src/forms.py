@@ -54,3 +54,10 @@ class ChangeProjectProperties(FlaskForm):
     project_description = StringField('Project description', validators=[Length(max=255)])
     project_owner = SelectField(coerce=int)
     submit = SubmitField('Save!')
+
+
+class SavedSearchForm(FlaskForm):
+    name = StringField('Name', validators=[DataRequired(), Length(min=1, max=64)])
+    query = StringField('Query, e.g. state:Unresolved priority:Critical assignee:me created:>7d text:"crash"',
+                        validators=[DataRequired(), Length(min=1, max=512)])
+    submit = SubmitField('Save search')
@@ -0,0 +1,165 @@
+"""
+Per-request SQL instrumentation
+Engine events count statements of the current request, time spent in SQL and repeated identical statements
+(the same SQL with different parameters, e.g relation loaded for every row of a list, i.e N+1)
+Outside of production mode responses get X-Query-Count and Server-Timing headers
+Request that makes more statements than budget of its endpoint or repeats one statement too many times is logged
+
+Settings of app.config:
+    SQL_QUERY_HEADERS               add headers to responses, False in production
+    SQL_QUERY_BUDGET                statements allowed for one request by default
+    SQL_QUERY_BUDGETS               endpoint -> statements allowed for its requests
+    SQL_REPEATED_STATEMENT_LIMIT    how many times one statement can be repeated by request
+"""
+import time
+
+from collections import Counter
+from contextlib import contextmanager
+from typing import List, Optional, Tuple
+
+from flask import current_app as app, g, has_app_context, request
+from sqlalchemy import event
+
+DEFAULT_QUERY_BUDGET = 30
+DEFAULT_REPEATED_STATEMENT_LIMIT = 10
+# Length of statement in log messages
+LOGGED_STATEMENT_LENGTH = 200
+
+
+class RequestQueries:
+    """
+    Statements of one request
+    """
+
+    def __init__(self):
+        self.count = 0
+        self.total_ms = 0.0
+        self.statements = Counter()
+
+    def record(self, statement: str, elapsed_ms: float) -> None:
+        self.count += 1
+        self.total_ms += elapsed_ms
+        self.statements[statement] += 1
+
+    def repeated(self, limit: int) -> List[Tuple[str, int]]:
+        """
+        :param limit: how many times statement can be repeated
+        :return: statements executed more than limit times with their counts, the most repeated first
+        """
+        return [(statement, count) for statement, count in self.statements.most_common() if count > limit]
+
+    def describe(self, limit: int = 1) -> str:
+        """
+        :return: Text with count of statements, SQL time and repeated statements for messages
+        """
+        lines = [f'{self.count} statements in {self.total_ms:.1f} ms']
+        lines.extend(f'{count} x {shorten(statement)}' for statement, count in self.repeated(limit))
+        return '\n'.join(lines)
+
+
+def shorten(statement: str) -> str:
+    statement = ' '.join(statement.split())
+    if len(statement) > LOGGED_STATEMENT_LENGTH:
+        return statement[:LOGGED_STATEMENT_LENGTH] + '...'
+    return statement
+
+
+def current_queries() -> Optional[RequestQueries]:
+    """
+    :return: RequestQueries of the current request or None outside of instrumented request
+    """
+    if not has_app_context():
+        return None
+    return g.get('sql_queries')
+
+
+def _elapsed_ms(context, name: str) -> float:
+    # Start time is kept by execution context of statement, so statement that raised leaves nothing behind
+    started = getattr(context, name, None)
+    return 0.0 if started is None else (time.perf_counter() - started) * 1000
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    if context is not None:
+        context.query_started = time.perf_counter()
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    queries = current_queries()
+    if queries is not None:
+        queries.record(statement, _elapsed_ms(context, 'query_started'))
+
+
+def listen(engine) -> None:
+    """
+    Starts timing of statements of engine, does nothing if engine is already listened
+    """
+    if not event.contains(engine, 'before_cursor_execute', _before_cursor_execute):
+        event.listen(engine, 'before_cursor_execute', _before_cursor_execute)
+        event.listen(engine, 'after_cursor_execute', _after_cursor_execute)
+
+
+@contextmanager
+def record_queries(engine):
+    """
+    Collects statements of engine executed inside with block, no matter of request
+    :param engine: Engine to listen
+    :return: RequestQueries that will contain executed statements
+    """
+    queries = RequestQueries()
+    # Name of start time in execution context, recorders can be nested
+    name = f'recorded_started_{id(queries)}'
+
+    def before(conn, cursor, statement, parameters, context, executemany):
+        if context is not None:
+            setattr(context, name, time.perf_counter())
+
+    def after(conn, cursor, statement, parameters, context, executemany):
+        queries.record(statement, _elapsed_ms(context, name))
+
+    event.listen(engine, 'before_cursor_execute', before)
+    event.listen(engine, 'after_cursor_execute', after)
+    try:
+        yield queries
+    finally:
+        event.remove(engine, 'before_cursor_execute', before)
+        event.remove(engine, 'after_cursor_execute', after)
+
+
+def _start_request():
+    g.sql_queries = RequestQueries()
+
+
+def _finish_request(response):
+    queries = current_queries()
+    if queries is None:
+        return response
+    if app.config['SQL_QUERY_HEADERS']:
+        response.headers['X-Query-Count'] = str(queries.count)
+        response.headers['Server-Timing'] = f'db;desc="{queries.count} queries";dur={queries.total_ms:.2f}'
+
+    route = f'{request.method} {request.path}({request.endpoint})'
+    budget = app.config['SQL_QUERY_BUDGETS'].get(request.endpoint, app.config['SQL_QUERY_BUDGET'])
+    if queries.count > budget:
+        app.logger.warning(f'{route} is over query budget {budget}: {queries.describe()}')
+    else:
+        limit = app.config['SQL_REPEATED_STATEMENT_LIMIT']
+        if queries.repeated(limit):
+            app.logger.warning(f'{route} repeats statements more than {limit} times(N+1?): {queries.describe(limit)}')
+    return response
+
+
+def init_app(flask_app, engine) -> None:
+    """
+    Instruments requests of app that use engine
+    :param flask_app: Flask app object
+    :param engine: Engine of app database
+    :return: None
+    """
+    flask_app.config.setdefault('SQL_QUERY_HEADERS', True)
+    flask_app.config.setdefault('SQL_QUERY_BUDGET', DEFAULT_QUERY_BUDGET)
+    flask_app.config.setdefault('SQL_QUERY_BUDGETS', {})
+    flask_app.config.setdefault('SQL_REPEATED_STATEMENT_LIMIT', DEFAULT_REPEATED_STATEMENT_LIMIT)
+    listen(engine)
+    flask_app.before_request(_start_request)
+    flask_app.after_request(_finish_request)
@@ -0,0 +1,255 @@
+"""
+In-process metrics of the app in Prometheus text format, see /metrics route
+Request metrics are labeled by Flask endpoint(API resources have endpoint named after resource class) and method,
+so count of series is bounded by count of routes. Gauges of database sessions, connection pool and caches
+are read from their owners when metrics are rendered
+Metrics are kept per process, every worker has its own
+"""
+import bisect
+import threading
+import time
+
+from typing import Callable, Dict, List, Sequence, Tuple
+
+from flask import g, request
+
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+# Upper bounds of request duration buckets in seconds
+DURATION_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+# Endpoint label of requests that didn't match any route
+UNMATCHED_ENDPOINT = '<unmatched>'
+
+
+def _escape(value) -> str:
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _labels(names: Sequence[str], values: Sequence, extra: str = '') -> str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return '{' + ','.join(pairs) + '}' if pairs else ''
+
+
+def _number(value: float) -> str:
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Metric:
+    """
+    Metric with values by label values, thread safe
+    """
+    type = 'untyped'
+
+    def __init__(self, name: str, documentation: str, label_names: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.label_names = tuple(label_names)
+        self._lock = threading.Lock()
+        self._values: Dict[Tuple, object] = {}
+
+    def _key(self, labels: Sequence) -> Tuple:
+        if len(labels) != len(self.label_names):
+            raise ValueError(f'{self.name} has labels {self.label_names}, got {labels}')
+        return tuple(str(label) for label in labels)
+
+    def samples(self) -> List[str]:
+        with self._lock:
+            return [f'{self.name}{_labels(self.label_names, key)} {_number(value)}'
+                    for key, value in sorted(self._values.items())]
+
+    def render(self) -> List[str]:
+        return [f'# HELP {self.name} {self.documentation}', f'# TYPE {self.name} {self.type}'] + self.samples()
+
+
+class Counter(Metric):
+    type = 'counter'
+
+    def inc(self, *labels, amount: float = 1) -> None:
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def set_total(self, *labels, value: float) -> None:
+        """
+        Sets total counted by its owner(e.g hits of cache), it only grows till restart of process
+        """
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = value
+
+
+class Gauge(Metric):
+    type = 'gauge'
+
+    def set(self, *labels, value: float) -> None:
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = value
+
+    def inc(self, *labels, amount: float = 1) -> None:
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def dec(self, *labels, amount: float = 1) -> None:
+        self.inc(*labels, amount=-amount)
+
+
+class Histogram(Metric):
+    type = 'histogram'
+
+    def __init__(self, name: str, documentation: str, label_names: Sequence[str] = (),
+                 buckets: Sequence[float] = DURATION_BUCKETS):
+        super().__init__(name, documentation, label_names)
+        self.buckets = tuple(sorted(buckets))
+
+    def observe(self, *labels, value: float) -> None:
+        key = self._key(labels)
+        with self._lock:
+            # Counts of every bucket(not cumulative, the last one is +Inf), sum and count
+            counts, total = self._values.get(key, ([0] * (len(self.buckets) + 1), 0.0))
+            counts[bisect.bisect_left(self.buckets, value)] += 1
+            self._values[key] = (counts, total + value)
+
+    def samples(self) -> List[str]:
+        with self._lock:
+            values = sorted((key, (list(counts), total)) for key, (counts, total) in self._values.items())
+        lines = []
+        for key, (counts, total) in values:
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float('inf'),), counts):
+                cumulative += count
+                le = 'le="+Inf"' if bound == float('inf') else f'le="{_number(bound)}"'
+                lines.append(f'{self.name}_bucket{_labels(self.label_names, key, le)} {cumulative}')
+            lines.append(f'{self.name}_sum{_labels(self.label_names, key)} {_number(total)}')
+            lines.append(f'{self.name}_count{_labels(self.label_names, key)} {cumulative}')
+        return lines
+
+
+class Registry:
+    """
+    Metrics of the process and functions that update gauges before metrics are rendered
+    """
+
+    def __init__(self):
+        self.metrics: List[Metric] = []
+        self.collectors: List[Callable[[], None]] = []
+
+    def register(self, metric):
+        self.metrics.append(metric)
+        return metric
+
+    def collector(self, function: Callable[[], None]) -> Callable[[], None]:
+        """
+        Decorator of function that sets gauges and totals of counters, it is called on every render
+        """
+        self.collectors.append(function)
+        return function
+
+    def render(self) -> str:
+        """
+        :return: All metrics in Prometheus text format
+        """
+        for collect in self.collectors:
+            collect()
+        lines = []
+        for metric in self.metrics:
+            lines.extend(metric.render())
+        return '\n'.join(lines) + '\n'
+
+
+registry = Registry()
+
+REQUEST_DURATION = registry.register(Histogram(
+    'bugtracker_request_duration_seconds', 'Time of request handling till response is made',
+    ('endpoint', 'method')))
+REQUESTS = registry.register(Counter(
+    'bugtracker_requests_total', 'Handled requests by status code', ('endpoint', 'method', 'status')))
+REQUESTS_IN_FLIGHT = registry.register(Gauge(
+    'bugtracker_requests_in_flight', 'Requests that are being handled now'))
+SQL_STATEMENTS = registry.register(Counter(
+    'bugtracker_sql_statements_total', 'SQL statements executed by requests, see src.instrumentation',
+    ('endpoint', 'method')))
+DB_SESSIONS = registry.register(Counter(
+    'bugtracker_db_sessions_total', 'Database sessions by event(opened or closed)', ('event',)))
+DB_SESSIONS_OPEN = registry.register(Gauge('bugtracker_db_sessions_open', 'Database sessions that are open now'))
+DB_POOL = registry.register(Gauge(
+    'bugtracker_db_pool_connections', 'Connections of engine pool: checked_out, checked_in, overflow, size',
+    ('kind',)))
+CACHE_LOOKUPS = registry.register(Counter(
+    'bugtracker_cache_lookups_total', 'Lookups of in-process caches by result(hit or miss)', ('cache', 'result')))
+CACHE_SIZE = registry.register(Gauge('bugtracker_cache_size', 'Entries of in-process caches', ('cache',)))
+CACHE_HIT_RATIO = registry.register(Gauge(
+    'bugtracker_cache_hit_ratio', 'Ratio of hits to all lookups of in-process caches', ('cache',)))
+
+
+@registry.collector
+def _collect_database():
+    from data import db_session
+    stats = db_session.session_stats()
+    DB_SESSIONS.set_total('opened', value=stats['opened_total'])
+    DB_SESSIONS.set_total('closed', value=stats['closed_total'])
+    DB_SESSIONS_OPEN.set(value=stats['open'])
+    engine = db_session.get_engine()
+    if engine is None:
+        return
+    pool = engine.pool
+    for kind in ('checkedout', 'checkedin', 'overflow', 'size'):
+        # Not every pool class has all of them, e.g NullPool
+        if hasattr(pool, kind):
+            DB_POOL.set(kind.replace('checked', 'checked_'), value=getattr(pool, kind)())
+
+
+@registry.collector
+def _collect_caches():
+    from api.auth import api_key_cache
+    from src.user_cache import user_cache
+    for name, cache in (('api_key', api_key_cache), ('user', user_cache)):
+        stats = cache.stats()
+        CACHE_LOOKUPS.set_total(name, 'hit', value=stats['hits'])
+        CACHE_LOOKUPS.set_total(name, 'miss', value=stats['misses'])
+        CACHE_SIZE.set(name, value=stats['size'])
+        CACHE_HIT_RATIO.set(name, value=stats['hit_ratio'])
+
+
+def _start_request():
+    g.metrics_started = time.perf_counter()
+    REQUESTS_IN_FLIGHT.inc()
+
+
+def _finish_request(response):
+    started = g.get('metrics_started')
+    if started is None:
+        return response
+    endpoint = request.endpoint or UNMATCHED_ENDPOINT
+    REQUEST_DURATION.observe(endpoint, request.method, value=time.perf_counter() - started)
+    REQUESTS.inc(endpoint, request.method, response.status_code)
+    queries = g.get('sql_queries')
+    if queries is not None:
+        SQL_STATEMENTS.inc(endpoint, request.method, amount=queries.count)
+    return response
+
+
+def _teardown_request(exception=None):
+    # Called even if request failed before response was made
+    if g.pop('metrics_started', None) is not None:
+        REQUESTS_IN_FLIGHT.dec()
+
+
+def render() -> str:
+    """
+    :return: All metrics of the process in Prometheus text format
+    """
+    return registry.render()
+
+
+def init_app(app) -> None:
+    """
+    Starts collecting request metrics of app
+    :param app: Flask app object
+    :return: None
+    """
+    app.before_request(_start_request)
+    app.after_request(_finish_request)
+    app.teardown_request(_teardown_request)
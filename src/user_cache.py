@@ -0,0 +1,104 @@
+"""
+Per-process cache of logged in users for flask_login user_loader
+Cached snapshot keeps only identity of user(id, username, role), so authenticated requests don't select user
+Every user has version stamp, it is bumped when username, role or password changes or user is deleted,
+snapshot with older version than current one is selected again
+Version stamps live in the process, so changes made by other processes(workers) are seen only when snapshot
+expires, USER_CACHE_TTL is the longest time a revoked role or deleted user is still served
+"""
+import threading
+from typing import Optional
+
+from flask import abort
+from flask_login import UserMixin
+
+from data import db_session
+from data.models import User
+from src.cache import TTLCache
+from src.user_changes import on_user_change
+
+# Count of cached users and seconds till snapshot is selected again(changes made by other processes)
+USER_CACHE_SIZE = 1024
+USER_CACHE_TTL = 5
+
+user_cache = TTLCache(USER_CACHE_SIZE, USER_CACHE_TTL)
+
+_versions_lock = threading.Lock()
+_versions = {}
+
+
+class UserSnapshot(UserMixin):
+    """
+    Logged in user without ORM state, shared by requests of the process
+    Equals to User object with the same id(see UserMixin.__eq__)
+    Attributes that snapshot doesn't have(e.g projects, API_KEY) are taken from User object of request session
+    """
+
+    def __init__(self, user_id: int, username: str, role: str, version: int):
+        self.id = user_id
+        self.username = username
+        self.role = role
+        self.version = version
+
+    @property
+    def is_admin(self) -> bool:
+        return self.role == 'Admin'
+
+    # Uses only id, so role in project is selected without loading User object
+    project_role = User.project_role
+
+    def get_user(self) -> User:
+        """
+        :return: User object of snapshot in request session, selected once per request
+        Throws 401 if user was deleted by another process after snapshot was cached, the next request is anonymous
+        """
+        user = db_session.get_session().query(User).get(self.id)
+        if user is None:
+            bump_version(self.id)
+            abort(401)
+        return user
+
+    def __getattr__(self, name):
+        # Called only for attributes that snapshot doesn't have
+        if name.startswith('__'):
+            raise AttributeError(name)
+        return getattr(self.get_user(), name)
+
+    def __repr__(self):
+        return f'<UserSnapshot {self.id} {self.username} v{self.version}>'
+
+
+def current_version(user_id: int) -> int:
+    with _versions_lock:
+        return _versions.get(user_id, 0)
+
+
+def bump_version(user_id: int) -> None:
+    """
+    Makes cached snapshot of user outdated
+    """
+    with _versions_lock:
+        _versions[user_id] = _versions.get(user_id, 0) + 1
+    user_cache.pop(user_id)
+
+
+def load_user_snapshot(user_id) -> Optional[UserSnapshot]:
+    """
+    :param user_id: User.id stored in session cookie by flask_login
+    :return: Cached snapshot of user or None if user doesn't exist
+    """
+    user_id = int(user_id)
+    version = current_version(user_id)
+    snapshot = user_cache.get(user_id)
+    if snapshot is not None and snapshot.version == version:
+        return snapshot
+
+    row = db_session.get_session().query(User.id, User.username, User.role).filter(User.id == user_id).first()
+    if row is None:
+        return None
+    snapshot = UserSnapshot(row.id, row.username, row.role, version)
+    user_cache.set(user_id, snapshot)
+    return snapshot
+
+
+on_user_change(('username', 'role', 'hashed_password'), bump_version)
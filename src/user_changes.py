@@ -0,0 +1,67 @@
+"""
+Notifications about changed users for per-process caches of user data
+Callback is called with User.id when one of watched columns of user is set and once more after commit,
+because till commit other sessions still can read and cache old values. Deleted users are reported after commit
+"""
+from typing import Callable, Dict, List, Sequence
+
+from sqlalchemy import event, orm
+
+from data.models import User
+
+# Column name -> callbacks that watch it
+_watchers: Dict[str, List[Callable[[int], None]]] = {}
+_callbacks: List[Callable[[int], None]] = []
+
+
+def on_user_change(columns: Sequence[str], callback: Callable[[int], None]) -> None:
+    """
+    Registers callback that drops cached data of user
+    :param columns: names of User columns that cached data depends on
+    :param callback: function of User.id
+    :return: None
+    """
+    for column in columns:
+        if column not in _watchers:
+            _watchers[column] = []
+            event.listen(getattr(User, column), 'set', _on_column_set(column))
+        _watchers[column].append(callback)
+    _callbacks.append(callback)
+
+
+def _changed_users(session: orm.Session) -> Dict[int, set]:
+    # User.id -> callbacks to call after commit
+    return session.info.setdefault('changed_users', {})
+
+
+def _on_column_set(column: str):
+    def on_set(target: User, value, oldvalue, initiator):
+        if target.id is None:
+            return
+        callbacks = _watchers[column]
+        for callback in callbacks:
+            callback(target.id)
+        session = orm.object_session(target)
+        if session is not None:
+            _changed_users(session).setdefault(target.id, set()).update(callbacks)
+
+    return on_set
+
+
+@event.listens_for(orm.Session, 'after_flush')
+def _on_flush(session: orm.Session, flush_context):
+    for instance in session.deleted:
+        if isinstance(instance, User):
+            _changed_users(session).setdefault(instance.id, set()).update(_callbacks)
+
+
+@event.listens_for(orm.Session, 'after_commit')
+def _on_commit(session: orm.Session):
+    for user_id, callbacks in session.info.pop('changed_users', {}).items():
+        for callback in callbacks:
+            callback(user_id)
+
+
+@event.listens_for(orm.Session, 'after_soft_rollback')
+def _on_rollback(session: orm.Session, previous_transaction):
+    session.info.pop('changed_users', None)
@@ -1,15 +1,15 @@
 import pytest
+import sqlalchemy
+from sqlalchemy import orm
+from contextlib import contextmanager
+import json
 from main_app import app, API_VER
 from data import db_session
+from src.user_cache import load_user_snapshot
 import random
 
-app.config['SQLITE3_SETTINGS'] = {
-    'host': 'db/bugtracker_test.sqlite'
-}
-
 app.testing = True
 testing_app = app.test_client()
-db_session.global_init('db/bugtracker_test.sqlite')
 CURRENT_API_VER = f'/api/v{API_VER}'
 # TEST API_KEYS
 FIRST_TEST_ACCOUNT_API_KEY = "OWJEAOOVSRRBVXTFLVNQVKJG"
@@ -38,6 +38,41 @@ TEST_DATA = [
 ]
 
 
+def logged_in_client(user_id: int):
+    """
+    :param user_id: User.id of user who will be logged in
+    :return: test client with logged in user
+    """
+    client = app.test_client()
+    with client.session_transaction() as session:
+        session['_user_id'] = str(user_id)
+        session['_fresh'] = True
+    # Snapshot of user expires in seconds(see src.user_cache), it is cached again, so counted requests don't load it
+    with app.app_context():
+        load_user_snapshot(user_id)
+    return client
+
+
+@contextmanager
+def count_queries(engine=None):
+    """
+    Collects SQL statements executed inside with block
+    :param engine: Engine to listen, engine of the app by default
+    :return: list that will contain executed statements
+    """
+    statements = []
+
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement)
+
+    engine = engine or db_session.get_engine()
+    sqlalchemy.event.listen(engine, 'before_cursor_execute', before_cursor_execute)
+    try:
+        yield statements
+    finally:
+        sqlalchemy.event.remove(engine, 'before_cursor_execute', before_cursor_execute)
+
+
 class TestConnectionToWebSite:
     def test_connection(self):
         result = testing_app.get('/')
@@ -227,3 +262,2014 @@ class TestIssueGET:
         test_case = testing_app.get(f'{CURRENT_API_VER}/issues/?API_KEY={TEST_DATA[0]["API_KEY"]}')
         assert test_case.status_code == 403
         assert test_case.json['message'] == 'Only admin can access to list of all Issues'
+
+
+class TestDatabaseSessions:
+    """
+    This class checks request-scoped database sessions
+    """
+
+    def test_same_session_inside_app_context(self):
+        with app.app_context():
+            assert db_session.get_session() is db_session.get_session()
+
+    def test_sessions_closed_after_requests(self):
+        """
+        Every session opened while handling requests should be closed on teardown
+        :return: None
+        """
+        open_before = db_session.session_stats()['open']
+        testing_app.get(f'{CURRENT_API_VER}/user/?API_KEY=DRWLFSSZOHTTFBFIUDJVPKXD&user_id=1')
+        testing_app.get(f'{CURRENT_API_VER}/project/?API_KEY=DRWLFSSZOHTTFBFIUDJVPKXD&project_id=1')
+        testing_app.get(f'{CURRENT_API_VER}/issue/?API_KEY=DRWLFSSZOHTTFBFIUDJVPKXD&tag=1')
+        stats = db_session.session_stats()
+        assert stats['open'] == open_before
+        assert stats['pool_checked_out'] == 0
+
+
+class TestSQLiteProfiles:
+    """
+    This class checks SQLite connection profiles from data.db_session.SQLITE_PROFILES
+    """
+
+    def test_production_profile_pragmas(self, tmp_path):
+        engine = db_session.create_engine(str(tmp_path / 'production.sqlite'), 'production')
+        connection = engine.connect()
+        assert connection.execute('PRAGMA journal_mode').scalar() == 'wal'
+        assert connection.execute('PRAGMA busy_timeout').scalar() == 5000
+        connection.close()
+        engine.dispose()
+
+    def test_concurrent_writes_are_serialized(self, tmp_path):
+        """
+        Several threads write at once, none of them should fail with "database is locked"
+        :return: None
+        """
+        import threading
+        from data.models import Project
+
+        engine = db_session.create_engine(str(tmp_path / 'writes.sqlite'), 'production')
+        db_session.SqlAlchemyBase.metadata.create_all(engine)
+        factory = db_session.create_session_factory(engine, 'production')
+        errors = []
+
+        def write(number):
+            session = factory()
+            try:
+                for i in range(20):
+                    session.add(Project(project_name=f'P{number}-{i}', short_project_tag=f'{number}-{i}'))
+                    session.commit()
+            except Exception as error:
+                errors.append(error)
+            finally:
+                session.close()
+
+        threads = [threading.Thread(target=write, args=(number,)) for number in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        session = factory()
+        assert not errors
+        assert session.query(Project).count() == 160
+        session.close()
+        engine.dispose()
+
+    @pytest.mark.parametrize('statement, is_write', [
+        ('INSERT INTO projects(project_name) VALUES(1)', True),
+        ('\n  insert\ninto projects(project_name) VALUES(1)', True),
+        ('-- comment\n/* another\ncomment */ UPDATE projects SET project_name = 1', True),
+        ('REPLACE INTO projects(id) VALUES(1)', True),
+        ('SELECT * FROM projects -- INSERT', False),
+        ('  ', False),
+    ])
+    def test_write_statements(self, statement, is_write):
+        assert db_session._is_write_statement(statement) == is_write
+
+    def test_writer_lock_taken_by_every_write(self, tmp_path):
+        from data.models import Project
+        engine = db_session.create_engine(str(tmp_path / 'lock.sqlite'), 'production')
+        db_session.SqlAlchemyBase.metadata.create_all(engine)
+        factory = db_session.create_session_factory(engine, 'production')
+
+        writes = [
+            lambda session: session.bulk_insert_mappings(Project, [{'project_name': 'bulk'}]),
+            lambda session: session.bulk_save_objects([Project(project_name='saved')]),
+            lambda session: session.execute('\n  INSERT INTO projects(project_name) VALUES(:name)', {'name': 'raw'}),
+            lambda session: session.add(Project(project_name='flushed')) or session.flush(),
+        ]
+        for write in writes:
+            session = factory()
+            session.query(Project).count()
+            assert not session._holds_writer_lock
+            write(session)
+            assert session._holds_writer_lock
+            session.commit()
+            assert not session._holds_writer_lock
+            session.close()
+
+        # Connections returned to pool don't refer to closed sessions
+        connection = engine.connect()
+        assert 'writer_session' not in connection.info
+        connection.execute("INSERT INTO projects(project_name) VALUES('engine')")
+        connection.close()
+        engine.dispose()
+
+
+class TestProjectMembers:
+    """
+    This class checks bulk loading of project members
+    """
+
+    def test_member_details_match_member_methods(self):
+        from data.models import Project
+        with app.app_context():
+            project = db_session.get_session().query(Project).get(1)
+            with count_queries() as statements:
+                members = project.member_details()
+            assert len(statements) == 2
+            assert len(members) == len(project.members)
+            for member in members:
+                assert member.role == member.user.project_role(project.id)
+                assert member.date_of_add == member.user.project_date_of_add(project.id)
+                assert member.issues_total == member.user.count_of_issues_total(project.id)
+
+    def test_members_page(self):
+        result = logged_in_client(1).get('/projects/1/manage/members')
+        assert result.status_code == 200
+        assert b'Project role: root' in result.data
+
+    def test_members_page_queries_dont_depend_on_members(self, tmp_path, monkeypatch):
+        """
+        Page of project with one member and page of project with many members make the same count of statements
+        Separate database, so added members and issues don't get into test database
+        :return: None
+        """
+        from data.models import Issue, Project, User
+        engine = db_session.create_engine(str(tmp_path / 'members.sqlite'))
+        db_session.upgrade_database(engine)
+        session = db_session.create_session_factory(engine)()
+        # Ids of users differ from users of test database, cached snapshots of them stay correct
+        user_ids = range(1001, 1011)
+        session.add_all([User(id=user_id, username=f'member{user_id}', hashed_password='',
+                              role='Admin' if user_id == 1001 else 'User') for user_id in user_ids])
+        session.add_all([Project(id=1, project_name='Alone', short_project_tag='A', description='', root_user_id=1001),
+                         Project(id=2, project_name='Crowd', short_project_tag='C', description='', root_user_id=1001)])
+        session.flush()
+        session.execute("INSERT INTO user_to_project (member_id, project_id, project_role) VALUES (1001, 1, 'root')")
+        session.execute("INSERT INTO user_to_project (member_id, project_id, project_role) VALUES " + ', '.join(
+            f"({user_id}, 2, '{'root' if user_id == 1001 else 'developer'}')" for user_id in user_ids))
+        for user_id in user_ids:
+            issue = Issue(tracking=f'C-{user_id}', summary='Assigned', project_id=2)
+            issue.project.append(session.query(Project).get(2))
+            issue.assignees.append(session.query(User).get(user_id))
+            session.add(issue)
+        session.commit()
+        monkeypatch.setattr(db_session, 'get_session', lambda: session)
+        # Models import get_session by name
+        monkeypatch.setattr('data.models.get_session', lambda: session)
+
+        client = logged_in_client(1001)
+        counts = []
+        for project_id, members in ((1, 1), (2, 10)):
+            # The first request caches logged in user
+            client.get(f'/projects/{project_id}/manage/members')
+            with count_queries(engine) as statements:
+                result = client.get(f'/projects/{project_id}/manage/members')
+            assert result.status_code == 200
+            assert result.data.count(b'Project role: ') == members
+            counts.append(len(statements))
+        session.close()
+        engine.dispose()
+        assert counts[0] == counts[1] > 0
+
+
+class TestProjectRoot:
+    """
+    This class checks denormalized Project.root_user_id
+    """
+
+    def test_projects_list_root_without_extra_queries(self):
+        from api.auth import api_key_cache
+        api_key_cache.clear()
+        with count_queries() as statements:
+            result = testing_app.get(f'{CURRENT_API_VER}/projects/?API_KEY=DRWLFSSZOHTTFBFIUDJVPKXD')
+        assert result.status_code == 200
+        assert all(project['root'] for project in result.json['projects'])
+        # One query for API key owner and one for projects joined with roots
+        assert len(statements) == 2
+
+    def test_migration_backfills_root(self, tmp_path):
+        """
+        Creates database of revision before root_user_id, then upgrades it to the head
+        :return: None
+        """
+        from alembic import command
+        from alembic.config import Config
+
+        engine = sqlalchemy.create_engine(f'sqlite:///{tmp_path / "legacy.sqlite"}')
+        config = Config()
+        config.set_main_option('script_location', db_session.MIGRATIONS_DIR)
+        with engine.begin() as connection:
+            config.attributes['connection'] = connection
+            command.upgrade(config, 'c8c750c0e0ab')
+            connection.execute("INSERT INTO users (id, username) VALUES (1, 'root'), (2, 'developer')")
+            connection.execute("INSERT INTO projects (id, project_name) VALUES (1, 'Legacy')")
+            connection.execute("INSERT INTO user_to_project (member_id, project_id, project_role) "
+                               "VALUES (2, 1, 'developer'), (1, 1, 'root')")
+            command.upgrade(config, 'head')
+            assert connection.execute('SELECT root_user_id FROM projects WHERE id = 1').scalar() == 1
+        engine.dispose()
+
+    def test_repr_of_project_without_root(self, tmp_path):
+        from data.models import Project
+        engine = db_session.create_engine(str(tmp_path / 'rootless.sqlite'))
+        db_session.upgrade_database(engine)
+        session = db_session.create_session_factory(engine)()
+        session.add(Project(id=1, project_name='Imported', short_project_tag='IM', description=''))
+        session.commit()
+        assert 'root= None' in repr(session.query(Project).get(1))
+        session.close()
+        engine.dispose()
+
+
+class TestIssueNumbers:
+    """
+    This class checks per-project issue counter under concurrent issue creation
+    """
+
+    @pytest.mark.parametrize('profile', ['default', 'production'])
+    def test_concurrent_issue_creation_gives_unique_tags(self, tmp_path, profile):
+        import threading
+        from data.models import Project, Issue
+
+        threads_count, issues_per_thread = 8, 25
+        engine = db_session.create_engine(str(tmp_path / 'issues.sqlite'), profile)
+        db_session.upgrade_database(engine)
+        factory = db_session.create_session_factory(engine, profile)
+
+        session = factory()
+        session.add(Project(project_name='Stress', short_project_tag='ST'))
+        session.commit()
+        project_id = session.query(Project.id).scalar()
+        session.close()
+
+        errors = []
+        start = threading.Barrier(threads_count)
+
+        def create_issues():
+            thread_session = factory()
+            start.wait()
+            try:
+                for _ in range(issues_per_thread):
+                    project = thread_session.query(Project).get(project_id)
+                    issue = Issue(tracking=project.next_issue_tracking(), summary='Stress', project_id=project_id)
+                    issue.project.append(project)
+                    thread_session.add(issue)
+                    thread_session.commit()
+            except Exception as error:
+                errors.append(error)
+            finally:
+                thread_session.close()
+
+        threads = [threading.Thread(target=create_issues) for _ in range(threads_count)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        session = factory()
+        total = threads_count * issues_per_thread
+        assert not errors
+        assert sorted(tag for tag, in session.query(Issue.tracking)) == sorted(f'ST-{i}' for i in range(1, total + 1))
+        assert session.query(Project).get(project_id).next_issue_number == total + 1
+        session.close()
+        engine.dispose()
+
+
+def hot_queries(session):
+    """
+    :param session: Session of checked database
+    :return: List of (name, query) of lookups that run on almost every request
+    """
+    from data.models import User, Project, Issue, association_table_user_to_project
+    from data.models import association_table_user_to_issue, association_table_project_to_issue
+
+    return [
+        ('user by API key', session.query(User).filter(User.API_KEY == 'KEY')),
+        ('issue by tracking', session.query(Issue).filter(Issue.tracking == 'TAG-1')),
+        ('project by tag', session.query(Project).filter(Project.short_project_tag == 'TAG')),
+        ('project issues by FK', session.query(Issue).filter(Issue.project_id == 1)),
+        ('issue counts of projects', session.query(Issue.project_id, sqlalchemy.func.count(Issue.id)).filter(
+            Issue.project_id.in_([1, 2])).group_by(Issue.project_id)),
+        ('project role', session.query(association_table_user_to_project.c.project_role).filter(
+            association_table_user_to_project.c.member_id == 1,
+            association_table_user_to_project.c.project_id == 1)),
+        ('project members by role', session.query(association_table_user_to_project.c.member_id).filter(
+            association_table_user_to_project.c.project_id == 1,
+            association_table_user_to_project.c.project_role == 'root')),
+        ('issue assignees', session.query(User).with_parent(Issue(id=1), 'assignees')),
+        ('user issues', session.query(Issue).with_parent(User(id=1), 'issues')),
+        ('project of issue', session.query(Project).with_parent(Issue(id=1), 'project')),
+        ('issues of project', session.query(Issue).with_parent(Project(id=1), 'issues')),
+        ('projects of user', session.query(Project).with_parent(User(id=1), 'projects')),
+        ('members of project', session.query(User).with_parent(Project(id=1), 'members')),
+        ('assigned issues in project', session.query(association_table_user_to_issue.c.issue_id).join(
+            Issue, Issue.id == association_table_user_to_issue.c.issue_id).filter(
+            Issue.project_id == 1, association_table_user_to_issue.c.user_id == 1)),
+        ('issue links of project', session.query(association_table_project_to_issue.c.issue_id).filter(
+            association_table_project_to_issue.c.project_id == 1)),
+        ('project issues by state', session.query(Issue).filter(Issue.project_id == 1, Issue.state == 'Fixed')),
+        ('project issues by creation date', session.query(Issue).filter(
+            Issue.project_id == 1, Issue.date_of_creation >= '2020-01-01')),
+    ]
+
+
+def full_scans(connection, query) -> list:
+    """
+    :return: Lines of EXPLAIN QUERY PLAN of query which scan table without index
+    """
+    compiled = query.statement.compile(dialect=connection.dialect)
+    params = [compiled.params[name] for name in compiled.positiontup]
+    plan = [row[-1] for row in connection.execute(f'EXPLAIN QUERY PLAN {compiled}', params)]
+    return [line for line in plan if line.startswith('SCAN') and 'INDEX' not in line]
+
+
+class TestQueryPlans:
+    """
+    This class checks that hot lookups use indexes both in migrated and in new databases
+    """
+
+    def check_database(self, engine):
+        session = orm.Session(bind=engine)
+        connection = engine.connect()
+        scans = {name: full_scans(connection, query) for name, query in hot_queries(session)}
+        connection.close()
+        session.close()
+        assert {name: lines for name, lines in scans.items() if lines} == {}
+
+    def test_migrated_database(self):
+        self.check_database(db_session.get_engine())
+
+    def test_new_database(self, tmp_path):
+        engine = db_session.create_engine(str(tmp_path / 'new.sqlite'))
+        db_session.upgrade_database(engine)
+        self.check_database(engine)
+        engine.dispose()
+
+
+class TestListPagination:
+    """
+    This class checks keyset pagination of list resources
+    """
+
+    def collect_pages(self, resource: str, key: str, limit: int, extra: str = '') -> list:
+        items, cursor = [], None
+        while True:
+            url = f'{CURRENT_API_VER}/{resource}/?API_KEY=DRWLFSSZOHTTFBFIUDJVPKXD&limit={limit}{extra}'
+            result = testing_app.get(url + (f'&after={cursor}' if cursor else ''))
+            assert result.status_code == 200
+            assert len(result.json[key]) <= limit
+            items += result.json[key]
+            cursor = result.json['next_cursor']
+            if cursor is None:
+                return items
+
+    def test_pages_cover_whole_list(self):
+        for resource, key in (('users', 'users'), ('projects', 'projects'), ('issues', 'issues')):
+            whole_list = testing_app.get(f'{CURRENT_API_VER}/{resource}/?API_KEY=DRWLFSSZOHTTFBFIUDJVPKXD').json
+            assert whole_list['next_cursor'] is None
+            assert self.collect_pages(resource, key, limit=1) == whole_list[key]
+
+    def test_project_issues_pages(self):
+        issues = self.collect_pages('issues', 'issues', limit=1, extra='&project_id=1')
+        assert all(issue['project_name'] == 'Test_proj' for issue in issues)
+
+    def test_project_issues_by_project_id(self, tmp_path, monkeypatch):
+        """
+        Issues of project are listed by Issue.project_id like they are counted and authorized,
+        link rows of project_to_issue don't matter
+        :return: None
+        """
+        from api.auth import api_key_cache
+        from data.models import Issue, Project, User
+        engine = db_session.create_engine(str(tmp_path / 'links.sqlite'))
+        db_session.upgrade_database(engine)
+        session = db_session.create_session_factory(engine)()
+        session.add_all([User(id=1, username='admin', hashed_password='', API_KEY='LINKS_ADMIN_KEY', role='Admin'),
+                         Project(id=1, project_name='First', short_project_tag='F', description=''),
+                         Project(id=2, project_name='Second', short_project_tag='S', description=''),
+                         Issue(id=1, tracking='F-1', project_id=1, state='Fixed', priority='Major'),
+                         Issue(id=2, tracking='S-1', project_id=2, state='Fixed', priority='Major')])
+        session.flush()
+        # Link of F-1 is missing and link of S-1 points to the wrong project
+        session.execute("INSERT INTO project_to_issue (issue_id, project_id) VALUES (2, 1)")
+        session.commit()
+        monkeypatch.setattr(db_session, 'get_session', lambda: session)
+        result = testing_app.get(f'{CURRENT_API_VER}/issues/?API_KEY=LINKS_ADMIN_KEY&project_id=1')
+        api_key_cache.clear()
+        assert result.status_code == 200
+        assert [(issue['tracking'], issue['project_name']) for issue in result.json['issues']] == [('F-1', 'First')]
+        session.close()
+        engine.dispose()
+
+    def test_bad_cursor(self):
+        result = testing_app.get(f'{CURRENT_API_VER}/users/?API_KEY=DRWLFSSZOHTTFBFIUDJVPKXD&after=not_a_cursor')
+        assert result.status_code == 400
+
+
+class TestNDJSONStream:
+    """
+    This class checks format=ndjson streaming of list resources
+    """
+
+    def stream(self, resource: str, extra: str = '') -> list:
+        result = testing_app.get(f'{CURRENT_API_VER}/{resource}/?API_KEY=DRWLFSSZOHTTFBFIUDJVPKXD&format=ndjson{extra}')
+        assert result.status_code == 200
+        assert result.mimetype == 'application/x-ndjson'
+        assert result.is_streamed
+        return [json.loads(line) for line in result.get_data(as_text=True).splitlines()]
+
+    @pytest.mark.parametrize('chunk_size', [1, 2, 500])
+    def test_stream_equals_list(self, monkeypatch, chunk_size):
+        from api import resources
+        monkeypatch.setattr(resources, 'NDJSON_CHUNK_SIZE', chunk_size)
+        for resource in ('users', 'projects', 'issues'):
+            whole_list = testing_app.get(f'{CURRENT_API_VER}/{resource}/?API_KEY=DRWLFSSZOHTTFBFIUDJVPKXD').json
+            assert self.stream(resource) == whole_list[resource]
+
+    def test_stream_after_cursor(self):
+        first_page = testing_app.get(f'{CURRENT_API_VER}/users/?API_KEY=DRWLFSSZOHTTFBFIUDJVPKXD&limit=1').json
+        whole_list = testing_app.get(f'{CURRENT_API_VER}/users/?API_KEY=DRWLFSSZOHTTFBFIUDJVPKXD').json
+        assert self.stream('users', f'&after={first_page["next_cursor"]}') == whole_list['users'][1:]
+
+    def test_stream_project_issues(self):
+        assert all(issue['project_name'] == 'Test_proj' for issue in self.stream('issues', '&project_id=1'))
+
+    def test_stream_errors(self):
+        base = f'{CURRENT_API_VER}/users/?API_KEY=DRWLFSSZOHTTFBFIUDJVPKXD'
+        assert testing_app.get(base + '&format=ndjson&after=not_a_cursor').status_code == 400
+        assert testing_app.get(base + '&format=xml').status_code == 400
+
+
+class TestIssueListQueries:
+    """
+    This class checks that issue lists load projects and assignees of issues in batch, not per issue
+    """
+
+    def issues_queries(self, extra: str = '') -> int:
+        from api.auth import api_key_cache
+        # API key owner is selected by every request
+        api_key_cache.clear()
+        with count_queries() as statements:
+            result = testing_app.get(f'{CURRENT_API_VER}/issues/?API_KEY=DRWLFSSZOHTTFBFIUDJVPKXD{extra}')
+        assert result.status_code == 200
+        assert all(issue['project_name'] and issue['assign_on'] for issue in result.json['issues'])
+        return len(statements)
+
+    def test_issue_list_queries_dont_depend_on_page_size(self):
+        # API key owner and page of issues with project names and assignees
+        assert self.issues_queries('&limit=1') == self.issues_queries('&limit=3') == 2
+
+    def test_project_issue_list_queries(self):
+        # API key owner, project, membership check and page of issues
+        assert self.issues_queries('&project_id=1') <= 4
+
+    def test_ndjson_queries_per_chunk(self, monkeypatch):
+        from api import resources
+        from api.auth import api_key_cache
+        monkeypatch.setattr(resources, 'NDJSON_CHUNK_SIZE', 500)
+        api_key_cache.clear()
+        with count_queries() as statements:
+            result = testing_app.get(f'{CURRENT_API_VER}/issues/?API_KEY=DRWLFSSZOHTTFBFIUDJVPKXD&format=ndjson')
+            lines = result.get_data(as_text=True).splitlines()
+        assert len(lines) == 3
+        assert len(statements) == 2
+
+    @pytest.mark.parametrize('url', ['/profile/1/issues', '/projects/1/issues'])
+    def test_issue_pages_queries(self, url):
+        with logged_in_client(1) as client:
+            with count_queries() as statements:
+                result = client.get(url)
+        assert result.status_code == 200
+        # Current user, page object, its issues and projects of issues for profile page
+        assert len(statements) <= 4
+
+
+class TestProjectionSerializer:
+    """
+    This class checks that compiled projections return the same dicts as SerializerMixin.to_dict
+    """
+
+    @pytest.mark.parametrize('model_name, fields', [
+        ('User', ('role', 'username', 'id')),
+        ('Project', ('project_name', 'root', 'description')),
+        ('Issue', ('tracking', 'summary', 'project_name', 'assign_on')),
+    ])
+    def test_projection_equals_to_dict(self, model_name, fields):
+        from api.serializers import projection
+        from data import models
+        model = getattr(models, model_name)
+        with app.app_context():
+            session = db_session.get_session()
+            compiled = projection(model, fields)
+            rows = compiled.query(session).order_by(compiled.key_column).all()
+            objects = session.query(model).order_by(model.id).all()
+            assert [compiled.to_dict(row) for row in rows] == [item.to_dict(only=fields) for item in objects]
+            assert [compiled.key(row) for row in rows] == [item.id for item in objects]
+
+    def test_projection_selects_only_requested_columns(self):
+        from api.serializers import projection
+        from data.models import Issue
+        with app.app_context():
+            statement = str(projection(Issue, ('tracking',)).query(db_session.get_session()))
+        assert 'issues.tracking' in statement
+        assert 'issues.description' not in statement
+
+    def test_projection_is_compiled_once(self):
+        from api.serializers import projection
+        from data.models import Issue
+        assert projection(Issue, ('tracking', 'state')) is projection(Issue, ('tracking', 'state'))
+
+    def test_unknown_field(self):
+        from api.serializers import projection
+        from data.models import Issue
+        with pytest.raises(ValueError):
+            projection(Issue, ('assignees',))
+
+
+class TestTTLCache:
+    """
+    This class checks LRU eviction, expiration and counters of src.cache.TTLCache
+    """
+
+    def test_lru_eviction(self):
+        from src.cache import TTLCache
+        cache = TTLCache(maxsize=2, ttl=60)
+        cache.set('a', 1)
+        cache.set('b', 2)
+        assert cache.get('a') == 1
+        cache.set('c', 3)
+        # b is the least recently used
+        assert cache.get('b') is None
+        assert cache.get('a') == 1 and cache.get('c') == 3
+
+    def test_expiration(self):
+        from src.cache import TTLCache
+        now = [0.0]
+        cache = TTLCache(maxsize=2, ttl=10, clock=lambda: now[0])
+        cache.set('a', 1)
+        now[0] = 9.9
+        assert cache.get('a') == 1
+        now[0] = 10
+        assert cache.get('a') is None
+        assert cache.stats() == {'hits': 1, 'misses': 1, 'size': 0, 'hit_ratio': 0.5}
+
+
+class TestAPIKeyCache:
+    """
+    This class checks caching of API key owners and invalidation of cache on changes of user
+    """
+
+    @pytest.fixture
+    def session(self, tmp_path):
+        """
+        Separate database, so changes of users don't touch test database
+        """
+        from data.models import User
+        engine = db_session.create_engine(str(tmp_path / 'auth.sqlite'))
+        db_session.upgrade_database(engine)
+        session = db_session.create_session_factory(engine)()
+        session.add(User(username='cached', hashed_password='', API_KEY='CACHED_KEY', role='User'))
+        session.commit()
+        yield session
+        session.close()
+        engine.dispose()
+
+    @pytest.fixture
+    def cached_user(self, session, monkeypatch):
+        from api import auth
+        from data.models import User
+        auth.api_key_cache.clear()
+        # authenticate selects owner of API key with request session
+        monkeypatch.setattr(auth.db_session, 'get_session', lambda: session)
+        user = session.query(User).filter(User.username == 'cached').one()
+        principal = auth.authenticate('CACHED_KEY')
+        assert principal == auth.Principal(user.id, 'cached', 'User', False)
+        return user
+
+    def test_repeated_key_is_cached(self, cached_user, session):
+        from api.auth import authenticate, api_key_cache
+        hits = api_key_cache.hits
+        with count_queries(session.get_bind()) as statements:
+            for _ in range(10):
+                assert authenticate('CACHED_KEY').id == cached_user.id
+        assert statements == []
+        assert api_key_cache.hits - hits == 10
+
+    def test_regenerate_api_key_invalidates(self, cached_user, session):
+        from api.auth import authenticate
+        cached_user.regenerate_API_key()
+        assert authenticate('CACHED_KEY') is None
+        assert authenticate(cached_user.API_KEY).id == cached_user.id
+
+    def test_role_change_invalidates(self, cached_user, session):
+        from api.auth import authenticate
+        cached_user.role = 'Admin'
+        session.commit()
+        assert authenticate('CACHED_KEY').is_admin
+
+    def test_delete_invalidates(self, cached_user, session):
+        from api.auth import authenticate
+        session.delete(cached_user)
+        session.commit()
+        assert authenticate('CACHED_KEY') is None
+
+    def test_change_by_other_process_expires(self, cached_user, session, monkeypatch):
+        from api import auth
+        # Change made without ORM events of this process, as another worker would make it
+        session.get_bind().execute("UPDATE users SET API_KEY = 'OTHER_KEY' WHERE username = 'cached'")
+        assert auth.authenticate('CACHED_KEY').id == cached_user.id
+        now = auth.api_key_cache._clock() + auth.API_KEY_CACHE_TTL
+        monkeypatch.setattr(auth.api_key_cache, '_clock', lambda: now)
+        assert auth.authenticate('CACHED_KEY') is None
+        assert auth.API_KEY_CACHE_TTL <= 5
+
+    def test_bad_keys(self, cached_user):
+        from api.auth import authenticate, api_key_cache
+        assert authenticate('None') is None
+        assert authenticate('WRONG_KEY') is None
+        assert api_key_cache.stats()['size'] == 1
+
+
+class TestUserSnapshotCache:
+    """
+    This class checks cached snapshots of logged in users
+    """
+
+    def test_page_view_without_identity_queries(self):
+        with logged_in_client(1) as client:
+            # The first request caches snapshot of user
+            assert client.get('/').status_code == 200
+            with count_queries() as statements:
+                result = client.get('/')
+        assert result.status_code == 200
+        assert b'Admin' in result.data
+        assert statements == []
+
+    def test_snapshot_equals_user(self):
+        from src.user_cache import load_user_snapshot
+        from data.models import User
+        with app.app_context():
+            snapshot = load_user_snapshot('1')
+            user = db_session.get_session().query(User).get(1)
+            assert snapshot == user and not snapshot != user
+            assert snapshot in [user]
+            assert snapshot.is_admin
+            # Attributes that snapshot doesn't have are taken from User object
+            assert snapshot.API_KEY == user.API_KEY
+            assert snapshot.project_role(1) == user.project_role(1)
+
+    def test_missing_user(self):
+        from src.user_cache import load_user_snapshot
+        with app.app_context():
+            assert load_user_snapshot('-1') is None
+
+    def test_version_bumped_on_changes(self, tmp_path, monkeypatch):
+        from src import user_cache
+        from data.models import User
+        engine = db_session.create_engine(str(tmp_path / 'identity.sqlite'))
+        db_session.upgrade_database(engine)
+        session = db_session.create_session_factory(engine)()
+        monkeypatch.setattr(user_cache.db_session, 'get_session', lambda: session)
+        user = User(username='snapshot', hashed_password='', role='User')
+        session.add(user)
+        session.commit()
+
+        snapshot = user_cache.load_user_snapshot(user.id)
+        assert user_cache.load_user_snapshot(user.id) is snapshot
+
+        user.role = 'Admin'
+        session.commit()
+        assert user_cache.load_user_snapshot(user.id).is_admin
+
+        user.hashed_password = 'changed'
+        session.commit()
+        assert user_cache.load_user_snapshot(user.id).version > snapshot.version
+
+        session.delete(user)
+        session.commit()
+        assert user_cache.load_user_snapshot(user.id) is None
+        session.close()
+        engine.dispose()
+
+    def test_user_deleted_by_other_process(self, tmp_path, monkeypatch):
+        from werkzeug.exceptions import Unauthorized
+        from src import user_cache
+        from data.models import User
+        engine = db_session.create_engine(str(tmp_path / 'deleted.sqlite'))
+        db_session.upgrade_database(engine)
+        session = db_session.create_session_factory(engine)()
+        monkeypatch.setattr(user_cache.db_session, 'get_session', lambda: session)
+        user = User(username='deleted', hashed_password='', role='User')
+        session.add(user)
+        session.commit()
+        user_id = user.id
+        snapshot = user_cache.load_user_snapshot(user_id)
+
+        # Deleted without ORM events of this process, as another worker would delete it
+        engine.execute('DELETE FROM users WHERE id = ?', user_id)
+        session.expunge_all()
+        with pytest.raises(Unauthorized):
+            snapshot.API_KEY
+        assert user_cache.load_user_snapshot(user_id) is None
+        assert user_cache.USER_CACHE_TTL <= 5
+        session.close()
+        engine.dispose()
+
+    def test_user_changes_callbacks(self, tmp_path):
+        from src.user_changes import on_user_change
+        from data.models import User
+        engine = db_session.create_engine(str(tmp_path / 'changes.sqlite'))
+        db_session.upgrade_database(engine)
+        session = db_session.create_session_factory(engine)()
+        user = User(username='changes', hashed_password='', role='User')
+        session.add(user)
+        session.commit()
+        changed = []
+        on_user_change(('last_ip',), changed.append)
+
+        # Column that callback doesn't watch
+        user.role = 'Admin'
+        session.commit()
+        assert changed == []
+        # On set and once more after commit
+        user.last_ip = '127.0.0.1'
+        assert changed == [user.id]
+        session.commit()
+        assert changed == [user.id, user.id]
+        # Rolled back changes are not reported after rollback
+        user.last_ip = '127.0.0.2'
+        session.rollback()
+        assert changed == [user.id] * 3
+        # Deleted user is reported to every callback
+        user_id = user.id
+        session.delete(user)
+        session.commit()
+        assert changed == [user_id] * 4
+        session.close()
+        engine.dispose()
+
+
+class TestAuthorization:
+    """
+    This class checks access checks of src.authorization
+    """
+
+    @pytest.mark.parametrize('user_id, is_admin, project_id, viewer, manager', [
+        (1, True, 2, True, True),
+        (3, False, 2, True, True),
+        (3, False, 3, False, False),
+        (4, False, 3, True, True),
+        (3, False, 'not_a_number', False, False),
+    ])
+    def test_access(self, user_id, is_admin, project_id, viewer, manager):
+        from api.auth import Principal
+        from src.authorization import can_view, can_manage
+        user = Principal(user_id, '', 'Admin' if is_admin else 'User', is_admin)
+        with app.app_context():
+            assert can_view(user, project_id) == viewer
+            assert can_manage(user, project_id) == manager
+
+    def test_membership_selected_once_per_request(self):
+        from api.auth import Principal
+        from src.authorization import can_view, can_manage
+        user = Principal(3, 'API_TEST_1', 'User', False)
+        with app.app_context():
+            with count_queries() as statements:
+                for _ in range(5):
+                    assert can_view(user, 2) and can_manage(user, '2')
+            assert len(statements) == 1
+            # Admin doesn't need membership at all
+            with count_queries() as statements:
+                assert can_view(Principal(1, 'admin', 'Admin', True), 3)
+            assert statements == []
+
+    def test_membership_not_shared_between_requests(self):
+        from api.auth import Principal
+        from src.authorization import membership
+        user = Principal(3, 'API_TEST_1', 'User', False)
+        with app.app_context():
+            membership(user, 2)
+        with app.app_context():
+            with count_queries() as statements:
+                membership(user, 2)
+            assert len(statements) == 1
+
+    @pytest.mark.parametrize('url', ['/projects/2', '/issue/API1-1', '/projects/2/issues'])
+    def test_pages_check_access_by_one_query(self, url):
+        with logged_in_client(3) as client:
+            client.get(url)
+            with count_queries() as statements:
+                result = client.get(url)
+        assert result.status_code == 200
+        assert sum(statement.startswith('SELECT user_to_project.project_role') for statement in statements) == 1
+
+
+class TestAggregateCounts:
+    """
+    This class checks counts of users, members and issues made by SQL COUNT
+    """
+
+    def test_counts_equal_collection_lengths(self):
+        from data.models import User, Project
+        with app.app_context():
+            session = db_session.get_session()
+            projects = session.query(Project).all()
+            for project in projects:
+                assert project.issue_count == len(project.issues)
+                assert project.member_count == len(project.members)
+            assert Project.issue_counts(session, [project.id for project in projects]) == {
+                project.id: len(project.issues) for project in projects if project.issues}
+            assert Project.issue_counts(session, []) == {}
+            users = session.query(User).all()
+            for user in users:
+                assert user.project_count == len(user.projects)
+            assert User.count_total(session) == len(users)
+
+    def test_issue_count_by_project_id(self, tmp_path):
+        """
+        Issues of project are counted by Issue.project_id like in lists and searches, without project_to_issue links
+        :return: None
+        """
+        from data.models import Issue, Project
+        engine = db_session.create_engine(str(tmp_path / 'counts.sqlite'))
+        db_session.upgrade_database(engine)
+        session = db_session.create_session_factory(engine)()
+        session.add_all([Project(id=1, project_name='First', short_project_tag='F', description=''),
+                         Issue(tracking='F-1', project_id=1, state='Fixed', priority='Major'),
+                         Issue(tracking='F-2', project_id=1, state='Fixed', priority='Major')])
+        session.commit()
+        project = session.query(Project).get(1)
+        assert project.issue_count == 2
+        assert Project.issue_counts(session, [1, 2]) == {1: 2}
+        session.close()
+        engine.dispose()
+
+    @pytest.mark.parametrize('url, text', [('/projects/2', b'Total project members: 1'),
+                                           ('/profile/3', b'Total Projects: 1'),
+                                           ('/profile/3/projects', b'Issues: 1')])
+    def test_pages_dont_load_collections(self, url, text):
+        with logged_in_client(3) as client:
+            client.get(url)
+            with count_queries() as statements:
+                result = client.get(url)
+        assert result.status_code == 200
+        assert text in result.data
+        # Neither issues nor members are selected as rows, only counted
+        assert not any((statement.startswith('SELECT issues.') and 'count(' not in statement) or
+                       (statement.startswith('SELECT users.') and 'user_to_project' in statement)
+                       for statement in statements)
+
+
+class TestProjectIssueStats:
+    """
+    This class checks incremental maintenance of project_issue_stats, its rebuild, check and API
+    """
+
+    @pytest.fixture
+    def session(self, tmp_path):
+        from data.models import Project
+        engine = db_session.create_engine(str(tmp_path / 'stats.sqlite'))
+        db_session.upgrade_database(engine)
+        session = db_session.create_session_factory(engine)()
+        session.add_all([Project(id=1, project_name='First', short_project_tag='F', description=''),
+                         Project(id=2, project_name='Second', short_project_tag='S', description='')])
+        session.commit()
+        yield session
+        session.close()
+        engine.dispose()
+
+    def stored(self, session) -> dict:
+        from data.models import ProjectIssueStats
+        return {(row.project_id, row.state, row.priority): row.issue_count
+                for row in session.query(ProjectIssueStats)}
+
+    def test_incremental_updates(self, session):
+        from data.models import Issue
+        from data.issue_stats import check_stats
+        issues = [Issue(tracking=f'F-{i}', project_id=1, state='Unresolved', priority='Major') for i in range(3)]
+        session.add_all(issues)
+        session.commit()
+        assert self.stored(session) == {(1, 'Unresolved', 'Major'): 3}
+
+        issues[0].state = 'Fixed'
+        issues[1].project_id = 2
+        session.commit()
+        assert self.stored(session) == {(1, 'Unresolved', 'Major'): 1, (1, 'Fixed', 'Major'): 1,
+                                        (2, 'Unresolved', 'Major'): 1}
+
+        session.delete(issues[2])
+        # Changes of other columns don't touch stats
+        issues[0].summary = 'Changed'
+        session.commit()
+        assert self.stored(session) == {(1, 'Fixed', 'Major'): 1, (2, 'Unresolved', 'Major'): 1}
+        assert check_stats(session) == []
+
+    def test_missing_priority_is_one_row(self, session):
+        from data.models import Issue
+        from data.issue_stats import check_stats
+        issues = [Issue(tracking=f'F-{i}', project_id=1, state='Fixed') for i in range(3)]
+        for issue in issues:
+            session.add(issue)
+            session.commit()
+        session.delete(issues[0])
+        session.commit()
+        assert self.stored(session) == {(1, 'Fixed', None): 2}
+        assert session.get_bind().execute('SELECT state, priority FROM project_issue_stats').fetchall() == [(3, None)]
+        assert check_stats(session) == []
+
+    def test_rolled_back_changes_dont_count(self, session):
+        from data.models import Issue
+        session.add(Issue(tracking='F-1', project_id=1, state='Unresolved', priority='Major'))
+        session.flush()
+        session.rollback()
+        assert self.stored(session) == {}
+
+    def test_check_and_rebuild(self, session):
+        from data.models import Issue, ProjectIssueStats
+        from data.issue_stats import check_stats, rebuild_stats, StatsMismatch
+        session.add_all([Issue(tracking='F-1', project_id=1, state='Unresolved', priority=None),
+                         Issue(tracking='S-1', project_id=2, state='Fixed', priority='Minor')])
+        session.commit()
+        session.query(ProjectIssueStats).filter(ProjectIssueStats.project_id == 1).update(
+            {'issue_count': 5}, synchronize_session=False)
+        session.commit()
+        assert check_stats(session) == [StatsMismatch((1, 'Unresolved', None), 5, 1)]
+        assert check_stats(session, project_id=2) == []
+
+        assert rebuild_stats(session, project_id=1) == 1
+        session.commit()
+        assert check_stats(session) == []
+        assert self.stored(session) == {(1, 'Unresolved', None): 1, (2, 'Fixed', 'Minor'): 1}
+
+    def test_manage_commands(self, tmp_path, capsys):
+        import manage
+        db_file = str(tmp_path / 'manage.sqlite')
+        assert manage.main(['--db', db_file, 'check-stats']) == 0
+        assert manage.main(['--db', db_file, 'rebuild-stats']) == 0
+        assert 'Rebuilt 0 rows' in capsys.readouterr().out
+
+    def test_stats_api(self):
+        result = testing_app.get(f'{CURRENT_API_VER}/project/stats/?API_KEY=OWJEAOOVSRRBVXTFLVNQVKJG&project_id=2')
+        assert result.status_code == 200
+        assert result.json['project_id'] == 2
+        assert result.json['total'] == sum(result.json['by_state'].values()) == 1
+        assert result.json['by_state_and_priority'] == [{'state': 'Fixed', 'priority': 'Major', 'count': 1}]
+
+    @pytest.mark.parametrize('api_key, project_id, status', [('OWJEAOOVSRRBVXTFLVNQVKJG', 3, 403),
+                                                             ('OWJEAOOVSRRBVXTFLVNQVKJG', -1, 404),
+                                                             ('WRONG', 2, 401)])
+    def test_stats_api_errors(self, api_key, project_id, status):
+        result = testing_app.get(f'{CURRENT_API_VER}/project/stats/?API_KEY={api_key}&project_id={project_id}')
+        assert result.status_code == status
+
+    def test_stats_on_project_page(self):
+        with logged_in_client(3) as client:
+            result = client.get('/projects/2')
+        assert b'By state:' in result.data and b'Fixed: 1' in result.data
+
+
+class TestIssueSearch:
+    """
+    This class checks FTS5 index of issues and search by it
+    """
+
+    @pytest.fixture
+    def session(self, tmp_path):
+        from data.models import Issue, Project, User
+        engine = db_session.create_engine(str(tmp_path / 'search.sqlite'))
+        db_session.upgrade_database(engine)
+        session = db_session.create_session_factory(engine)()
+        session.add_all([Project(id=1, project_name='First', short_project_tag='F', description=''),
+                         Project(id=2, project_name='Second', short_project_tag='S', description=''),
+                         User(id=1, username='member', hashed_password='')])
+        session.flush()
+        session.execute("INSERT INTO user_to_project (member_id, project_id, project_role) VALUES (1, 1, 'root')")
+        session.add_all([
+            Issue(id=1, tracking='F-1', project_id=1, summary='Crash on login', description='App crashes',
+                  steps_to_reproduce='Open login page'),
+            Issue(id=2, tracking='F-2', project_id=1, summary='Typo', description='Login <b>button</b> typo',
+                  steps_to_reproduce=''),
+            Issue(id=3, tracking='S-1', project_id=2, summary='Login crash in second project', description='',
+                  steps_to_reproduce=''),
+        ])
+        session.commit()
+        yield session
+        session.close()
+        engine.dispose()
+
+    def found(self, session, query, **kwargs) -> list:
+        from data.search import search_issues
+        return [result.tracking for result in search_issues(session, query, **kwargs)]
+
+    def test_index_follows_changes(self, session):
+        from data.models import Issue
+        assert set(self.found(session, 'crash')) == {'F-1', 'S-1'}
+        issue = session.query(Issue).get(2)
+        issue.summary = 'Crash of button'
+        issue.description = 'Fixed'
+        session.commit()
+        assert 'F-2' in self.found(session, 'crash')
+        # Old text is removed from index
+        assert self.found(session, 'typo') == []
+        session.delete(session.query(Issue).get(3))
+        session.commit()
+        assert set(self.found(session, 'crash')) == {'F-1', 'F-2'}
+
+    def test_scope_and_ranking(self, session):
+        # Member of the first project doesn't see issues of the second one
+        assert set(self.found(session, 'login', member_id=1)) == {'F-1', 'F-2'}
+        assert self.found(session, 'login crash', project_ids=[2]) == ['S-1']
+        assert self.found(session, 'login', project_ids=[]) == []
+        # Issue with both words in summary is more relevant
+        assert self.found(session, 'crash login')[0] in ('F-1', 'S-1')
+
+    def test_query_syntax_is_ignored(self, session):
+        assert self.found(session, 'login" OR NOT (') == []
+        assert self.found(session, '   ') == []
+        assert self.found(session, 'cras') != []
+
+    def test_snippet_is_escaped(self, session):
+        from data.search import search_issues
+        result = search_issues(session, 'button')[0]
+        assert '&lt;b&gt;<mark>button</mark>&lt;/b&gt;' in result.snippet
+
+    def test_search_api(self):
+        result = testing_app.get(f'{CURRENT_API_VER}/issues/search/?API_KEY=OWJEAOOVSRRBVXTFLVNQVKJG&q=test')
+        assert result.status_code == 200
+        # API_TEST_1 is member only of API_TEST_1 project
+        assert [issue['tracking'] for issue in result.json['issues']] == ['API1-1']
+        assert '<mark>' in result.json['issues'][0]['snippet']
+
+    @pytest.mark.parametrize('api_key, extra, status', [('OWJEAOOVSRRBVXTFLVNQVKJG', '&project_id=3', 403),
+                                                        ('OWJEAOOVSRRBVXTFLVNQVKJG', '&project_id=-1', 404),
+                                                        ('WRONG', '', 401)])
+    def test_search_api_errors(self, api_key, extra, status):
+        result = testing_app.get(f'{CURRENT_API_VER}/issues/search/?API_KEY={api_key}&q=test{extra}')
+        assert result.status_code == status
+
+    def test_search_box(self):
+        with logged_in_client(3) as client:
+            result = client.get('/projects/2/issues?q=testing')
+            assert b'<mark>TESTING</mark>' in result.data
+            assert b'Nothing found' in client.get('/projects/2/issues?q=unknownword').data
+
+
+class TestIssueFilters:
+    """
+    This class checks filters, sorting and keyset pages of project and user issue pages
+    """
+
+    @pytest.fixture
+    def session(self, tmp_path):
+        import datetime
+        from data.models import Issue, Project, User
+        engine = db_session.create_engine(str(tmp_path / 'filters.sqlite'))
+        db_session.upgrade_database(engine)
+        session = db_session.create_session_factory(engine)()
+        session.add_all([Project(id=1, project_name='First', short_project_tag='F', description=''),
+                         User(id=1, username='first', hashed_password=''),
+                         User(id=2, username='second', hashed_password='')])
+        session.flush()
+        states = ['Fixed', 'Unresolved', None, 'Rejected']
+        priorities = ['Major', 'Minor', 'Normal']
+        for number in range(1, 21):
+            session.add(Issue(id=number, tracking=f'F-{number}', project_id=1, summary=f'Issue {number}',
+                              state=states[number % 4], priority=priorities[number % 3],
+                              date_of_creation=datetime.datetime(2020, 1, number, 12)))
+            assignee = 1 if number % 2 else 2
+            session.execute(f'INSERT INTO user_to_issue (user_id, issue_id) VALUES ({assignee}, {number})')
+        session.commit()
+        yield session
+        session.close()
+        engine.dispose()
+
+    def all_pages(self, session, filters, limit=3) -> list:
+        from data.models import Issue
+        query = session.query(Issue).filter(Issue.project_id == 1)
+        ids, cursor = [], None
+        while True:
+            issues, cursor = filters.page(query, after=cursor, limit=limit)
+            ids += [issue.id for issue in issues]
+            if cursor is None:
+                return ids
+
+    @pytest.mark.parametrize('sort', ['newest', 'oldest', 'state', 'priority'])
+    def test_pages_follow_sort(self, session, sort):
+        from data.models import Issue, ISSUE_STATES, ISSUE_PRIORITIES
+        from data.issue_filters import IssueFilters
+        issues = session.query(Issue).all()
+        expected = {
+            'newest': sorted(issues, key=lambda issue: -issue.id),
+            'oldest': sorted(issues, key=lambda issue: issue.id),
+            # Sorted by codes, NULL state is the first
+            'state': sorted(issues, key=lambda issue: (ISSUE_STATES.index(issue.state) if issue.state else -1,
+                                                       issue.id)),
+            'priority': sorted(issues, key=lambda issue: (ISSUE_PRIORITIES.index(issue.priority), issue.id)),
+        }[sort]
+        assert self.all_pages(session, IssueFilters(sort=sort)) == [issue.id for issue in expected]
+
+    def test_filters(self, session):
+        import datetime
+        from data.issue_filters import IssueFilters
+        assert self.all_pages(session, IssueFilters(states=('Fixed', 'Rejected'), sort='oldest')) == [
+            number for number in range(1, 21) if number % 4 in (0, 3)]
+        assert self.all_pages(session, IssueFilters(priorities=('Major',), assignee_id=2, sort='oldest')) == [
+            6, 12, 18]
+        # Both dates are included
+        assert self.all_pages(session, IssueFilters(created_from=datetime.date(2020, 1, 5),
+                                                    created_to=datetime.date(2020, 1, 7))) == [7, 6, 5]
+
+    def test_args_round_trip(self):
+        from werkzeug.datastructures import MultiDict
+        from data.issue_filters import IssueFilters, BadFilter
+        args = MultiDict([('state', 'Fixed'), ('state', 'Rejected'), ('priority', ''), ('assignee', '2'),
+                          ('created_from', '2020-01-05'), ('sort', 'priority')])
+        filters = IssueFilters.from_args(args)
+        assert filters.states == ('Fixed', 'Rejected') and filters.priorities == () and filters.assignee_id == 2
+        assert IssueFilters.from_args(MultiDict(filters.to_args())) == filters
+        for bad in ({'sort': 'random'}, {'created_to': '01.01.2020'}, {'assignee': 'me'}):
+            with pytest.raises(BadFilter):
+                IssueFilters.from_args(MultiDict(bad))
+
+    @pytest.mark.parametrize('url', ['/projects/1/issues?state=Unresolved&sort=oldest',
+                                     '/profile/1/issues?priority=Critical&created_from=2020-04-17'])
+    def test_issue_pages(self, url):
+        with logged_in_client(1) as client:
+            result = client.get(url)
+        assert result.status_code == 200
+        assert b'Test-1' in result.data and b'API1-1' not in result.data
+
+    @pytest.mark.parametrize('args', ['cursor=broken', 'sort=random', 'created_to=tomorrow'])
+    def test_bad_arguments(self, args):
+        with logged_in_client(1) as client:
+            assert client.get(f'/projects/1/issues?{args}').status_code == 400
+
+
+class TestIssueCodes:
+    """
+    This class checks that state and priority of issues are stored as codes of lookup tables
+    """
+
+    @pytest.mark.parametrize('table, names', [('issue_states', 'ISSUE_STATES'),
+                                              ('issue_priorities', 'ISSUE_PRIORITIES')])
+    def test_lookup_tables(self, tmp_path, table, names):
+        from data import models
+        engine = db_session.create_engine(str(tmp_path / 'new.sqlite'))
+        db_session.upgrade_database(engine)
+        expected = list(enumerate(getattr(models, names), 1))
+        # Filled by migration in existing database and by create_all in new one
+        for checked in (db_session.get_engine(), engine):
+            assert [tuple(row) for row in checked.execute(f'SELECT code, name FROM {table} ORDER BY code')] == expected
+        engine.dispose()
+
+    def test_migration_converts_stats(self, tmp_path):
+        """
+        Creates database of revision before codes with statistics of names, upgrades it to the head and back
+        :return: None
+        """
+        from alembic import command
+        from alembic.config import Config
+
+        engine = sqlalchemy.create_engine(f'sqlite:///{tmp_path / "names.sqlite"}')
+        config = Config()
+        config.set_main_option('script_location', db_session.MIGRATIONS_DIR)
+        stats = 'SELECT project_id, state, priority, issue_count FROM project_issue_stats ORDER BY 2, 3'
+        with engine.begin() as connection:
+            config.attributes['connection'] = connection
+            command.upgrade(config, '9b4f1e7a2c36')
+            connection.execute("INSERT INTO projects (id, project_name) VALUES (1, 'Legacy')")
+            connection.execute("INSERT INTO project_issue_stats (project_id, state, priority, issue_count) VALUES "
+                               "(1, 'Fixed', 'Major', 2), (1, 'Unresolved', '', 1), (1, 'Fixed', 'Urgent', 1)")
+            # Statistics are converted by their own revision, so databases stamped at 4d8a6c0b5e21 get it too
+            command.upgrade(config, '4d8a6c0b5e21')
+            assert len(connection.execute(stats).fetchall()) == 3
+            command.upgrade(config, 'head')
+            assert connection.execute(stats).fetchall() == [(1, 1, None, 1), (1, 3, 2, 2), (1, 3, 5, 1)]
+            assert connection.execute(
+                'SELECT COUNT(*) FROM project_issue_stats JOIN issue_states ON code = state').scalar() == 3
+            command.downgrade(config, '9b4f1e7a2c36')
+            assert connection.execute(stats).fetchall() == [(1, 'Fixed', 'Major', 2), (1, 'Fixed', 'Urgent', 1),
+                                                            (1, 'Unresolved', '', 1)]
+        engine.dispose()
+
+    def test_migration_keeps_custom_priorities(self, tmp_path):
+        """
+        Creates database of revision before codes with priorities that are not default ones, upgrades it and back
+        :return: None
+        """
+        from alembic import command
+        from alembic.config import Config
+
+        engine = sqlalchemy.create_engine(f'sqlite:///{tmp_path / "custom.sqlite"}')
+        config = Config()
+        config.set_main_option('script_location', db_session.MIGRATIONS_DIR)
+        issues = 'SELECT tracking, priority FROM issues ORDER BY id'
+        with engine.begin() as connection:
+            config.attributes['connection'] = connection
+            command.upgrade(config, '9b4f1e7a2c36')
+            connection.execute("INSERT INTO projects (id, project_name) VALUES (1, 'Legacy')")
+            connection.execute("INSERT INTO priority_to_project (project_id, priority) VALUES "
+                               "(1, 'Major'), (1, 'Trivial'), (1, 'Blocker')")
+            connection.execute("INSERT INTO issues (id, tracking, project_id, state, priority) VALUES "
+                               "(1, 'L-1', 1, 'Fixed', 'Blocker'), (2, 'L-2', 1, 'Fixed', 'Major'), "
+                               "(3, 'L-3', 1, 'Fixed', 'Trivial')")
+            command.upgrade(config, 'head')
+            assert connection.execute('SELECT code, name FROM issue_priorities WHERE code > 4').fetchall() == [
+                (5, 'Blocker'), (6, 'Trivial')]
+            assert connection.execute(issues).fetchall() == [('L-1', 5), ('L-2', 2), ('L-3', 6)]
+            command.downgrade(config, '9b4f1e7a2c36')
+            assert connection.execute(issues).fetchall() == [('L-1', 'Blocker'), ('L-2', 'Major'), ('L-3', 'Trivial')]
+            assert {row[0] for row in connection.execute('SELECT priority FROM priority_to_project')} == {
+                'Major', 'Trivial', 'Blocker'}
+        engine.dispose()
+
+    def test_custom_priorities(self, tmp_path, monkeypatch):
+        from data.models import Issue, Project
+        from data.issue_stats import check_stats, project_stats
+        engine = db_session.create_engine(str(tmp_path / 'custom.sqlite'))
+        db_session.upgrade_database(engine)
+        session = db_session.create_session_factory(engine)()
+        session.add_all([Project(id=1, project_name='Custom', short_project_tag='C', description=''),
+                         Project(id=2, project_name='Other', short_project_tag='O', description='')])
+        session.commit()
+        monkeypatch.setattr('data.models.get_session', lambda: session)
+        session.query(Project).get(1).add_project_priorities(('Major', 'Blocker', 'Trivial'))
+        # The same name isn't given the second code
+        session.query(Project).get(2).add_project_priorities(('Trivial', ))
+        assert [tuple(row) for row in session.query(Project).get(2).get_project_priorities()] == [('Trivial', )]
+        session.add_all([Issue(id=1, tracking='C-1', project_id=1, state='Fixed', priority='Blocker'),
+                         Issue(id=2, tracking='C-2', project_id=1, state='Fixed', priority='Major'),
+                         Issue(id=3, tracking='C-3', project_id=1, state='Fixed', priority='Trivial')])
+        session.commit()
+        assert [row[0] for row in session.execute('SELECT priority FROM issues ORDER BY id')] == [5, 2, 6]
+        assert [issue.tracking for issue in session.query(Issue).order_by(Issue.priority)] == ['C-2', 'C-1', 'C-3']
+        assert session.query(Issue.id).filter(Issue.priority == 'Blocker').scalar() == 1
+        assert project_stats(session, 1)['by_priority'] == {'Major': 1, 'Blocker': 1, 'Trivial': 1}
+        assert check_stats(session, 1) == []
+        session.close()
+        engine.dispose()
+
+    def test_codes_are_stored(self):
+        from data.models import Issue
+        rows = db_session.get_engine().execute(
+            "SELECT typeof(state), typeof(priority), state FROM issues WHERE tracking = 'Test-1'").fetchall()
+        assert rows == [('integer', 'integer', 1)]
+        with app.app_context():
+            issue = db_session.get_session().query(Issue).filter(Issue.state == 'Unresolved').one()
+            assert (issue.tracking, issue.state, issue.priority) == ('Test-1', 'Unresolved', 'Critical')
+
+    def test_unknown_name_is_not_saved(self, tmp_path):
+        from data.models import Issue
+        engine = db_session.create_engine(str(tmp_path / 'codes.sqlite'))
+        db_session.upgrade_database(engine)
+        session = db_session.create_session_factory(engine)()
+        session.add(Issue(tracking='F-1', state='Postponed'))
+        with pytest.raises(sqlalchemy.exc.StatementError):
+            session.commit()
+        session.close()
+        engine.dispose()
+
+    def test_state_and_priority_filter_is_index_only(self):
+        from data.models import Issue
+        query = orm.Session().query(sqlalchemy.func.count(Issue.id)).filter(
+            Issue.project_id == 1, Issue.state == 'Fixed', Issue.priority == 'Major')
+        compiled = query.statement.compile(dialect=db_session.get_engine().dialect)
+        plan = [row[-1] for row in db_session.get_engine().execute(
+            f'EXPLAIN QUERY PLAN {compiled}', [compiled.params[name] for name in compiled.positiontup])]
+        # Code of priority is selected once by unique name of lookup table
+        assert plan == ['SEARCH issues USING COVERING INDEX ix_issues_project_id_state_priority '
+                        '(project_id=? AND state=? AND priority=?)',
+                        'SCALAR SUBQUERY 1',
+                        'SEARCH issue_priorities USING INDEX sqlite_autoindex_issue_priorities_2 (name=?)']
+
+    @pytest.mark.parametrize('state, priority', [('Postponed', 'Major'), ('Fixed', 'Blocker')])
+    def test_api_rejects_unknown_names(self, state, priority):
+        result = testing_app.post(f'{CURRENT_API_VER}/issue/?API_KEY=OWJEAOOVSRRBVXTFLVNQVKJG&project_id=2'
+                                  f'&summary=s&steps_to_reproduce=s&description=d&state={state}&priority={priority}')
+        assert result.status_code == 400
+
+    @pytest.mark.parametrize('args', ['state=Postponed', 'priority=Blocker',
+                                      'sort=state&cursor=WyJNYWpvciIsIDFd'])
+    def test_pages_reject_unknown_names(self, args):
+        with logged_in_client(1) as client:
+            assert client.get(f'/projects/1/issues?{args}').status_code == 400
+
+
+class TestIssueQuery:
+    """
+    This class checks query language of saved searches, saved searches pages and API
+    """
+
+    @pytest.fixture
+    def session(self, tmp_path):
+        import datetime
+        from data.models import Issue, Project, User
+        engine = db_session.create_engine(str(tmp_path / 'query.sqlite'))
+        db_session.upgrade_database(engine)
+        session = db_session.create_session_factory(engine)()
+        session.add_all([Project(id=1, project_name='First', short_project_tag='F', description=''),
+                         Project(id=2, project_name='Second', short_project_tag='S', description=''),
+                         User(id=1, username='first', hashed_password=''),
+                         User(id=2, username='second', hashed_password='')])
+        session.flush()
+        session.execute("INSERT INTO user_to_project (member_id, project_id, project_role) VALUES (1, 1, 'root')")
+        session.add_all([
+            Issue(id=1, tracking='F-1', project_id=1, state='Unresolved', priority='Critical', summary='Login crash',
+                  date_of_creation=datetime.datetime(2020, 1, 10, 12)),
+            Issue(id=2, tracking='F-2', project_id=1, state='Unresolved', priority='Minor', summary='Typo',
+                  date_of_creation=datetime.datetime(2020, 1, 1, 12)),
+            Issue(id=3, tracking='F-3', project_id=1, state='Fixed', priority='Critical', summary='Crash on start',
+                  date_of_creation=datetime.datetime(2020, 1, 9, 12)),
+            Issue(id=4, tracking='S-1', project_id=2, state='Unresolved', priority='Critical', summary='Crash',
+                  date_of_creation=datetime.datetime(2020, 1, 10, 12)),
+        ])
+        session.flush()
+        session.execute('INSERT INTO user_to_issue (user_id, issue_id) VALUES (1, 1), (2, 2), (1, 3), (2, 4)')
+        session.commit()
+        yield session
+        session.close()
+        engine.dispose()
+
+    def found(self, session, source, user_id=1, **kwargs) -> list:
+        import datetime
+        from data.models import Issue
+        from data.issue_query import compile_query
+        query = compile_query(source).apply(session.query(Issue.tracking), user_id,
+                                            now=datetime.datetime(2020, 1, 11))
+        return sorted(row.tracking for row in query)
+
+    @pytest.mark.parametrize('source, expected', [
+        ('state:unresolved priority:Critical', ['F-1', 'S-1']),
+        ('state:Fixed,Unresolved priority:Minor', ['F-2']),
+        ('assignee:me', ['F-1', 'F-3']),
+        ('assignee:second project:F', ['F-2']),
+        ('created:>3d', ['F-1', 'F-3', 'S-1']),
+        ('created:<=2020-01-09', ['F-2', 'F-3']),
+        ('created:>2020-01-09 created:>2w', ['F-1', 'S-1']),
+        ('created:<1w', ['F-2']),
+        ('crash text:login', ['F-1']),
+        ('state:Unresolved priority:Critical assignee:me created:>7d text:"crash"', ['F-1']),
+    ])
+    def test_query_semantics(self, session, source, expected):
+        assert self.found(session, source) == expected
+
+    @pytest.mark.parametrize('source', ['', 'state:Postponed', 'color:red', 'created:7d', 'created:>2020-13-01',
+                                        'sort:random', 'text:"unclosed', 'state:'])
+    def test_syntax_errors(self, source):
+        from data.issue_query import compile_query, QuerySyntaxError
+        with pytest.raises(QuerySyntaxError):
+            compile_query(source)
+
+    def test_compiled_once(self, session):
+        from data.issue_query import compile_query
+        source = 'assignee:me created:>7d sort:oldest'
+        assert compile_query(source) is compile_query(source)
+        assert compile_query(source).sort == 'oldest'
+        # Parameters of cached query are filled on every run
+        assert self.found(session, source, user_id=2) == ['S-1']
+        assert self.found(session, source, user_id=1) == ['F-1', 'F-3']
+
+    def test_visible_issues(self, session):
+        from data.models import Issue, User
+        from data.issue_query import visible_issues
+        member = session.query(User).get(1)
+        found = visible_issues(session.query(Issue.tracking).filter(Issue.state == 'Unresolved'), member)
+        assert sorted(row.tracking for row in found) == ['F-1', 'F-2']
+
+    def test_record_run(self, session):
+        from data.models import SavedSearch
+        from data.issue_query import record_run
+        saved_search = SavedSearch(owner_id=1, name='Crashes', query='crash')
+        session.add(saved_search)
+        session.commit()
+        for elapsed_ms in (10, 30, 20):
+            record_run(session, saved_search.id, elapsed_ms)
+        session.commit()
+        session.refresh(saved_search)
+        assert (saved_search.run_count, saved_search.max_ms, saved_search.last_ms) == (3, 30, 20)
+        assert saved_search.average_ms == 20
+
+    @pytest.fixture
+    def cleanup(self):
+        yield
+        from data.models import SavedSearch
+        engine = db_session.get_engine()
+        engine.execute(SavedSearch.__table__.delete())
+
+    def test_saved_search_pages(self, cleanup, monkeypatch):
+        from data.models import SavedSearch
+        monkeypatch.setitem(app.config, 'WTF_CSRF_ENABLED', False)
+        with logged_in_client(3) as client:
+            result = client.post('/searches', data={'name': 'Bad', 'query': 'state:Postponed'})
+            assert b'Unknown state Postponed' in result.data
+            assert client.post('/searches', data={'name': 'Mine', 'query': 'state:Fixed assignee:me'}).status_code == 302
+            search_id = db_session.get_engine().execute(
+                f"SELECT id FROM {SavedSearch.__tablename__} WHERE name = 'Mine'").scalar()
+            result = client.get(f'/searches/{search_id}')
+            assert result.status_code == 200 and b'ISSUE FOR API TESTING' in result.data
+            assert b'>1<' in client.get('/searches').data
+        with logged_in_client(4) as client:
+            assert client.get(f'/searches/{search_id}').status_code == 403
+            assert client.post(f'/searches/{search_id}/delete').status_code == 403
+        with logged_in_client(3) as client:
+            assert client.post(f'/searches/{search_id}/delete').status_code == 302
+            assert client.get(f'/searches/{search_id}').status_code == 404
+
+    def test_saved_search_api(self, cleanup):
+        url = f'{CURRENT_API_VER}/searches/?API_KEY={FIRST_TEST_ACCOUNT_API_KEY}'
+        assert testing_app.post(f'{url}&name=Bad&query=color:red').status_code == 400
+        result = testing_app.post(f'{url}&name=Mine&query=priority:Major')
+        assert result.status_code == 200
+        search_id = result.json['search_id']
+
+        result = testing_app.get(f'{url}&search_id={search_id}')
+        assert result.status_code == 200
+        # API_TEST_1 sees only issues of API_TEST_1 project
+        assert [issue['tracking'] for issue in result.json['issues']] == ['API1-1']
+        assert result.json['elapsed_ms'] >= 0
+        searches = testing_app.get(url).json['searches']
+        assert [(search['name'], search['run_count']) for search in searches] == [('Mine', 1)]
+
+        # Query without saving isn't recorded
+        result = testing_app.get(f'{url}&query=priority:Minor')
+        assert result.json['issues'] == []
+        assert testing_app.get(f'{url}&query=priority:Minor&after=broken').status_code == 400
+        other = f'{CURRENT_API_VER}/searches/?API_KEY={SECOND_TEST_ACCOUNT_API_KEY}&search_id={search_id}'
+        assert testing_app.get(other).status_code == 403
+        assert testing_app.delete(other).status_code == 403
+        assert testing_app.delete(f'{url}&search_id={search_id}').status_code == 200
+        assert testing_app.get(f'{url}&search_id={search_id}').status_code == 404
+
+
+    @pytest.mark.parametrize('source, expected', [('sort:priority', ['F-1', 'F-3', 'F-2']),
+                                                  ('sort:newest', ['F-3', 'F-2', 'F-1']),
+                                                  ('state:Unresolved sort:oldest', ['F-1', 'F-2'])])
+    def test_api_follows_sort(self, session, monkeypatch, source, expected):
+        from urllib.parse import quote
+        from api.auth import api_key_cache
+        from data.models import Issue, User
+        from data.issue_filters import IssueFilters
+        from data.issue_query import compile_query
+        session.query(User).get(1).API_KEY = 'QUERY_SORT_KEY'
+        session.commit()
+        monkeypatch.setattr(db_session, 'get_session', lambda: session)
+        url = f'{CURRENT_API_VER}/searches/?API_KEY=QUERY_SORT_KEY&query={quote(source)}&limit=1'
+        found, cursor = [], ''
+        while cursor is not None:
+            result = testing_app.get(f'{url}&after={cursor}' if cursor else url)
+            assert result.status_code == 200
+            found += [issue['tracking'] for issue in result.json['issues']]
+            cursor = result.json['next_cursor']
+        api_key_cache.clear()
+        assert found == expected
+        # The same order as on saved search page
+        compiled = compile_query(source)
+        issues, _ = IssueFilters(sort=compiled.sort).page(compiled.apply(
+            session.query(Issue).filter(Issue.project_id == 1), 1))
+        assert [issue.tracking for issue in issues] == expected
+
+
+class TestBatchResources:
+    """
+    This class checks batch resources: items equal to resources of one entity, per-item status and query count
+    """
+
+    def get(self, path: str, api_key: str = FIRST_TEST_ACCOUNT_API_KEY):
+        return testing_app.get(f'{CURRENT_API_VER}/{path}&API_KEY={api_key}')
+
+    @pytest.mark.parametrize('batch, single, entity', [
+        ('issues/batch/?tags=API1-1', 'issue/?tag=API1-1', 'issue'),
+        ('projects/batch/?ids=2', 'project/?project_id=2', 'project'),
+        ('users/batch/?ids=3', 'user/?user_id=3', 'user'),
+    ])
+    def test_item_equals_single_resource(self, batch, single, entity):
+        items = self.get(batch).json[f'{entity}s']
+        assert list(items.values()) == [{'status': 200, entity: self.get(single).json[entity]}]
+
+    def test_per_item_status(self):
+        items = self.get('issues/batch/?tags=API1-1,API2-1&tags=NOPE,API1-1').json['issues']
+        assert {tag: item['status'] for tag, item in items.items()} == {'API1-1': 200, 'API2-1': 403, 'NOPE': 404}
+        items = self.get('projects/batch/?ids=2,3,-1,x').json['projects']
+        assert {key: item['status'] for key, item in items.items()} == {'2': 200, '3': 403, '-1': 404, 'x': 400}
+        # Admin sees every project
+        items = self.get('projects/batch/?ids=1,2,3', 'DRWLFSSZOHTTFBFIUDJVPKXD').json['projects']
+        assert [item['status'] for item in items.values()] == [200, 200, 200]
+
+    @pytest.mark.parametrize('path, queries', [('issues/batch/?tags=API1-1,API2-1,Test-1,NOPE', 2),
+                                               ('projects/batch/?ids=1,2,3', 4),
+                                               ('users/batch/?ids=1,2,3,4', 1)])
+    def test_queries_dont_depend_on_count(self, path, queries):
+        # API key owner is cached by the first request
+        self.get(path)
+        with count_queries() as statements:
+            result = self.get(path)
+        assert result.status_code == 200
+        assert len(statements) == queries
+
+    def test_bad_requests(self, monkeypatch):
+        from api import resources
+        assert self.get('issues/batch/?tags=').status_code == 400
+        assert self.get('users/batch/?ids=1', 'WRONG').status_code == 401
+        monkeypatch.setattr(resources, 'MAX_BATCH_SIZE', 2)
+        assert self.get('users/batch/?ids=1,2,3').status_code == 400
+
+
+class TestIssueBulk:
+    """
+    This class checks bulk creation and change of issues: per-item results, statistics and count of statements
+    """
+
+    @pytest.fixture
+    def session(self, tmp_path, monkeypatch):
+        """
+        Separate database used by API requests too, so created issues don't get into test database
+        """
+        from api import auth
+        from data.models import Issue, Project, User
+        engine = db_session.create_engine(str(tmp_path / 'bulk.sqlite'))
+        db_session.upgrade_database(engine)
+        session = db_session.create_session_factory(engine)()
+        session.add_all([Project(id=1, project_name='First', short_project_tag='F', description=''),
+                         Project(id=2, project_name='Second', short_project_tag='S', description=''),
+                         User(id=1, username='first', hashed_password='', API_KEY='FIRST_KEY'),
+                         User(id=2, username='second', hashed_password='', API_KEY='SECOND_KEY')])
+        session.flush()
+        session.execute("INSERT INTO user_to_project (member_id, project_id, project_role) VALUES "
+                        "(1, 1, 'root'), (2, 1, 'member'), (2, 2, 'root')")
+        session.execute("INSERT INTO priority_to_project (project_id, priority) VALUES "
+                        "(1, 2), (1, 3), (2, 1), (2, 2)")
+        session.add(Issue(id=1, tracking='S-1', project_id=2, state='Unresolved', priority='Critical',
+                          summary='Other project', description='', steps_to_reproduce=''))
+        session.commit()
+        auth.api_key_cache.clear()
+        monkeypatch.setattr(db_session, 'get_session', lambda: session)
+        yield session
+        auth.api_key_cache.clear()
+        session.close()
+        engine.dispose()
+
+    @staticmethod
+    def new_issue(number: int, **fields) -> dict:
+        return {'summary': f'Imported {number}', 'description': 'From old tracker', 'steps_to_reproduce': 'None',
+                'state': 'Unresolved', 'priority': 'Major', **fields}
+
+    def test_create_issues(self, session):
+        from data.issue_bulk import create_issues
+        from data.issue_stats import check_stats
+        from data.models import Issue, Project
+        project = session.query(Project).get(1)
+        items = [self.new_issue(1), self.new_issue(2, priority='Critical'), 'issue', self.new_issue(3, summary=''),
+                 self.new_issue(4, state='Fixed', priority='Minor')]
+        results = create_issues(session, project, items, 1)
+        session.commit()
+        assert [result['status'] for result in results] == [200, 400, 400, 400, 200]
+        assert [result.get('tag') for result in results] == ['F-1', None, None, None, 'F-2']
+        assert 'summary' in results[3]['message']
+        issues = session.query(Issue).filter(Issue.project_id == 1).order_by(Issue.id).all()
+        assert [(issue.tracking, issue.state, issue.priority) for issue in issues] == [
+            ('F-1', 'Unresolved', 'Major'), ('F-2', 'Fixed', 'Minor')]
+        assert [issue.assign_on() for issue in issues] == ['first', 'first']
+        assert [issue.project_name() for issue in issues] == ['First', 'First']
+        assert project.next_issue_number == 3
+        assert check_stats(session) == []
+
+    def test_statements_dont_depend_on_count(self, session):
+        from data.issue_bulk import create_issues
+        from data.models import Project
+        project = session.query(Project).get(1)
+        counts = []
+        for count in (1, 200):
+            with count_queries(session.get_bind()) as statements:
+                create_issues(session, project, [self.new_issue(number) for number in range(count)], 1)
+            counts.append(len(statements))
+        session.commit()
+        assert counts[0] == counts[1] > 0
+
+    def test_update_issues(self, session):
+        from data.issue_bulk import create_issues, select_targets, target_query, update_issues
+        from data.issue_stats import check_stats
+        from data.models import Issue, Project, User
+        create_issues(session, session.query(Project).get(1), [self.new_issue(number) for number in range(3)], 1)
+        targets = select_targets(target_query(session).order_by(Issue.id))
+        results = update_issues(session, targets, {'state': 'Fixed', 'priority': 'Minor'})
+        session.commit()
+        # Minor is not a priority of project S
+        assert {tag: result['status'] for tag, result in results.items()} == {
+            'S-1': 400, 'F-1': 200, 'F-2': 200, 'F-3': 200}
+        assert {(issue.tracking, issue.state, issue.priority) for issue in session.query(Issue)} == {
+            ('S-1', 'Unresolved', 'Critical'), ('F-1', 'Fixed', 'Minor'), ('F-2', 'Fixed', 'Minor'),
+            ('F-3', 'Fixed', 'Minor')}
+        assert check_stats(session) == []
+
+        results = update_issues(session, targets, {'assignee': 'second'}, session.query(User).get(2))
+        session.commit()
+        assert [result['status'] for result in results.values()] == [200] * 4
+        assert {issue.assign_on() for issue in session.query(Issue)} == {'second'}
+
+    def test_bulk_api(self, session):
+        from data.issue_stats import check_stats
+        from data.models import Issue
+        result = testing_app.post(f'{CURRENT_API_VER}/issues/bulk/?API_KEY=FIRST_KEY', json={
+            'project_id': 1, 'issues': [self.new_issue(1), self.new_issue(2, state='Postponed'), 'issue', None]})
+        assert result.status_code == 200
+        assert result.json['created'] == 1
+        assert [item['status'] for item in result.json['issues']] == [200, 400, 400, 400]
+        assert result.json['issues'][2]['message'] == 'Issue must be an object'
+
+        result = testing_app.patch(f'{CURRENT_API_VER}/issues/bulk/?API_KEY=FIRST_KEY', json={
+            'tags': ['F-1', 'S-1', 'NOPE'], 'changes': {'state': 'Fixed'}})
+        assert {tag: item['status'] for tag, item in result.json['issues'].items()} == {
+            'F-1': 200, 'S-1': 403, 'NOPE': 404}
+        result = testing_app.patch(f'{CURRENT_API_VER}/issues/bulk/?API_KEY=SECOND_KEY', json={
+            'query': 'state:Unresolved', 'changes': {'priority': 'Major', 'assignee': 'second'}})
+        assert result.json['issues'] == {'S-1': {'status': 200}}
+        assert session.query(Issue.state).filter(Issue.tracking == 'F-1').scalar() == 'Fixed'
+        assert session.query(Issue.priority).filter(Issue.tracking == 'S-1').scalar() == 'Major'
+        assert check_stats(session) == []
+
+    @pytest.mark.parametrize('method, body, api_key, status', [
+        ('post', {'project_id': 1, 'issues': []}, 'FIRST_KEY', 400),
+        ('post', {'issues': [{}]}, 'FIRST_KEY', 400),
+        ('post', {'project_id': 1, 'issues': {'summary': 'Not a list'}}, 'FIRST_KEY', 400),
+        ('post', {'project_id': 2, 'issues': [{}]}, 'FIRST_KEY', 403),
+        ('post', {'project_id': 5, 'issues': [{}]}, 'FIRST_KEY', 404),
+        ('post', {'project_id': 1, 'issues': [{}]}, 'WRONG', 401),
+        ('patch', {'tags': ['S-1'], 'query': 'state:Fixed', 'changes': {'state': 'Fixed'}}, 'SECOND_KEY', 400),
+        ('patch', {'tags': ['S-1'], 'changes': {'state': 'Postponed'}}, 'SECOND_KEY', 400),
+        ('patch', {'tags': ['S-1'], 'changes': {'title': 'New'}}, 'SECOND_KEY', 400),
+        ('patch', {'query': 'state:', 'changes': {'state': 'Fixed'}}, 'SECOND_KEY', 400),
+        ('patch', {'tags': ['S-1'], 'changes': {'assignee': 'nobody'}}, 'SECOND_KEY', 404),
+    ])
+    def test_bad_requests(self, session, method, body, api_key, status):
+        from data.models import Issue
+        result = getattr(testing_app, method)(f'{CURRENT_API_VER}/issues/bulk/?API_KEY={api_key}', json=body)
+        assert result.status_code == status
+        # Nothing is changed by wrong request
+        assert session.query(Issue.tracking, Issue.state).all() == [('S-1', 'Unresolved')]
+
+    @pytest.mark.parametrize('profile', ['default', 'production'])
+    def test_concurrent_inserts_get_unique_ids(self, tmp_path, profile):
+        """
+        Bulk inserts of several threads with explicit ids and ORM inserts between them don't conflict
+        :return: None
+        """
+        import threading
+        from data.issue_bulk import insert_issues
+        from data.models import Issue, Project
+        engine = db_session.create_engine(str(tmp_path / 'concurrent.sqlite'), profile)
+        db_session.upgrade_database(engine)
+        factory = db_session.create_session_factory(engine, profile)
+        session = factory()
+        session.add(Project(id=1, project_name='First', short_project_tag='F', description=''))
+        session.commit()
+        session.close()
+
+        errors = []
+        start = threading.Barrier(6)
+
+        def write(number):
+            thread_session = factory()
+            start.wait()
+            try:
+                for _ in range(10):
+                    if number % 2:
+                        insert_issues(thread_session, 1, 'F', [self.new_issue(i) for i in range(20)])
+                    else:
+                        tracking = thread_session.query(Project).get(1).next_issue_tracking()
+                        thread_session.add(Issue(tracking=tracking, summary='ORM', project_id=1))
+                    thread_session.commit()
+            except Exception as error:
+                errors.append(error)
+            finally:
+                thread_session.close()
+
+        threads = [threading.Thread(target=write, args=(number,)) for number in range(6)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        session = factory()
+        assert not errors
+        assert session.query(Issue).count() == 3 * 10 * 20 + 3 * 10
+        assert session.query(Issue.tracking).distinct().count() == session.query(Issue).count()
+        session.close()
+        engine.dispose()
+
+    def test_too_many_issues(self, session, monkeypatch):
+        from api import resources
+        monkeypatch.setattr(resources, 'MAX_BULK_SIZE', 1)
+        result = testing_app.post(f'{CURRENT_API_VER}/issues/bulk/?API_KEY=FIRST_KEY', json={
+            'project_id': 1, 'issues': [self.new_issue(1), self.new_issue(2)]})
+        assert result.status_code == 400
+
+
+class TestTransfer:
+    """
+    This class checks streaming import and export of projects, members and issues(see data.transfer and manage.py)
+    """
+    RECORDS = [
+        {'type': 'project', 'project_name': 'Imported', 'short_project_tag': 'IMP', 'description': 'From JSONL',
+         'priorities': ['Critical', 'Minor'], 'subsystems': ['UI']},
+        {'type': 'member', 'project': 'IMP', 'username': 'alice', 'role': 'root'},
+        {'type': 'member', 'project': 'IMP', 'username': 'bob'},
+        {'type': 'member', 'project': 'NOPE', 'username': 'bob'},
+        {'type': 'issue', 'project': 'IMP', 'summary': 'First', 'description': 'Crash', 'steps_to_reproduce': 'Run',
+         'state': 'Unresolved', 'priority': 'Critical', 'date_of_creation': '2020-01-31T12:00:00',
+         'assignees': ['alice', 'bob']},
+        {'type': 'issue', 'project': 'IMP', 'summary': 'Second', 'description': 'Typo', 'steps_to_reproduce': 'Read',
+         'state': 'Fixed', 'priority': 'Major', 'assignees': []},
+        {'type': 'issue', 'project': 'IMP', 'summary': 'Third', 'description': 'Slow', 'steps_to_reproduce': 'Wait',
+         'state': 'Fixed', 'priority': 'Minor', 'assignees': ['carol']},
+        {'type': 'issue', 'project': 'IMP', 'summary': 'Fourth', 'description': 'Hang', 'steps_to_reproduce': 'Wait',
+         'state': 'Fixed', 'priority': 'Minor', 'assignees': ['bob']},
+    ]
+
+    @staticmethod
+    def open_session(db_file):
+        engine = db_session.create_engine(db_file)
+        db_session.upgrade_database(engine)
+        return db_session.create_session_factory(engine)()
+
+    def write_jsonl(self, path, records) -> str:
+        with open(path, 'w') as file:
+            file.write('\n'.join(json.dumps(record) for record in records) + '\nnot json\n')
+        return str(path)
+
+    def test_import_and_export(self, tmp_path, capsys):
+        import manage
+        from data.issue_stats import check_stats
+        from data.models import Issue, Project
+        db_file = str(tmp_path / 'import.sqlite')
+        source = self.write_jsonl(tmp_path / 'source.jsonl', self.RECORDS)
+        # Small chunks, so records of one project are imported by different transactions
+        assert manage.main(['--db', db_file, 'import', source, '--chunk-size', '3']) == 1
+        errors = capsys.readouterr().err
+        # Unknown project, priority Major is not used in project, unknown assignee and bad JSON
+        assert sorted(line.split(': ', 1)[0] for line in errors.splitlines() if line.startswith(source)) == [
+            f'{source}:4', f'{source}:6', f'{source}:7', f'{source}:9']
+        assert 'Imported 5 rows' in errors and '4 records rejected' in errors
+
+        session = self.open_session(db_file)
+        project = session.query(Project).filter(Project.short_project_tag == 'IMP').one()
+        assert project.root_user.username == 'alice'
+        issues = session.query(Issue).order_by(Issue.id).all()
+        assert [(issue.tracking, issue.summary) for issue in issues] == [('IMP-1', 'First'), ('IMP-2', 'Fourth')]
+        assert str(issues[0].date_of_creation) == '2020-01-31 12:00:00'
+        assert check_stats(session) == []
+        session.close()
+
+        exported = str(tmp_path / 'export.jsonl')
+        assert manage.main(['--db', db_file, 'export', 'IMP', '--output', exported, '--chunk-size', '1']) == 0
+        with open(exported) as file:
+            records = [json.loads(line) for line in file]
+        assert [record['type'] for record in records] == ['project', 'member', 'member', 'issue', 'issue']
+        assert records[0]['priorities'] == ['Critical', 'Minor'] and records[0]['subsystems'] == ['UI']
+        assert records[3]['assignees'] == ['alice', 'bob'] and records[4]['tracking'] == 'IMP-2'
+
+        # Exported file is imported back without changes
+        copy_file = str(tmp_path / 'copy.sqlite')
+        assert manage.main(['--db', copy_file, 'import', exported]) == 0
+        assert manage.main(['--db', copy_file, 'export', 'IMP', '--output', str(tmp_path / 'copy.jsonl')]) == 0
+        with open(tmp_path / 'copy.jsonl') as file:
+            assert [json.loads(line) for line in file] == records
+
+    def test_import_csv(self, tmp_path, capsys):
+        import manage
+        from data.issue_bulk import project_priorities
+        from data.models import Project
+        source = tmp_path / 'projects.csv'
+        source.write_text('project_name,short_project_tag,description,priorities,subsystems\n'
+                          'First,F,,Critical;Blocker,UI;API\n'
+                          'Second,F,,,\n')
+        db_file = str(tmp_path / 'csv.sqlite')
+        assert manage.main(['--db', db_file, 'import', str(source)]) == 2
+        assert manage.main(['--db', db_file, 'import', str(source), '--type', 'project']) == 1
+        assert f'{source}:3: Project Second or tag F already exists' in capsys.readouterr().err
+        session = self.open_session(db_file)
+        project = session.query(Project).one()
+        assert sorted(row[0] for row in session.execute(
+            'SELECT subsystem FROM subsystems_to_project WHERE project_id = :id', {'id': project.id})) == ['API', 'UI']
+        # Priority that isn't a default one gets the next code
+        assert project_priorities(session, [project.id])[project.id] == ['Critical', 'Blocker']
+        session.close()
+
+    def test_import_member_roles(self, tmp_path, capsys):
+        import manage
+        from data.models import Project, User
+        source = self.write_jsonl(tmp_path / 'members.jsonl', [
+            self.RECORDS[0],
+            {'type': 'member', 'project': 'IMP', 'username': 'alice', 'role': 'admin'},
+            {'type': 'member', 'project': 'IMP', 'username': 'bob', 'role': 'root'},
+            {'type': 'member', 'project': 'IMP', 'username': 'carol', 'role': 'root'},
+            {'type': 'member', 'project': 'IMP', 'username': 'bob', 'role': 'root'},
+            {'type': 'member', 'project': 'IMP', 'username': 'dave', 'role': 'manager'},
+        ])
+        db_file = str(tmp_path / 'members.sqlite')
+        # Second root is rejected in the next chunk too
+        assert manage.main(['--db', db_file, 'import', source, '--chunk-size', '3']) == 1
+        errors = capsys.readouterr().err
+        assert f'{source}:2: Excepted root, manager or developer, got: admin' in errors
+        assert f'{source}:4: Project IMP already has root' in errors
+        session = self.open_session(db_file)
+        project = session.query(Project).one()
+        assert project.root_user.username == 'bob'
+        # User of rejected record isn't created
+        assert sorted(user.username for user in session.query(User)) == ['bob', 'dave']
+        assert dict(session.execute('SELECT u.username, m.project_role FROM user_to_project m '
+                                    'JOIN users u ON u.id = m.member_id').fetchall()) == {'bob': 'root', 'dave': 'manager'}
+        session.close()
+
+    def test_export_unknown_project(self, tmp_path):
+        import manage
+        output = tmp_path / 'none.jsonl'
+        assert manage.main(['--db', str(tmp_path / 'empty.sqlite'), 'export', 'NOPE', '--output', str(output)]) == 1
+        assert not output.exists()
+
+
+class TestBenchmarkDataset:
+    """
+    This class checks generator of benchmark databases and comparison of benchmark results with baseline
+    """
+
+    def generate(self, tmp_path, name: str):
+        from benchmarks.dataset import generate
+        engine = db_session.create_engine(str(tmp_path / name))
+        db_session.upgrade_database(engine)
+        session = db_session.create_session_factory(engine)()
+        generate(session, users=50, projects=10, issues=500, seed=7, log=lambda message: None)
+        return session
+
+    def test_generated_database(self, tmp_path):
+        from data.issue_stats import check_stats
+        from data.models import Issue, Project
+        first, second = self.generate(tmp_path, 'first.sqlite'), self.generate(tmp_path, 'second.sqlite')
+        assert check_stats(first) == []
+        # The same seed gives the same issues
+        rows = [session.query(Issue.tracking, Issue.summary, Issue.state).order_by(Issue.id).all()
+                for session in (first, second)]
+        assert len(rows[0]) == 500 and rows[0] == rows[1]
+        # The first project is the most popular one
+        counts = dict(first.query(Issue.project_id, sqlalchemy.func.count()).group_by(Issue.project_id).all())
+        assert max(counts, key=counts.get) == 1
+        assert all(project.root_user is not None for project in first.query(Project))
+        first.close()
+        second.close()
+
+    def test_compare_with_baseline(self):
+        from benchmarks.suite import compare
+        baseline = {'issue': {'p95_ms': 10.0, 'queries': 3, 'peak_kb': 300}}
+        assert compare({'issue': {'p95_ms': 14.0, 'queries': 3, 'peak_kb': 310}}, baseline, 0.25) == []
+        assert compare({'issue': {'p95_ms': 20.0, 'queries': 4, 'peak_kb': 400}, 'new': {}}, baseline, 0.25) == [
+            'issue: 4 queries, baseline 3', 'issue: p95 20.0 ms, baseline 10.0 ms',
+            'issue: peak memory 400 KB, baseline 300 KB']
+
+
+class TestInstrumentation:
+    """
+    This class checks per-request SQL counters, their headers, budget warnings and query budgets of routes
+    """
+
+    def test_headers(self):
+        client = logged_in_client(3)
+        with count_queries() as statements:
+            result = client.get('/projects/2')
+        assert result.status_code == 200
+        assert int(result.headers['X-Query-Count']) == len(statements)
+        assert result.headers['Server-Timing'].startswith(f'db;desc="{len(statements)} queries";dur=')
+
+    def test_failed_statements_leave_no_timing(self):
+        from flask import g
+        from src.instrumentation import RequestQueries, current_queries
+        engine = db_session.get_engine()
+        with app.test_request_context('/'):
+            g.sql_queries = RequestQueries()
+            with engine.connect() as connection:
+                for _ in range(3):
+                    with pytest.raises(sqlalchemy.exc.OperationalError):
+                        connection.execute('SELECT * FROM missing_table')
+                connection.execute('SELECT 1')
+                # Start times were kept on connection before, statements that raised left them there forever
+                assert 'query_started' not in connection.info
+            queries = current_queries()
+        assert queries.count == 1
+
+    def test_no_headers_in_production(self, monkeypatch):
+        monkeypatch.setitem(app.config, 'SQL_QUERY_HEADERS', False)
+        result = testing_app.get(f'{CURRENT_API_VER}/issue/?API_KEY={FIRST_TEST_ACCOUNT_API_KEY}&tag=API1-1')
+        assert result.status_code == 200
+        assert 'X-Query-Count' not in result.headers and 'Server-Timing' not in result.headers
+
+    def test_budget_warning(self, monkeypatch, caplog):
+        monkeypatch.setitem(app.config, 'SQL_QUERY_BUDGETS', {'project': 1})
+        with caplog.at_level('WARNING'):
+            logged_in_client(3).get('/projects/2')
+            logged_in_client(3).get('/issue/API1-1')
+        warnings = [record.getMessage() for record in caplog.records if record.levelname == 'WARNING']
+        assert len(warnings) == 1
+        assert warnings[0].startswith('GET /projects/2(project) is over query budget 1')
+
+    def test_repeated_statements(self):
+        from src.instrumentation import RequestQueries
+        queries = RequestQueries()
+        for _ in range(3):
+            queries.record('SELECT * FROM users WHERE id = ?', 1.5)
+        queries.record('SELECT * FROM projects', 0.5)
+        assert queries.count == 4 and queries.total_ms == 5.0
+        assert queries.repeated(2) == [('SELECT * FROM users WHERE id = ?', 3)]
+        assert queries.describe(2).splitlines() == ['4 statements in 5.0 ms', '3 x SELECT * FROM users WHERE id = ?']
+
+    @pytest.mark.parametrize('path, budget', [
+        ('/projects/2', 5),
+        ('/projects/2/issues', 5),
+        ('/projects/2/manage/members', 4),
+        ('/issue/API1-1', 3),
+        ('/profile/3/issues', 5),
+    ])
+    def test_page_budgets(self, query_budget, path, budget):
+        assert query_budget(logged_in_client(3), path, budget).status_code == 200
+
+    @pytest.mark.parametrize('path, budget', [
+        ('project/?project_id=2', 5),
+        ('issue/?tag=API1-1', 4),
+        ('issues/?project_id=2', 4),
+        ('project/stats/?project_id=2', 3),
+        ('issues/batch/?tags=API1-1,Test-1', 2),
+    ])
+    def test_api_budgets(self, query_budget, path, budget):
+        result = query_budget(testing_app, f'{CURRENT_API_VER}/{path}&API_KEY={FIRST_TEST_ACCOUNT_API_KEY}', budget)
+        assert result.status_code == 200
+
+
+class TestMetrics:
+    """
+    This class checks metrics registry and /metrics endpoint
+    """
+    ADMIN_API_KEY = 'DRWLFSSZOHTTFBFIUDJVPKXD'
+
+    def metrics(self) -> str:
+        result = testing_app.get('/metrics', headers={'Authorization': f'Bearer {self.ADMIN_API_KEY}'})
+        assert result.status_code == 200
+        assert result.content_type.startswith('text/plain; version=0.0.4')
+        return result.get_data(as_text=True)
+
+    def test_access(self):
+        assert testing_app.get('/metrics').status_code == 401
+        assert testing_app.get(f'/metrics?API_KEY={FIRST_TEST_ACCOUNT_API_KEY}').status_code == 403
+        assert logged_in_client(3).get('/metrics').status_code == 403
+        assert logged_in_client(1).get('/metrics').status_code == 200
+
+    def test_request_metrics(self):
+        def value(text: str, sample: str) -> float:
+            lines = [line for line in text.splitlines() if line.startswith(sample + ' ')]
+            return float(lines[0].split()[-1]) if lines else 0
+
+        requests = 'bugtracker_requests_total{endpoint="issueresource",method="GET",status="200"}'
+        durations = 'bugtracker_request_duration_seconds_count{endpoint="issueresource",method="GET"}'
+        before = self.metrics()
+        for _ in range(2):
+            testing_app.get(f'{CURRENT_API_VER}/issue/?API_KEY={FIRST_TEST_ACCOUNT_API_KEY}&tag=API1-1')
+        testing_app.get(f'{CURRENT_API_VER}/issue/?API_KEY={FIRST_TEST_ACCOUNT_API_KEY}&tag=NOPE')
+        after = self.metrics()
+        assert value(after, requests) - value(before, requests) == 2
+        assert value(after, durations) - value(before, durations) == 3
+        assert value(after, 'bugtracker_requests_total{endpoint="issueresource",method="GET",status="404"}') >= 1
+        assert value(after, 'bugtracker_sql_statements_total{endpoint="issueresource",method="GET"}') > 0
+        # Only request for metrics is being handled
+        assert value(after, 'bugtracker_requests_in_flight') == 1
+        assert 'bugtracker_cache_hit_ratio{cache="api_key"}' in after
+        assert '# TYPE bugtracker_cache_lookups_total counter' in after
+        assert value(after, 'bugtracker_cache_lookups_total{cache="api_key",result="hit"}') > 0
+        assert '# TYPE bugtracker_db_sessions_total counter' in after
+        assert value(after, 'bugtracker_db_sessions_total{event="opened"}') >= \
+            value(after, 'bugtracker_db_sessions_total{event="closed"}') > 0
+        assert '# TYPE bugtracker_db_sessions_open gauge' in after
+        assert 'bugtracker_db_pool_connections{kind="checked_out"}' in after
+
+    def test_histogram(self):
+        from src.metrics import Histogram
+        histogram = Histogram('latency_seconds', 'Latency', ('route',), buckets=(0.1, 1.0))
+        for value in (0.05, 0.1, 0.5, 3.0):
+            histogram.observe('a"b', value=value)
+        assert histogram.render() == [
+            '# HELP latency_seconds Latency',
+            '# TYPE latency_seconds histogram',
+            'latency_seconds_bucket{route="a\\"b",le="0.1"} 2',
+            'latency_seconds_bucket{route="a\\"b",le="1.0"} 3',
+            'latency_seconds_bucket{route="a\\"b",le="+Inf"} 4',
+            'latency_seconds_sum{route="a\\"b"} 3.65',
+            'latency_seconds_count{route="a\\"b"} 4',
+        ]
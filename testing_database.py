@@ -0,0 +1,18 @@
+"""
+Pytest plugin that points the app to a copy of the test database, loaded by -p option of pytest.ini
+
+main_app connects to BUGTRACKER_DB when it is imported, and package __init__.py of the project folder imports it
+before conftest.py, so the variable is set by this plugin, which pytest loads before collection
+Tracked database files stay untouched by test runs
+"""
+import atexit
+import os
+import shutil
+import tempfile
+
+TEST_DB = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'db', 'bugtracker_test.sqlite')
+_test_db_dir = tempfile.mkdtemp(prefix='bugtracker_test_')
+atexit.register(shutil.rmtree, _test_db_dir, ignore_errors=True)
+_test_db_copy = os.path.join(_test_db_dir, 'bugtracker_test.sqlite')
+shutil.copyfile(TEST_DB, _test_db_copy)
+os.environ['BUGTRACKER_DB'] = _test_db_copy